@@ -1,8 +1,12 @@
-from app.models.inventory import InventoryCreate, InventoryResponse, UpdateInventory, InventoryUpdateResponse
+from app.models.inventory import InventoryCreate, InventoryResponse, UpdateInventory, InventoryUpdateResponse, PatchInventory
 from app.utils.security import get_current_store
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from app.utils.security import get_current_store
 from app.core.database import db
+from app.core.repository import update_and_fetch
+from app.core.pagination import PageParams, fetch_page
+from app.services.inventory_service import item_patch_filter, item_patch_pipeline
+from pymongo import ReturnDocument
 from nanoid import generate
 from datetime import datetime
 from typing import List
@@ -29,8 +33,8 @@ async def create_inventory(inventory: InventoryCreate, current_store: dict = Dep
     return InventoryResponse(**inventory_data)
 
 @router.get("/", response_model=List[InventoryResponse])
-async def get_inventory(current_store: dict = Depends(get_current_store)):
-    inventory = await db["inventory"].find({"store_id": current_store["_id"]}).to_list(100)
+async def get_inventory(response: Response, page: PageParams = Depends(), current_store: dict = Depends(get_current_store)):
+    inventory = await fetch_page("inventory", {"store_id": current_store["_id"]}, page, response)
     return [InventoryResponse(**item) for item in inventory]
 
 @router.get("/{inventory_id}", response_model=InventoryResponse)
@@ -43,7 +47,7 @@ async def get_inventory_item(inventory_id: str, current_store: dict = Depends(ge
 @router.put("/{inventory_id}", response_model=InventoryUpdateResponse)
 async def update_inventory(inventory_id: str, inventory: UpdateInventory, current_store: dict = Depends(get_current_store)):
     items = [
-        {**item.dict(), "_id": f"item_{generate(size=10)}"} if not item._id else item.dict()
+        {**item.dict(), "_id": f"item_{generate(size=10)}"}
         for item in inventory.items
     ]
     inventory_data = inventory.dict()
@@ -52,13 +56,28 @@ async def update_inventory(inventory_id: str, inventory: UpdateInventory, curren
         "updated_at": datetime.utcnow()
     })
     
-    result = await db["inventory"].update_one(
+    updated_inventory = await update_and_fetch(
+        "inventory",
         {"_id": inventory_id, "store_id": current_store["_id"]},
-        {"$set": inventory_data}
+        {"$set": inventory_data},
+        not_found="Inventory not found"
     )
-    
-    if result.matched_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Inventory not found")
-    
-    updated_inventory = await db["inventory"].find_one({"_id": inventory_id, "store_id": current_store["_id"]})
+    return InventoryUpdateResponse(**updated_inventory)
+
+@router.patch("/{inventory_id}", response_model=InventoryUpdateResponse)
+async def patch_inventory(inventory_id: str, patch: PatchInventory, current_store: dict = Depends(get_current_store)):
+    """
+    Changes quantity and/or price of individual items by sku_id, adjusting `total` by the
+    change in their value. Sends and rewrites only the patched items.
+    """
+    updated_inventory = await db["inventory"].find_one_and_update(
+        {"_id": inventory_id, "store_id": current_store["_id"], **item_patch_filter(patch.items)},
+        item_patch_pipeline(patch.items, datetime.utcnow()),
+        return_document=ReturnDocument.AFTER
+    )
+    if updated_inventory is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Inventory not found, an item is missing, or a decrement exceeds its quantity"
+        )
     return InventoryUpdateResponse(**updated_inventory)
@@ -1,36 +1,43 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, status
 from app.models.order import OrderCreate, OrderResponse, OrderItem, RateOrder
 from app.utils.security import get_current_user, get_current_store
 from app.core.database import db
-from nanoid import generate
+from app.core.repository import update_and_fetch
+from app.core.pagination import PageParams, fetch_page
+from app.services.reservation_service import stock_reservations
+from app.services.order_events import order_changed
+from app.services.order_service import place_order, set_order_status
+from app.services.idempotency import idempotency_keys
+from app.services.order_stream import order_stream_hub
+from app.services.outbox import outbox_event
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from app.utils.datetime import get_ist_time
 
 router = APIRouter()
 
 @router.post("/", response_model=OrderResponse)
-async def create_order(order: OrderCreate, current_user: dict = Depends(get_current_user)):
-    order_id = f"ord_{generate(size=10)}"
-    order_data = order.dict()
-    date = get_ist_time()
-    order_data.update({
-        "_id": order_id,
-        "user_id": current_user["_id"],
-        "status": "pending",
-        "payment_status": "pending",
-        "created_at": date,
-        "updated_at": date
-    })
-    
-    await db["orders"].insert_one(order_data)
-    return OrderResponse(**order_data)
+async def create_order(
+    order: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user)
+):
+    return await idempotency_keys.run(
+        f"orders:{current_user['_id']}", idempotency_key, order, response,
+        lambda: place_order(order, current_user["_id"])
+    )
 
 @router.get("/", response_model=List[OrderResponse])
-async def get_user_orders(current_user: dict = Depends(get_current_user)):
-    orders = await db["orders"].find({"user_id": current_user["_id"]}).to_list(100)
+async def get_user_orders(response: Response, page: PageParams = Depends(), current_user: dict = Depends(get_current_user)):
+    orders = await fetch_page("orders", {"user_id": current_user["_id"]}, page, response)
     return [OrderResponse(**order) for order in orders]
 
+@router.get("/stream")
+async def stream_user_orders(order_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    # Server-sent events for the customer's orders, or just `order_id`, as they change
+    return order_stream_hub.response(f"user:{current_user['_id']}", order_id)
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
     order = await db["orders"].find_one({"_id": order_id, "user_id": current_user["_id"]})
@@ -47,51 +54,31 @@ async def track_order(order_id: str, current_user: dict = Depends(get_current_us
 
 @router.post("/{order_id}/cancel", response_model=OrderResponse)
 async def cancel_order(order_id: str, current_user: dict = Depends(get_current_user)):
-    order = await db["orders"].find_one({"_id": order_id, "user_id": current_user["_id"]})
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    if order["status"] != "pending":
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order cannot be canceled")
-    
-    await db["orders"].update_one(
+    updated_order = await update_and_fetch(
+        "orders",
         {"_id": order_id, "user_id": current_user["_id"]},
-        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}}
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}, "$push": {"outbox": outbox_event("order.cancelled")}},
+        precondition={"status": "pending"},
+        not_found="Order not found",
+        precondition_failed="Order cannot be canceled"
     )
-    updated_order = await db["orders"].find_one({"_id": order_id, "user_id": current_user["_id"]})
+    await stock_reservations.release(order_id, reason="cancelled")
+    await order_changed(updated_order)
     return OrderResponse(**updated_order)
 
 @router.put("/{order_id}/status", response_model=OrderResponse)
-async def update_order_status(order_id: str, status: str, current_store: dict = Depends(get_current_store)):
-    valid_statuses = ["accepted", "rejected", "dispatched", "delivered"]
-    if status not in valid_statuses:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
-    
-    result = await db["orders"].update_one(
-        {"_id": order_id, "store_id": current_store["_id"]},
-        {"$set": {"status": status, "updated_at": get_ist_time()}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found or unauthorized")
-    
-    updated_order = await db["orders"].find_one({"_id": order_id, "store_id": current_store["_id"]})
-
+async def update_order_status(order_id: str, new_status: str = Query(..., alias="status"), current_store: dict = Depends(get_current_store)):
+    updated_order = await set_order_status(order_id, current_store["_id"], new_status)
     return OrderResponse(**updated_order)
 
 @router.put("/{order_id}/rate", response_model=OrderResponse)
 async def rate_order(order_id: str, payload: RateOrder, current_user: dict = Depends(get_current_user)):
-    order = await db["orders"].find_one({"_id": order_id, "user_id": current_user["_id"]})
-
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    
-    if order["status"] != "delivered":
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order must be delivered to rate")
-    
-    await db["orders"].update_one(
+    updated_order = await update_and_fetch(
+        "orders",
         {"_id": order_id, "user_id": current_user["_id"]},
-        {"$set": {"rating": payload.rating, "review": payload.review, "updated_at": get_ist_time()}}
+        {"$set": {"rating": payload.rating, "review": payload.review, "updated_at": get_ist_time()}},
+        precondition={"status": "delivered"},
+        not_found="Order not found",
+        precondition_failed="Order must be delivered to rate"
     )
-
-    await db["orders"].find_one({"_id": order_id, "user_id": current_user["_id"]})
-    
-    return {}
\ No newline at end of file
+    return OrderResponse(**updated_order)
\ No newline at end of file
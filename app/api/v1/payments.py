@@ -1,34 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
 from app.models.payment import PaymentCreate, PaymentResponse
-from app.core.razorpay_client import razorpay_client
+from app.core.razorpay_client import PaymentGatewayError, RazorpayGateway, get_payment_gateway, razorpay_client
 from app.utils.security import get_current_user, get_current_store
 from app.core.database import db
+from app.services.idempotency import idempotency_keys
+from app.services.payment_service import capture_payment, fail_payment
+from app.services.payment_webhooks import webhook_queue
+from app.services.payment_status import payment_status_waiters
 from nanoid import generate
 import razorpay
 from app.core.config import settings
 from datetime import datetime
+from typing import Optional
+import asyncio
 
 router = APIRouter()
 
-@router.post("/create-order", response_model=PaymentResponse)
-async def create_payment_order(payment: PaymentCreate, current_user: dict = Depends(get_current_user)):
+async def open_payment_order(payment: PaymentCreate, user_id: str, gateway: RazorpayGateway) -> PaymentResponse:
+    """
+    Creates the Razorpay order a payment is made against, and records the payment.
+    """
     payment_id = f"pay_{generate(size=10)}"
     
     # Create Razorpay Order
     try:
-        razorpay_order = razorpay_client.order.create({
-            "amount": int(payment.amount * 100),  # Convert to paise
-            "currency": payment.currency,
-            "receipt": payment_id,
-            "payment_capture": 1
-        })
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        razorpay_order = await gateway.create_order(
+            amount=int(payment.amount * 100),  # Convert to paise
+            currency=payment.currency,
+            receipt=payment_id
+        )
+    except PaymentGatewayError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
     
     payment_data = payment.dict()
     payment_data.update({
         "_id": payment_id,
         "razorpay_order_id": razorpay_order['id'],
+        "user_id": user_id,
         "status": "created",
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
@@ -37,12 +45,21 @@ async def create_payment_order(payment: PaymentCreate, current_user: dict = Depe
     await db["payments"].insert_one(payment_data)
     return PaymentResponse(**payment_data)
 
+@router.post("/create-order", response_model=PaymentResponse)
+async def create_payment_order(
+    payment: PaymentCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: dict = Depends(get_current_user),
+    gateway: RazorpayGateway = Depends(get_payment_gateway)
+):
+    return await idempotency_keys.run(
+        f"payments:{current_user['_id']}", idempotency_key, payment, response,
+        lambda: open_payment_order(payment, current_user["_id"], gateway)
+    )
+
 @router.post("/verify")
 async def verify_payment(order_id: str, razorpay_payment_id: str, razorpay_signature: str):
-    payment = await db["payments"].find_one({"razorpay_order_id": order_id})
-    if not payment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment order not found")
-    
     try:
         # Verify payment signature with Razorpay
         params = {
@@ -52,43 +69,50 @@ async def verify_payment(order_id: str, razorpay_payment_id: str, razorpay_signa
         }
         razorpay_client.utility.verify_payment_signature(params)
     except razorpay.errors.SignatureVerificationError:
-        await db["payments"].update_one({"razorpay_order_id": order_id}, {"$set": {"status": "failed"}})
+        # A bad signature never downgrades a payment that was already captured
+        await fail_payment(order_id)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payment verification failed")
     
-    # Update payment status to captured in MongoDB
-    await db["payments"].update_one(
-        {"razorpay_order_id": order_id},
-        {"$set": {"status": "captured", "razorpay_payment_id": razorpay_payment_id, "updated_at": datetime.utcnow()}}
-    )
-    updated_payment = await db["payments"].find_one({"razorpay_order_id": order_id})
+    updated_payment = await capture_payment(order_id, razorpay_payment_id)
+    if updated_payment is None:
+        # Already captured, e.g. a retried verification
+        updated_payment = await db["payments"].find_one({"razorpay_order_id": order_id})
+        if updated_payment is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment order not found")
     return PaymentResponse(**updated_payment)
 
 @router.post("/webhook")
 async def razorpay_webhook(request: Request):
-    # Verify the webhook signature
-    body = await request.body()
+    # Verify the webhook signature; the SDK signs text, not bytes
+    body = (await request.body()).decode()
     signature = request.headers.get('X-Razorpay-Signature')
+    if not signature:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid webhook signature")
     try:
         razorpay_client.utility.verify_webhook_signature(body, signature, settings.razorpay_api_secret)
     except razorpay.errors.SignatureVerificationError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid webhook signature")
 
-    payload = await request.json()
-    event = payload.get("event")
-    order_id = payload["payload"]["payment"]["entity"]["order_id"]
-    payment_status = "captured" if event == "payment.captured" else "failed"
-
-    # Update payment status in MongoDB
-    await db["payments"].update_one(
-        {"razorpay_order_id": order_id},
-        {"$set": {"status": payment_status, "updated_at": datetime.utcnow()}}
-    )
-
+    # Stored and acknowledged here; applied by the webhook worker
+    await webhook_queue.ingest(body, request.headers.get('X-Razorpay-Event-Id'))
     return {"status": "success"}
 
 @router.get("/status/{payment_id}", response_model=PaymentResponse)
-async def get_payment_status(payment_id: str, current_user: dict = Depends(get_current_user)):
-    payment = await db["payments"].find_one({"_id": payment_id, "user_id": current_user["_id"]})
-    if not payment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found")
+async def get_payment_status(
+    payment_id: str,
+    wait: float = Query(0, ge=0, le=settings.payment_status_max_wait),
+    current_user: dict = Depends(get_current_user)
+):
+    # With `wait`, an unsettled payment is held open until it is captured or fails, or `wait` seconds pass
+    query = {"_id": payment_id, "user_id": current_user["_id"]}
+    async with payment_status_waiters.watching(payment_id) as changed:
+        payment = await db["payments"].find_one(query)
+        if not payment:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found")
+        if wait and payment["status"] == "created":
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=wait)
+                payment = await db["payments"].find_one(query)
+            except asyncio.TimeoutError:
+                pass
     return PaymentResponse(**payment)
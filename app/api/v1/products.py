@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.models.product import ProductCreate, ProductResponse, SKU
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request, Response, status
+from app.models.product import ProductCreate, ProductResponse, SKU, BulkUpsertResponse, CatalogImportResponse
 from app.utils.security import get_current_store
+from app.core.config import settings
 from app.core.database import db
+from app.core.repository import update_and_fetch
+from app.core.pagination import PageParams, fetch_page
+from app.services.catalog_service import BULK_WRITE_CHUNK_SIZE, summarize_results, upsert_product_chunk
+from app.services.catalog_import import run_catalog_import
+from app.services.search_service import PRODUCT_FIELD_WEIGHTS, build_search_terms
+from app.services.fuzzy_search import FUZZY_INDEX_PROJECTION, fuzzy_index_registry
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from nanoid import generate
 from datetime import datetime
 from typing import List
@@ -20,17 +29,60 @@ async def create_product(product: ProductCreate, current_store: dict = Depends(g
         "_id": product_id,
         "store_id": current_store["_id"],
         "skus": skus,
+        "search_terms": build_search_terms(product_data, PRODUCT_FIELD_WEIGHTS),
         "is_active": True,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
     
-    await db["products"].insert_one(product_data)
+    try:
+        await db["products"].insert_one(product_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A product with this external_code already exists")
+    await fuzzy_index_registry.upsert_product(current_store["_id"], product_data)
     return ProductResponse(**product_data)
 
+# Declared before /{product_id} so the path is not captured as a product id
+@router.put("/bulk-update", response_model=BulkUpsertResponse)
+async def bulk_update_products(items: List[dict] = Body(...), current_store: dict = Depends(get_current_store)):
+    """
+    Creates or updates products keyed by `_id` or `external_code`, with a result per item.
+    """
+    if len(items) > settings.product_bulk_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.product_bulk_max_items} products per request"
+        )
+    results = []
+    for start in range(0, len(items), BULK_WRITE_CHUNK_SIZE):
+        chunk = list(enumerate(items[start:start + BULK_WRITE_CHUNK_SIZE], start))
+        results.extend(await upsert_product_chunk(current_store["_id"], chunk))
+    if any(result["status"] != "failed" for result in results):
+        await fuzzy_index_registry.invalidate(current_store["_id"])
+    return summarize_results(results)
+
+@router.post("/import", response_model=CatalogImportResponse)
+async def import_products(
+    request: Request,
+    import_format: str = Query(..., alias="format", pattern="^(csv|ndjson)$"),
+    current_store: dict = Depends(get_current_store)
+):
+    """
+    Imports a POS export sent as the raw request body. CSV has one row per SKU; NDJSON has
+    one product per line. The body is parsed and written as it streams in.
+    """
+    return await run_catalog_import(current_store["_id"], import_format, request.stream())
+
+@router.get("/imports/{import_id}", response_model=CatalogImportResponse)
+async def get_import(import_id: str, current_store: dict = Depends(get_current_store)):
+    catalog_import = await db["catalog_imports"].find_one({"_id": import_id, "store_id": current_store["_id"]})
+    if not catalog_import:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import not found")
+    return CatalogImportResponse(**catalog_import)
+
 @router.get("/", response_model=List[ProductResponse])
-async def get_products(current_store: dict = Depends(get_current_store)):
-    products = await db["products"].find({"store_id": current_store["_id"]}).to_list(100)
+async def get_products(response: Response, page: PageParams = Depends(), current_store: dict = Depends(get_current_store)):
+    products = await fetch_page("products", {"store_id": current_store["_id"]}, page, response, {"search_terms": 0})
     return [ProductResponse(**product) for product in products]
 
 @router.get("/{product_id}", response_model=ProductResponse)
@@ -43,24 +95,23 @@ async def get_product(product_id: str, current_store: dict = Depends(get_current
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: str, product: ProductCreate, current_store: dict = Depends(get_current_store)):
     skus = [
-        {**sku.dict(), "_id": f"sku_{generate(size=10)}"} if not sku._id else sku.dict()
+        {**sku.dict(by_alias=True), "_id": sku.id or f"sku_{generate(size=10)}"}
         for sku in product.skus
     ]
     product_data = product.dict()
     product_data.update({
         "skus": skus,
+        "search_terms": build_search_terms(product_data, PRODUCT_FIELD_WEIGHTS),
         "updated_at": datetime.utcnow()
     })
     
-    result = await db["products"].update_one(
+    updated_product = await update_and_fetch(
+        "products",
         {"_id": product_id, "store_id": current_store["_id"]},
-        {"$set": product_data}
+        {"$set": product_data},
+        not_found="Product not found"
     )
-    
-    if result.matched_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    
-    updated_product = await db["products"].find_one({"_id": product_id, "store_id": current_store["_id"]})
+    await fuzzy_index_registry.upsert_product(current_store["_id"], updated_product)
     return ProductResponse(**updated_product)
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -68,45 +119,46 @@ async def delete_product(product_id: str, current_store: dict = Depends(get_curr
     result = await db["products"].delete_one({"_id": product_id, "store_id": current_store["_id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    await fuzzy_index_registry.remove_product(current_store["_id"], product_id)
     return None
 
 @router.post("/{product_id}/skus", response_model=SKU)
 async def add_sku(product_id: str, sku: SKU, current_store: dict = Depends(get_current_store)):
     sku_data = {**sku.dict(), "_id": f"sku_{generate(size=10)}"}
-    result = await db["products"].update_one(
+    updated_product = await db["products"].find_one_and_update(
         {"_id": product_id, "store_id": current_store["_id"]},
-        {"$push": {"skus": sku_data}}
+        {"$push": {"skus": sku_data}},
+        projection=FUZZY_INDEX_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
+    if updated_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    await fuzzy_index_registry.upsert_product(current_store["_id"], updated_product)
     return SKU(**sku_data)
 
 @router.put("/{product_id}/skus/{sku_id}", response_model=SKU)
 async def update_sku(product_id: str, sku_id: str, sku: SKU, current_store: dict = Depends(get_current_store)):
     sku_data = sku.dict()
-    result = await db["products"].update_one(
+    updated_product = await db["products"].find_one_and_update(
         {"_id": product_id, "store_id": current_store["_id"], "skus._id": sku_id},
-        {"$set": {"skus.$": sku_data}}
+        {"$set": {"skus.$": sku_data}},
+        projection=FUZZY_INDEX_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
+    if updated_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SKU not found")
+    await fuzzy_index_registry.upsert_product(current_store["_id"], updated_product)
     return sku
 
 @router.delete("/{product_id}/skus/{sku_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_sku(product_id: str, sku_id: str, current_store: dict = Depends(get_current_store)):
-    result = await db["products"].update_one(
+    updated_product = await db["products"].find_one_and_update(
         {"_id": product_id, "store_id": current_store["_id"]},
-        {"$pull": {"skus": {"_id": sku_id}}}
+        {"$pull": {"skus": {"_id": sku_id}}},
+        projection=FUZZY_INDEX_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
+    if updated_product is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SKU not found")
+    await fuzzy_index_registry.upsert_product(current_store["_id"], updated_product)
     return None
-
-@router.put("/bulk-update")
-async def bulk_update_products(updates: List[ProductCreate], current_store: dict = Depends(get_current_store)):
-    for product in updates:
-        await db["products"].update_one(
-            {"_id": product._id, "store_id": current_store["_id"]},
-            {"$set": product.dict()}
-        )
-    return {"status": "Bulk update completed"}
@@ -1,9 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, status
 from typing import Optional
-from app.models.store import StoreResponse
+from app.models.store import StoreResponse, NearbyStoreResponse
 from app.models.product import ProductResponse
 
 from app.core.database import db
+from app.services.fuzzy_search import fuzzy_index_registry
+from app.services.nearby_service import in_stock_filter, nearby_store_cache
+from app.services.spatial_index import store_spatial_index
+from app.services.delivery_zone_service import stores_delivering_to, store_cards
+from app.services.search_service import (
+    PRODUCT_FIELD_WEIGHTS, STORE_FIELD_WEIGHTS, build_search_filter, find_candidates, rank_documents
+)
 from typing import List
 
 from datetime import datetime
@@ -12,28 +19,76 @@ router = APIRouter()
 
 @router.get("/stores", response_model=List[StoreResponse])
 async def search_stores(query: Optional[str] = None, limit: int = 10):
-    query_filter = {"name": {"$regex": query, "$options": "i"}} if query else {}
-    stores = await db["stores"].find(query_filter).limit(limit).to_list(limit)
+    search_filter = build_search_filter(query)
+    projection = {"hashed_password": 0, "search_terms": 0}
+    if not search_filter:
+        stores = await db["stores"].find({}, projection).limit(limit).to_list(limit)
+        return [StoreResponse(**store) for store in stores]
+
+    candidates = await find_candidates(db["stores"], query, {}, projection)
+    stores = rank_documents(candidates, query, STORE_FIELD_WEIGHTS, limit)
     return [StoreResponse(**store) for store in stores]
 
 @router.get("/products", response_model=List[ProductResponse])
-async def search_products(query: Optional[str] = None, category: Optional[str] = None, limit: int = 10):
-    query_filter = {}
-    if query:
-        query_filter["name"] = {"$regex": query, "$options": "i"}
+async def search_products(
+    query: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = 10,
+    fuzzy: bool = False,
+    store_id: Optional[str] = None
+):
+    if fuzzy:
+        return await fuzzy_search_products(query, category, limit, store_id)
+
+    search_filter = build_search_filter(query)
+    query_filter = dict(search_filter or {})
     if category:
         query_filter["category"] = category
-    products = await db["products"].find(query_filter).limit(limit).to_list(limit)
+    projection = {"search_terms": 0}
+    if not search_filter:
+        products = await db["products"].find(query_filter, projection).limit(limit).to_list(limit)
+        return [ProductResponse(**product) for product in products]
+
+    candidates = await find_candidates(db["products"], query, {"category": category} if category else {}, projection)
+    products = rank_documents(candidates, query, PRODUCT_FIELD_WEIGHTS, limit)
     return [ProductResponse(**product) for product in products]
 
-@router.get("/stores/nearby", response_model=List[StoreResponse])
-async def get_nearby_stores(latitude: float, longitude: float, max_distance: int = 5000, limit: int = 10):
-    stores = await db["stores"].find({
-        "addresses": {
-            "$near": {
-                "$geometry": {"type": "Point", "coordinates": [longitude, latitude]},
-                "$maxDistance": max_distance
-            }
-        }
-    }).limit(limit).to_list(limit)
-    return [StoreResponse(**store) for store in stores]
+async def fuzzy_search_products(query: Optional[str], category: Optional[str], limit: int, store_id: Optional[str]):
+    if not store_id or not query:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fuzzy search requires query and store_id")
+
+    index = await fuzzy_index_registry.get(store_id)
+    # Over-fetch when filtering by category so the filter doesn't starve the page
+    matches = index.search(query, limit * 5 if category else limit)
+    if not matches:
+        return []
+
+    query_filter = {"_id": {"$in": [product_id for product_id, _ in matches]}, "store_id": store_id}
+    if category:
+        query_filter["category"] = category
+    products = await db["products"].find(query_filter, {"search_terms": 0}).to_list(len(matches))
+    by_id = {product["_id"]: product for product in products}
+    ranked = [by_id[product_id] for product_id, _ in matches if product_id in by_id][:limit]
+    return [ProductResponse(**product) for product in ranked]
+
+@router.get("/stores/nearby", response_model=List[NearbyStoreResponse])
+async def get_nearby_stores(
+    latitude: float,
+    longitude: float,
+    max_distance: int = 5000,
+    limit: int = 10,
+    category: Optional[str] = None,
+    product: Optional[str] = None
+):
+    product_filter = in_stock_filter(category, product)
+    if product_filter is None and store_spatial_index.ready:
+        stores = store_spatial_index.nearby(latitude, longitude, max_distance, limit)
+    else:
+        stores = await nearby_store_cache.get_nearby(latitude, longitude, max_distance, limit, product_filter)
+    return [NearbyStoreResponse(**store) for store in stores]
+
+@router.get("/stores/delivering", response_model=List[NearbyStoreResponse])
+async def get_delivering_stores(latitude: float, longitude: float, limit: int = 20):
+    store_ids = await stores_delivering_to(latitude, longitude)
+    stores = await store_cards(store_ids, latitude, longitude, limit)
+    return [NearbyStoreResponse(**store) for store in stores]
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from pydantic import EmailStr
 from datetime import timedelta
-from app.models.store import StoreCreate, StoreResponse, StoreAddress, StoreUpdate
+from app.models.store import StoreCreate, StoreResponse, StoreAddress, StoreUpdate, DeliveryZone, DeliveryZoneCreate
 from app.models.order import OrderResponse
 from app.models.user import LoginRequest
 from app.models.analytics import AnalyticsReport
-from app.utils.security import hash_password, verify_password, create_jwt_token
+from app.utils.security import hash_password, verify_password, create_jwt_token, get_current_store
 from app.core.database import db
+from app.core.indexes import duplicate_key_field
+from app.core.repository import update_and_fetch
+from app.core.pagination import PageParams, fetch_page
 from app.core.config import settings
-from app.utils.security import decode_jwt_token
+from app.services.principal_cache import principal_cache
+from app.services.nearby_service import nearby_store_cache
+from app.services.spatial_index import store_spatial_index
+from app.services.delivery_zone_service import serving_store_cache
+from app.services.order_inbox import LIVE_STATUSES, order_inbox
+from app.services.order_service import set_order_status
+from app.services.order_stream import order_stream_hub
+from pymongo.errors import DuplicateKeyError, WriteError
+from app.services.search_service import STORE_FIELD_WEIGHTS, build_search_terms
+from app.services.store_service import sync_verified_locations
+from app.utils.geo import geojson_point
 from nanoid import generate
 from typing import List
 
@@ -16,6 +29,18 @@ from datetime import datetime
 
 router = APIRouter()
 
+# Store fields copied into nearby-store cards
+CARD_FIELDS = {"name", "phone", "description"}
+
+async def store_addresses_changed(store_id: str):
+    """
+    Refreshes everything derived from a store's addresses.
+    """
+    await sync_verified_locations(store_id)
+    await principal_cache.invalidate("store", store_id)
+    await nearby_store_cache.invalidate()
+    await store_spatial_index.publish_change(store_id)
+
 @router.post("/register", response_model=StoreResponse)
 async def register_store(store: StoreCreate):
     existing_store = await db["stores"].find_one({"email": store.email})
@@ -23,7 +48,7 @@ async def register_store(store: StoreCreate):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     
     store_id = f"str_{generate(size=10)}"
-    hashed_password = hash_password(store.password)
+    hashed_password = await hash_password(store.password)
 
     # Fetch the free subscription plan
     free_plan = await db["subscription_plans"].find_one({"payment.isFree": True})
@@ -45,10 +70,16 @@ async def register_store(store: StoreCreate):
         "hashed_password": hashed_password,
         "addresses": [],
         "subscription": subscription,
+        "search_terms": build_search_terms(store_data, STORE_FIELD_WEIGHTS),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
-    await db["stores"].insert_one(store_data)
+    try:
+        await db["stores"].insert_one(store_data)
+    except DuplicateKeyError as e:
+        # Lost a race with a concurrent registration, or the phone is already on file
+        field = duplicate_key_field(e)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{field.capitalize()} already registered")
 
     if subscription:
         subscription_id = f"subs_{generate(size=10)}"
@@ -69,7 +100,7 @@ async def register_store(store: StoreCreate):
 @router.post("/login")
 async def login_store(request: LoginRequest):
     store = await db["stores"].find_one({"email": request.email})
-    if not store or not verify_password(request.password, store["hashed_password"]):
+    if not store or not await verify_password(request.password, store["hashed_password"]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     token_data = {"sub": store["_id"]}
@@ -77,20 +108,6 @@ async def login_store(request: LoginRequest):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/stores/login")
-
-async def get_current_store(token: str = Depends(oauth2_scheme)):
-    payload = decode_jwt_token(token)
-    store_id: str = payload.get("sub")
-    if store_id is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    store = await db["stores"].find_one({"_id": store_id})
-    if store is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Store not found")
-    return store
-
 @router.get("/me", response_model=StoreResponse)
 async def get_store_profile(current_store: dict = Depends(get_current_store)):
     return StoreResponse(**current_store)
@@ -100,18 +117,24 @@ async def add_store_address(address: StoreAddress, current_store: dict = Depends
     address_id = f"adr_{generate(size=10)}"
     address_data = address.dict()
     address_data["_id"] = address_id
+    address_data["location"] = geojson_point(address.latitude, address.longitude)
     await db["stores"].update_one(
         {"_id": current_store["_id"]},
         {"$push": {"addresses": address_data}}
     )
+    await store_addresses_changed(current_store["_id"])
     return address
 
 @router.put("/addresses/{address_id}", response_model=StoreAddress)
 async def update_store_address(address_id: str, address: StoreAddress, current_store: dict = Depends(get_current_store)):
+    address_data = address.dict()
+    address_data["_id"] = address_id
+    address_data["location"] = geojson_point(address.latitude, address.longitude)
     await db["stores"].update_one(
         {"_id": current_store["_id"], "addresses._id": address_id},
-        {"$set": {"addresses.$": address.dict()}}
+        {"$set": {"addresses.$": address_data}}
     )
+    await store_addresses_changed(current_store["_id"])
     return address
 
 @router.post("/addresses/{address_id}/verify")
@@ -122,8 +145,24 @@ async def verify_store_address(address_id: str, current_store: dict = Depends(ge
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address not found or already verified")
+    await store_addresses_changed(current_store["_id"])
     return {"status": "Address verified"}
 
+@router.put("/delivery-zones", response_model=List[DeliveryZone])
+async def set_delivery_zones(zones: List[DeliveryZoneCreate], current_store: dict = Depends(get_current_store)):
+    zone_data = [{**zone.dict(), "_id": f"zone_{generate(size=10)}"} for zone in zones]
+    try:
+        await db["stores"].update_one(
+            {"_id": current_store["_id"]},
+            {"$set": {"delivery_zones": zone_data, "updated_at": datetime.utcnow()}}
+        )
+    except WriteError as e:
+        # The 2dsphere index rejects unclosed or self-intersecting polygons
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid delivery zone: {e.details.get('errmsg', e)}")
+    await principal_cache.invalidate("store", current_store["_id"])
+    await serving_store_cache.invalidate()
+    return [DeliveryZone(**zone) for zone in zone_data]
+
 @router.get("/analytics")
 async def get_analytics_report(current_store: dict = Depends(get_current_store)):
     # Placeholder: Fetch analytics report from `analytics` collection based on store ID and period
@@ -135,24 +174,31 @@ async def get_dashboard_stats(current_store: dict = Depends(get_current_store)):
     return {"total_orders": 100, "revenue": 5000.0}
 
 @router.put("/orders/{order_id}/status")
-async def update_order_status(order_id: str, status: str, current_store: dict = Depends(get_current_store)):
-    result = await db["orders"].update_one(
-        {"_id": order_id, "storeId": current_store["_id"]},
-        {"$set": {"status": status, "updatedAt": datetime.utcnow()}}
-    )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found or cannot be updated")
+async def update_order_status(order_id: str, new_status: str = Query(..., alias="status"), current_store: dict = Depends(get_current_store)):
+    await set_order_status(order_id, current_store["_id"], new_status)
     return {"status": "Order status updated"}
 
 @router.put("/me", response_model=StoreResponse)
 async def update_store_profile(store_data: StoreUpdate, current_store: dict = Depends(get_current_store)):
-    result = await db["stores"].update_one(
-        {"_id": current_store["_id"]},
-        {"$set": store_data.dict(exclude_unset=True)}
-    )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
-    updated_store = await db["stores"].find_one({"_id": current_store["_id"]})
+    update_data = store_data.dict(exclude_unset=True)
+    if "name" in update_data:
+        update_data["search_terms"] = build_search_terms(update_data, STORE_FIELD_WEIGHTS)
+    try:
+        updated_store = await update_and_fetch(
+            "stores",
+            {"_id": current_store["_id"]},
+            {"$set": update_data},
+            not_found="Store not found",
+            projection={"hashed_password": 0}
+        )
+    except DuplicateKeyError as e:
+        # The new email or phone belongs to another store
+        field = duplicate_key_field(e)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{field.capitalize()} already registered")
+    await principal_cache.invalidate("store", current_store["_id"])
+    if CARD_FIELDS & update_data.keys():
+        await nearby_store_cache.invalidate()
+        await store_spatial_index.publish_change(current_store["_id"])
     return StoreResponse(**updated_store)
 
 @router.get("/analytics/{report_id}", response_model=AnalyticsReport)
@@ -162,7 +208,22 @@ async def get_analytics_report(report_id: str, current_store: dict = Depends(get
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analytics report not found")
     return AnalyticsReport(**report)
 
+@router.get("/orders/inbox", response_model=List[OrderResponse])
+async def get_order_inbox(
+    order_status: str = Query("pending", alias="status", pattern=f"^({'|'.join(LIVE_STATUSES)})$"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_store: dict = Depends(get_current_store)
+):
+    # Live orders, oldest first, served from Redis
+    return await order_inbox.list(current_store["_id"], order_status, offset, limit)
+
+@router.get("/orders/stream")
+async def stream_store_orders(current_store: dict = Depends(get_current_store)):
+    # Server-sent events for every change to the store's orders; pair with the inbox for initial state
+    return order_stream_hub.response(f"store:{current_store['_id']}")
+
 @router.get("/orders", response_model=List[OrderResponse])
-async def get_store_orders(current_store: dict = Depends(get_current_store)):
-    orders = await db["orders"].find({"store_id": current_store["_id"]}).to_list(100)
+async def get_store_orders(response: Response, page: PageParams = Depends(), current_store: dict = Depends(get_current_store)):
+    orders = await fetch_page("orders", {"store_id": current_store["_id"]}, page, response)
     return [OrderResponse(**order) for order in orders]
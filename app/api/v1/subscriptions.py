@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from app.models.subscription import SubscriptionCreate, SubscriptionUpdate, SubscriptionResponse
 from app.utils.security import get_current_store
 from app.core.database import db
+from app.core.repository import update_and_fetch
 from datetime import datetime, timedelta
 from nanoid import generate
 
@@ -35,18 +36,13 @@ async def create_subscription(subscription_data: SubscriptionCreate, current_sto
 
 @router.put("/update", response_model=SubscriptionResponse)
 async def update_subscription(subscription_update: SubscriptionUpdate, current_store: dict = Depends(get_current_store)):
-    # Find the current active subscription for the store
-    subscription = await db["subscriptions"].find_one({"store_id": current_store["_id"], "status": "active"})
-    if not subscription:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Active subscription not found")
-    
-    # Update the subscription status
-    await db["subscriptions"].update_one(
-        {"_id": subscription["_id"]},
-        {"$set": {"status": subscription_update.status, "updated_at": datetime.utcnow()}}
+    # Update the store's current active subscription
+    updated_subscription = await update_and_fetch(
+        "subscriptions",
+        {"store_id": current_store["_id"], "status": "active"},
+        {"$set": {"status": subscription_update.status, "updated_at": datetime.utcnow()}},
+        not_found="Active subscription not found"
     )
-
-    updated_subscription = await db["subscriptions"].find_one({"_id": subscription["_id"]})
     return SubscriptionResponse(**updated_subscription)
 
 @router.get("/status", response_model=SubscriptionResponse)
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from datetime import timedelta
 from app.models.user import UserCreate, UserResponse, Address, LoginRequest
 from app.models.order import OrderResponse
-from app.utils.security import hash_password, verify_password, create_jwt_token
+from app.utils.security import hash_password, verify_password, create_jwt_token, get_current_user
+from app.services.principal_cache import principal_cache
+from app.services.delivery_zone_service import serving_store_cache, store_cards
+from app.models.store import NearbyStoreResponse
 from app.core.database import db
+from app.core.indexes import duplicate_key_field
+from pymongo.errors import DuplicateKeyError
+from app.core.pagination import PageParams, fetch_page
 from nanoid import generate
 from datetime import datetime
-from app.utils.security import decode_jwt_token
 from typing import List
 
 router = APIRouter()
@@ -18,7 +23,7 @@ async def register_user(user: UserCreate):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     
     user_id = f"usr_{generate(size=10)}"
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     user_data = user.dict()
     user_data.update({
         "_id": user_id,
@@ -28,13 +33,18 @@ async def register_user(user: UserCreate):
         "updated_at": datetime.utcnow()
     })
     
-    await db["users"].insert_one(user_data)
+    try:
+        await db["users"].insert_one(user_data)
+    except DuplicateKeyError as e:
+        # Lost a race with a concurrent registration, or the phone is already on file
+        field = duplicate_key_field(e)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{field.capitalize()} already registered")
     return UserResponse(**user_data)
 
 @router.post("/login")
 async def login_user(request: LoginRequest):
     user = await db["users"].find_one({"email": request.email})
-    if not user or not verify_password(request.password, user["hashed_password"]):
+    if not user or not await verify_password(request.password, user["hashed_password"]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     token_data = {"sub": user["_id"]}
@@ -42,24 +52,6 @@ async def login_user(request: LoginRequest):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/users/login")
-
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = decode_jwt_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        user = await db["users"].find_one({"_id": user_id})
-        if user is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
 @router.get("/me", response_model=UserResponse)
 async def get_profile(current_user: dict = Depends(get_current_user)):
     return UserResponse(**current_user)
@@ -73,6 +65,7 @@ async def add_address(address: Address, current_user: dict = Depends(get_current
         {"_id": current_user["_id"]},
         {"$push": {"addresses": address_data}}
     )
+    await principal_cache.invalidate("user", current_user["_id"])
     return address
 
 @router.put("/addresses", response_model=Address)
@@ -81,6 +74,7 @@ async def update_address(address: Address, current_user: dict = Depends(get_curr
         {"_id": current_user["_id"], "addresses._id": address._id},
         {"$set": {"addresses.$": address.dict()}}
     )
+    await principal_cache.invalidate("user", current_user["_id"])
     return address
 
 @router.delete("/addresses/{address_id}", status_code=204)
@@ -89,11 +83,21 @@ async def delete_address(address_id: str, current_user: dict = Depends(get_curre
         {"_id": current_user["_id"]},
         {"$pull": {"addresses": {"_id": address_id}}}
     )
+    await principal_cache.invalidate("user", current_user["_id"])
     return None
 
+@router.get("/addresses/{address_id}/stores", response_model=List[NearbyStoreResponse])
+async def get_serving_stores(address_id: str, limit: int = 20, current_user: dict = Depends(get_current_user)):
+    address = next((address for address in current_user.get("addresses", []) if address.get("_id") == address_id), None)
+    if not address:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Address not found")
+    store_ids = await serving_store_cache.get_store_ids(address)
+    stores = await store_cards(store_ids, address["latitude"], address["longitude"], limit)
+    return [NearbyStoreResponse(**store) for store in stores]
+
 @router.get("/orders", response_model=List[OrderResponse])
-async def get_user_orders(current_user: dict = Depends(get_current_user)):
-    orders = await db["orders"].find({"user_id": current_user["_id"]}).to_list(100)
+async def get_user_orders(response: Response, page: PageParams = Depends(), current_user: dict = Depends(get_current_user)):
+    orders = await fetch_page("orders", {"user_id": current_user["_id"]}, page, response)
     return [OrderResponse(**order) for order in orders]
 
 @router.get("/orders/{order_id}", response_model=OrderResponse)
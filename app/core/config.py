@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import List, Tuple
 
 class Settings(BaseSettings):
     port: int = 8000
@@ -9,9 +10,63 @@ class Settings(BaseSettings):
     
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
+
+    verify_query_plans: bool = False  # Refuse to start if a registered hot query would COLLSCAN
+    expose_mongo_round_trips: bool = False  # Debug only: report each request's Mongo round trips in X-Mongo-Round-Trips
+
+    principal_cache_ttl: int = 300  # Seconds, further capped by token expiry
+    principal_cache_local_ttl: int = 5  # Seconds a worker trusts its in-process copy
+    principal_cache_max_entries: int = 10000
+
+    password_hash_workers: int = 1  # bcrypt threads; match the container's CPU limit
+    password_hash_max_queue: int = 32  # Waiting hash jobs before answering 503
+
+    fuzzy_index_max_stores: int = 200  # Store catalogs each worker keeps indexed for fuzzy search
+    product_bulk_max_items: int = 5000  # Products accepted by one bulk upsert request
+    catalog_import_max_errors: int = 1000  # Row errors kept in a catalog import's report
+
+    stock_reservation_ttl: int = 900  # Seconds an unpaid order holds its stock
+    stock_reservation_sweep_interval: int = 30  # Seconds between expired reservation sweeps
+    order_inbox_rebuild_interval: int = 3600  # Seconds before a store's Redis order inbox is rebuilt from Mongo
+    order_stream_heartbeat_interval: int = 15  # Seconds between heartbeats on an idle order stream
+    order_stream_queue_size: int = 64  # Order events a stream may fall behind by before it is told to resync
+
+    outbox_dispatch_enabled: bool = False  # Send queued notifications; keep off until the templates in NOTIFICATIONS are approved
+    outbox_batch_size: int = 100  # Documents with due notifications fetched per dispatch round
+    outbox_poll_interval: int = 2  # Seconds the dispatcher waits when no notifications are due
+    outbox_lease: int = 60  # Seconds a claimed notification is hidden from other dispatchers
+    outbox_max_attempts: int = 8  # Failed sends before a notification is given up
+
+    idempotency_key_ttl: int = 86400  # Seconds a response is replayed for retries with the same Idempotency-Key
+    idempotency_lock_ttl: int = 60  # Seconds an in-flight Idempotency-Key stays claimed if its worker dies
+    idempotency_wait_timeout: float = 10  # Seconds a duplicate waits for the in-flight request before 409
+
+    webhook_batch_size: int = 200  # Due webhook events picked up per processing round
+    webhook_poll_interval: float = 1  # Seconds the webhook worker waits when idle
+    webhook_lease: int = 60  # Seconds a worker holds a payment while applying its webhook events
+    webhook_max_attempts: int = 20  # Retries for events whose payment never appears before they are orphaned
+    payment_status_max_wait: int = 30  # Longest a payment status request may wait for a change
+
+    payment_reconcile_interval: int = 900  # Seconds between reconciliation passes over stale payments
+    payment_reconcile_min_age: int = 30  # Minutes a payment must sit in `created` before it is reconciled
+    payment_reconcile_batch_size: int = 500  # Stale payments read and corrected per page
+    payment_reconcile_concurrency: int = 20  # Razorpay lookups in flight at once while reconciling
+    payment_reconcile_expire_after: int = 60  # Minutes after which a payment still unpaid at Razorpay is expired
+    payment_reconcile_max_age: int = 7  # Days after which a payment Razorpay could not be asked about is no longer retried
+
+    nearby_cache_ttl: int = 300  # Seconds a geohash cell of nearby stores stays cached
+    serving_store_cache_ttl: int = 86400  # Seconds a user address keeps its cached serving stores
+
+    # Delivery pricing by distance: (up to metres, fee in INR, ETA in minutes), ascending
+    delivery_slabs: List[Tuple[int, float, int]] = [(2000, 0.0, 20), (5000, 25.0, 30), (8000, 40.0, 40), (12000, 60.0, 55)]
     
     razorpay_api_key: str
     razorpay_api_secret: str
+    razorpay_base_url: str = "https://api.razorpay.com"  # Point at a fake gateway for tests and benchmarks
+    razorpay_connect_timeout: float = 3.0  # Seconds to open a connection to Razorpay
+    razorpay_read_timeout: float = 10.0  # Seconds to wait for a Razorpay response
+    razorpay_max_connections: int = 20  # Pooled keep-alive connections to Razorpay per worker
+    razorpay_max_retries: int = 2  # Extra attempts for retryable Razorpay calls
 
     whatsapp_secret: str
     whatsapp_token: str
@@ -19,6 +74,11 @@ class Settings(BaseSettings):
     whatsapp_store_number_id: str
     whatsapp_user_number: str
     whatsapp_user_number_id: str
+    whatsapp_base_url: str = "https://graph.facebook.com"  # Point at a fake Graph API for tests and benchmarks
+    whatsapp_http2: bool = True  # Negotiate HTTP/2 with the Graph API
+    whatsapp_max_connections: int = 10  # Open connections to the Graph API per worker
+    whatsapp_keepalive_expiry: float = 60.0  # Seconds an idle Graph API connection is kept open
+    whatsapp_timeout: float = 10.0  # Seconds allowed for one WhatsApp send
 
     base_url: str
     inference_url: str
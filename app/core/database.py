@@ -1,16 +1,30 @@
+from decimal import Decimal
+from bson.codec_options import CodecOptions, TypeCodec, TypeRegistry
+from bson.decimal128 import Decimal128
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.utils.metrics import RoundTripListener
 import redis.asyncio as aioredis
 
+class DecimalCodec(TypeCodec):
+    """
+    Stores prices as Decimal128 so they stay exact and Mongo can do arithmetic on them.
+    """
+    python_type = Decimal
+    bson_type = Decimal128
+
+    def transform_python(self, value):
+        return Decimal128(value)
+
+    def transform_bson(self, value):
+        return value.to_decimal()
+
 # MongoDB client setup
-mongo_client = AsyncIOMotorClient(settings.mongo_uri)
-db = mongo_client.get_database(name=settings.mongo_db)
+mongo_client = AsyncIOMotorClient(settings.mongo_uri, event_listeners=[RoundTripListener()])
+db = mongo_client.get_database(
+    name=settings.mongo_db,
+    codec_options=CodecOptions(type_registry=TypeRegistry([DecimalCodec()]))
+)
 
 # Redis client setup
 redis_client = aioredis.from_url(settings.redis_uri)
-
-async def create_indexes():
-    await db["stores"].create_index([("addresses.location", "2dsphere")])
-    await db["products"].create_index([("store_id", 1)])
-    await db["orders"].create_index([("store_id", 1)])
-    await db["orders"].create_index([("user_id", 1)])
\ No newline at end of file
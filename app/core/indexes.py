@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.core.database import db
+from app.utils.logger import logger
+
+# Sort shared by list endpoints: newest first, _id breaking ties
+NEWEST_FIRST = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# Uniques only constrain documents that actually carry the field
+HAS_EMAIL = {"email": {"$type": "string"}}
+HAS_PHONE = {"phone": {"$type": "string"}}
+
+# Due notifications; only documents with one pending are indexed
+OUTBOX_INDEX = IndexModel(
+    [("outbox.status", ASCENDING), ("outbox.available_at", ASCENDING)],
+    partialFilterExpression={"outbox.status": "pending"}
+)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, partialFilterExpression=HAS_EMAIL),
+        IndexModel([("phone", ASCENDING)], unique=True, partialFilterExpression=HAS_PHONE)
+    ],
+    "stores": [
+        IndexModel([("email", ASCENDING)], unique=True, partialFilterExpression=HAS_EMAIL),
+        IndexModel([("phone", ASCENDING)], unique=True, partialFilterExpression=HAS_PHONE),
+        IndexModel([("verified_locations", "2dsphere")]),
+        IndexModel([("delivery_zones.area", "2dsphere")]),
+        IndexModel([("search_terms", ASCENDING)])
+    ],
+    "products": [
+        IndexModel([("store_id", ASCENDING)] + NEWEST_FIRST),
+        IndexModel([("search_terms", ASCENDING)]),
+        IndexModel(
+            [("store_id", ASCENDING), ("external_code", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"external_code": {"$type": "string"}}
+        )
+    ],
+    "orders": [
+        IndexModel([("user_id", ASCENDING)] + NEWEST_FIRST),
+        IndexModel([("store_id", ASCENDING)] + NEWEST_FIRST),
+        # Rebuilding a store's order inbox
+        IndexModel([("store_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        OUTBOX_INDEX
+    ],
+    "payments": [
+        IndexModel([("razorpay_order_id", ASCENDING)], unique=True, partialFilterExpression={"razorpay_order_id": {"$type": "string"}}),
+        IndexModel([("order_id", ASCENDING)]),
+        # Reconciliation's keyset walk over stale payments
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        OUTBOX_INDEX
+    ],
+    "subscriptions": [
+        IndexModel([("store_id", ASCENDING), ("status", ASCENDING)])
+    ],
+    "inventory": [
+        IndexModel([("store_id", ASCENDING)] + NEWEST_FIRST)
+    ],
+    "analytics": [
+        IndexModel([("store_id", ASCENDING), ("period", ASCENDING), ("created_at", DESCENDING)])
+    ],
+    "catalog_imports": [
+        IndexModel([("store_id", ASCENDING), ("created_at", DESCENDING)])
+    ],
+    "webhook_events": [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+        IndexModel([("razorpay_order_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING), ("received_at", ASCENDING)]),
+        IndexModel([("purge_at", ASCENDING)], expireAfterSeconds=0)
+    ],
+    "stock_reservations": [
+        IndexModel([("order_id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)]),
+        IndexModel([("purge_at", ASCENDING)], expireAfterSeconds=0)
+    ]
+}
+
+# (collection, filter, sort) for each hot query, with representative values
+HOT_QUERIES: List[Tuple[str, dict, Optional[list]]] = [
+    ("users", {"email": "probe@example.com"}, None),
+    ("users", {"phone": "9000000000"}, None),
+    ("stores", {"email": "probe@example.com"}, None),
+    ("stores", {"phone": "9000000000"}, None),
+    ("stores", {"search_terms": {"$in": ["atta"]}}, None),
+    ("products", {"store_id": "str_probe"}, NEWEST_FIRST),
+    ("products", {"search_terms": {"$all": ["atta"]}}, None),
+    ("products", {"store_id": "str_probe", "external_code": {"$in": ["POS-1"]}}, None),
+    ("orders", {"user_id": "usr_probe"}, NEWEST_FIRST),
+    ("orders", {"store_id": "str_probe"}, NEWEST_FIRST),
+    # A deep page of a keyset listing
+    ("orders", {
+        "store_id": "str_probe",
+        "created_at": {"$lte": datetime(2000, 1, 1)},
+        "$or": [{"created_at": {"$lt": datetime(2000, 1, 1)}}, {"_id": {"$lt": "ord_probe"}}]
+    }, NEWEST_FIRST),
+    ("orders", {"store_id": "str_probe", "status": {"$in": ["pending", "accepted", "dispatched"]}}, None),
+    ("orders", {"store_id": "str_probe", "status": "pending"}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    ("payments", {"razorpay_order_id": "order_probe"}, None),
+    ("payments", {
+        "status": "created",
+        "created_at": {"$lt": datetime(2000, 1, 1)},
+        "$or": [{"created_at": {"$gt": datetime(1999, 1, 1)}}, {"created_at": datetime(1999, 1, 1), "_id": {"$gt": "pay_probe"}}]
+    }, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    *(
+        (collection, {"outbox.status": "pending", "outbox": {"$elemMatch": {"status": "pending", "available_at": {"$lte": datetime(2000, 1, 1)}}}}, None)
+        for collection in ("orders", "payments")
+    ),
+    ("subscriptions", {"store_id": "str_probe", "status": "active"}, None),
+    ("subscriptions", {"store_id": "str_probe", "status": {"$in": ["active", "trial"]}}, None),
+    ("inventory", {"store_id": "str_probe"}, NEWEST_FIRST),
+    ("analytics", {"store_id": "str_probe", "period": "weekly"}, None),
+    ("catalog_imports", {"store_id": "str_probe"}, [("created_at", DESCENDING)]),
+    ("webhook_events", {"status": "pending", "available_at": {"$lte": datetime(2000, 1, 1)}}, [("available_at", ASCENDING)]),
+    ("webhook_events", {"razorpay_order_id": "order_probe", "status": "pending"}, [("created_at", ASCENDING), ("received_at", ASCENDING)]),
+    ("stock_reservations", {"status": "held", "expires_at": {"$lte": datetime(2000, 1, 1)}}, None)
+]
+
+
+def duplicate_key_field(error: DuplicateKeyError) -> str:
+    """
+    The field whose unique index `error` violated, e.g. "phone".
+    """
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return next(iter(key_pattern), "value")
+
+
+async def ensure_indexes():
+    """
+    Creates every registered index. Creating an index that already exists with the same
+    options is a no-op, so this runs on every startup.
+
+    Indexes are created one at a time, so one that cannot be built, typically a unique
+    index blocked by existing duplicates, leaves the rest of its collection's indexes in place.
+    """
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection].create_indexes([index])
+            except OperationFailure as e:
+                logger.error(f"Could not create index {index.document['name']} on {collection}: {e}")
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """
+    Every stage name in an explain plan tree, classic or slot-based engine.
+    """
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan", "innerStage", "outerStage"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+async def verify_query_plans() -> List[str]:
+    """
+    Explains each hot query and returns a description of every one that scans a whole
+    collection. Empty means every hot query is served by an index.
+    """
+    collscans = []
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        if "COLLSCAN" in plan_stages(explanation["queryPlanner"]["winningPlan"]):
+            collscans.append(f"{collection} {query} sort={sort}")
+    return collscans
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+
+from app.core.database import db
+from app.core.indexes import NEWEST_FIRST
+
+EPOCH = datetime(1970, 1, 1)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(document: dict) -> str:
+    """
+    Opaque position after `document` in newest-first order.
+    """
+    created_at = document["created_at"].replace(tzinfo=None)
+    milliseconds = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw = json.dumps([milliseconds, document["_id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        milliseconds, document_id = json.loads(raw)
+        return EPOCH + timedelta(milliseconds=int(milliseconds)), str(document_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+async def fetch_page(collection: str, query: dict, page: PageParams, response: Response, projection: Optional[dict] = None) -> List[dict]:
+    """
+    One page of `query` newest first. The position is a keyset over (created_at, _id),
+    so any page costs the same index seek however deep it is. Sets X-Next-Cursor when
+    there are more results.
+    """
+    if page.cursor:
+        created_at, document_id = decode_cursor(page.cursor)
+        # Bounding created_at keeps this a single index range; the $or only breaks ties
+        query = {
+            **query,
+            "created_at": {"$lte": created_at},
+            "$or": [{"created_at": {"$lt": created_at}}, {"_id": {"$lt": document_id}}]
+        }
+    documents = await db[collection].find(query, projection).sort(NEWEST_FIRST).limit(page.limit + 1).to_list(page.limit + 1)
+    if len(documents) > page.limit:
+        documents = documents[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(documents[-1])
+    return documents
@@ -1,4 +1,126 @@
+import asyncio
+import random
+from typing import Optional
+
+import httpx
 import razorpay
+
 from app.core.config import settings
+from app.utils.logger import logger
 
+# Signature checks only; they are local HMACs and never touch the network
 razorpay_client = razorpay.Client(auth=(settings.razorpay_api_key, settings.razorpay_api_secret))
+
+# Gateway answers worth retrying: rate limited or a transient server fault
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PaymentGatewayError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RazorpayGateway:
+    def __init__(
+        self,
+        key_id: str,
+        key_secret: str,
+        base_url: str,
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        max_retries: int,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Async client for the Razorpay REST API over one pooled keep-alive connection set.
+
+        Every call has explicit connect and read timeouts. A request that never reached
+        Razorpay (connect failure) is always retried; one that may have been applied
+        (read timeout, 5xx, 429) is retried only when it is idempotent, i.e. a read. Retries
+        back off exponentially with full jitter. Point `base_url` or `transport` at a fake
+        server to test without the real gateway.
+        """
+        self.max_retries = max_retries
+        self._client_options = {
+            "base_url": base_url,
+            "auth": (key_id, key_secret),
+            "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            "transport": transport
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so the pool binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self._client_options)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        return random.uniform(0, min(0.2 * 2 ** attempt, 5.0))
+
+    async def _request(self, method: str, path: str, *, idempotent: bool, json: Optional[dict] = None) -> dict:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.request(method, path, json=json)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if last_attempt:
+                    raise PaymentGatewayError(f"Razorpay unreachable: {e!r}")
+            except httpx.TransportError as e:
+                if last_attempt or not idempotent:
+                    raise PaymentGatewayError(f"Razorpay request failed: {e!r}")
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if last_attempt or not idempotent or response.status_code not in RETRYABLE_STATUSES:
+                    try:
+                        description = response.json()["error"]["description"]
+                    except (ValueError, KeyError, TypeError):
+                        description = response.text
+                    raise PaymentGatewayError(description, status_code=response.status_code)
+            delay = self.backoff(attempt)
+            logger.warning(f"Retrying Razorpay {method} {path} in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+    async def create_order(self, amount: int, currency: str, receipt: str) -> dict:
+        """
+        Creates an order for `amount` in the currency's smallest unit (paise for INR).
+        """
+        return await self._request(
+            "POST", "/v1/orders", idempotent=False,
+            json={"amount": amount, "currency": currency, "receipt": receipt, "payment_capture": 1}
+        )
+
+    async def fetch_order(self, order_id: str) -> dict:
+        return await self._request("GET", f"/v1/orders/{order_id}", idempotent=True)
+
+    async def fetch_order_payments(self, order_id: str) -> dict:
+        return await self._request("GET", f"/v1/orders/{order_id}/payments", idempotent=True)
+
+
+payment_gateway = RazorpayGateway(
+    key_id=settings.razorpay_api_key,
+    key_secret=settings.razorpay_api_secret,
+    base_url=settings.razorpay_base_url,
+    connect_timeout=settings.razorpay_connect_timeout,
+    read_timeout=settings.razorpay_read_timeout,
+    max_connections=settings.razorpay_max_connections,
+    max_retries=settings.razorpay_max_retries
+)
+
+
+def get_payment_gateway() -> RazorpayGateway:
+    """
+    Dependency for routes that call Razorpay; override it to use a fake gateway.
+    """
+    return payment_gateway
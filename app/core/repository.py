@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+
+from app.core.database import db
+
+
+async def update_and_fetch(
+    collection: str,
+    query: dict,
+    update,
+    *,
+    not_found: str,
+    precondition: Optional[dict] = None,
+    precondition_failed: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> dict:
+    """
+    Applies `update` to the document matching `query` and `precondition` and returns it as
+    updated, in one round trip.
+
+    Only when nothing matched does a second read tell a missing document (404
+    `not_found`) from one that failed the precondition (400 `precondition_failed`), so the
+    check and the write can never race.
+    """
+    document = await db[collection].find_one_and_update(
+        {**query, **(precondition or {})},
+        update,
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if document is not None:
+        return document
+    if precondition and await db[collection].count_documents(query, limit=1):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=precondition_failed or "Precondition failed")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
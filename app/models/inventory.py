@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -73,4 +73,35 @@ class InventoryUpdateResponse(BaseModel):
         if value.as_tuple().exponent < -2:
             raise ValueError("Price must have at most two decimal places")
         return value
-    
\ No newline at end of file
+    
+
+class InventoryItemPatch(BaseModel):
+    sku_id: str
+    quantity: Optional[int] = None
+    quantity_delta: Optional[int] = None  # Relative change, safe against concurrent adjustments
+    price: Optional[Decimal] = None
+
+    @field_validator("price")
+    def validate_price(cls, value):
+        if value is not None and value.as_tuple().exponent < -2:
+            raise ValueError("Price must have at most two decimal places")
+        return value
+
+    @model_validator(mode="after")
+    def validate_change(self):
+        if self.quantity is not None and self.quantity_delta is not None:
+            raise ValueError("Set either quantity or quantity_delta, not both")
+        if self.quantity is None and self.quantity_delta is None and self.price is None:
+            raise ValueError("Nothing to change")
+        if self.quantity is not None and self.quantity < 0:
+            raise ValueError("Quantity cannot be negative")
+        return self
+
+class PatchInventory(BaseModel):
+    items: List[InventoryItemPatch] = Field(..., min_length=1)
+
+    @field_validator("items")
+    def validate_unique_skus(cls, value):
+        if len({item.sku_id for item in value}) != len(value):
+            raise ValueError("Each sku_id may appear only once")
+        return value
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -21,13 +21,13 @@ class OrderCreate(BaseModel):
     items: List[OrderItem]
     subtotal: Decimal
     platform_fee: Decimal
-    delivery_fee: Decimal
+    delivery_fee: Optional[Decimal] = None  # Ignored; priced server-side from distance
     total: Decimal
     delivery_address: dict
 
     @field_validator("subtotal", "platform_fee", "delivery_fee", "total")
     def validate_price(cls, value):
-        if value.as_tuple().exponent < -2:
+        if value is not None and value.as_tuple().exponent < -2:
             raise ValueError("Price must have at most two decimal places")
         return value
 
@@ -42,6 +42,8 @@ class OrderResponse(BaseModel):
     delivery_fee: Decimal
     total: Decimal
     payment_status: str
+    eta_minutes: Optional[int] = None
+    reservation_expires_at: Optional[datetime] = None  # Unpaid orders are cancelled after this
     created_at: datetime
     updated_at: datetime
 
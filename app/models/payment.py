@@ -21,8 +21,8 @@ class PaymentResponse(BaseModel):
     store_id: Optional[str] = None  # For subscription payments
     amount: Decimal
     currency: str
-    razorpay_payment_id: Optional[str]
-    razorpay_order_id: Optional[str]
+    razorpay_payment_id: Optional[str] = None
+    razorpay_order_id: Optional[str] = None
     status: str
     created_at: datetime
     updated_at: datetime
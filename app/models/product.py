@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
@@ -25,8 +25,36 @@ class ProductCreate(BaseModel):
     category: str
     sub_category: Optional[str]
     brand: Optional[str]
+    external_code: Optional[str] = None  # The store's own SKU/catalog code, unique per store
     skus: List[SKU]
 
+class SKUUpsert(SKU):
+    id: Optional[str] = Field(None, alias="_id")
+
+class ProductUpsert(ProductCreate):
+    id: Optional[str] = Field(None, alias="_id")
+    skus: List[SKUUpsert]
+
+    @model_validator(mode="after")
+    def validate_key(self):
+        if not self.id and not self.external_code:
+            raise ValueError("Either _id or external_code is required")
+        return self
+
+class BulkUpsertItemResult(BaseModel):
+    index: int
+    status: str  # created, updated or failed
+    product_id: Optional[str] = None
+    external_code: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkUpsertResponse(BaseModel):
+    total: int
+    created: int
+    updated: int
+    failed: int
+    results: List[BulkUpsertItemResult]
+
 class ProductResponse(BaseModel):
     id: str = Field(..., alias="_id")
     store_id: str
@@ -35,7 +63,28 @@ class ProductResponse(BaseModel):
     category: str
     sub_category: Optional[str]
     brand: Optional[str]
+    external_code: Optional[str] = None
     skus: List[SKU]
     is_active: bool
     created_at: datetime
     updated_at: datetime
+
+class CatalogImportRowError(BaseModel):
+    row: int
+    external_code: Optional[str] = None
+    error: str
+
+class CatalogImportResponse(BaseModel):
+    id: str = Field(..., alias="_id")
+    store_id: str
+    format: str
+    status: str  # running, completed or failed
+    rows_read: int
+    processed: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[CatalogImportRowError]
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -1,12 +1,29 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
+from decimal import Decimal
+
+class GeoPoint(BaseModel):
+    type: str = "Point"
+    coordinates: List[float]  # [longitude, latitude]
+
+class GeoPolygon(BaseModel):
+    type: str = "Polygon"
+    coordinates: List[List[List[float]]]  # Closed rings of [longitude, latitude]
+
+class DeliveryZoneCreate(BaseModel):
+    name: str
+    area: GeoPolygon
+
+class DeliveryZone(DeliveryZoneCreate):
+    id: str = Field(..., alias="_id")
 
 class StoreAddress(BaseModel):
     id: str = Field(..., alias="_id")
     address: str
     latitude: float
     longitude: float
+    location: Optional[GeoPoint] = None  # Derived from latitude/longitude on write
     is_verified: bool = False
     verification_status: str = "pending"
     verified_at: Optional[datetime]
@@ -33,10 +50,21 @@ class StoreResponse(BaseModel):
     gstin: Optional[str]
     description: Optional[str]
     addresses: List[StoreAddress]
+    delivery_zones: List[DeliveryZone] = []
     subscription: Optional[Subscription]
     created_at: datetime
     updated_at: datetime
 
+class NearbyStoreResponse(BaseModel):
+    id: str = Field(..., alias="_id")
+    name: str
+    phone: str
+    description: Optional[str] = None
+    distance: float  # Metres to the closest store address
+    location: GeoPoint  # The closest store address
+    delivery_fee: Optional[Decimal] = None  # None when beyond the last delivery slab
+    eta_minutes: Optional[int] = None
+
 class StoreUpdate(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = None
@@ -0,0 +1,247 @@
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from nanoid import generate
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.catalog_service import BULK_WRITE_CHUNK_SIZE, summarize_results, upsert_product_chunk
+from app.services.fuzzy_search import fuzzy_index_registry
+from app.utils.logger import logger
+
+# A line this long without a newline is not a catalog export; refuse it rather than buffer it
+MAX_LINE_CHARS = 1 << 20
+
+PRODUCT_COLUMNS = {
+    "product_id": "_id",
+    "external_code": "external_code",
+    "name": "name",
+    "description": "description",
+    "category": "category",
+    "sub_category": "sub_category",
+    "brand": "brand"
+}
+SKU_COLUMNS = {
+    "sku_id": "_id",
+    "sku_name": "name",
+    "price": "price",
+    "mrp": "mrp",
+    "unit": "unit",
+    "quantity": "quantity",
+    "in_stock": "in_stock",
+    "stock_count": "stock_count"
+}
+REQUIRED_CSV_COLUMNS = ("name", "category", "sku_name", "price", "mrp", "unit", "quantity", "in_stock", "stock_count")
+
+# (row number, raw product, row error)
+ImportRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+def bad_file(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Decodes a UTF-8 byte stream into numbered lines without holding more than one line.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_number = 0
+    try:
+        async for chunk in chunks:
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                line_number += 1
+                yield line_number, line.rstrip("\r")
+            if len(pending) > MAX_LINE_CHARS:
+                raise bad_file(f"Line {line_number + 1} is longer than {MAX_LINE_CHARS} characters")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise bad_file(f"Line {line_number + 1} is not valid UTF-8")
+    if pending:
+        yield line_number + 1, pending.rstrip("\r")
+
+
+def blank_to_none(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+async def iter_csv_rows(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Yields (line number, row) for each CSV record. Quoted fields may span lines.
+    """
+    header = None
+    record_lines: List[str] = []
+    record_start = 0
+    quotes = 0
+    async for line_number, line in lines:
+        if not record_lines:
+            record_start = line_number
+        record_lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        record = "\n".join(record_lines)
+        record_lines, quotes = [], 0
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            missing = [column for column in REQUIRED_CSV_COLUMNS if column not in header]
+            if "product_id" not in header and "external_code" not in header:
+                missing.append("external_code")
+            if missing:
+                raise bad_file(f"CSV header is missing columns: {', '.join(missing)}")
+            continue
+        yield record_start, dict(zip(header, values))
+
+    if record_lines:
+        raise bad_file(f"Unterminated quoted field starting on line {record_start}")
+
+
+async def iter_csv_products(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[ImportRow]:
+    """
+    Groups CSV rows, one per SKU, into products. Rows of one product share its
+    product_id/external_code and must be adjacent, as POS exports list them.
+    """
+    product, product_row, product_key = None, 0, None
+    async for row_number, row in iter_csv_rows(lines):
+        key = (blank_to_none(row.get("product_id")), blank_to_none(row.get("external_code")))
+        sku = {field: blank_to_none(row.get(column)) for column, field in SKU_COLUMNS.items()}
+        if product is not None and key == product_key and any(key):
+            product["skus"].append(sku)
+            continue
+        if product is not None:
+            yield product_row, product, None
+        product = {field: blank_to_none(row.get(column)) for column, field in PRODUCT_COLUMNS.items()}
+        product["skus"] = [sku]
+        product_row, product_key = row_number, key
+    if product is not None:
+        yield product_row, product, None
+
+
+async def iter_ndjson_products(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[ImportRow]:
+    """
+    One product per line, shaped like the bulk upsert payload.
+    """
+    async for line_number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(item, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, item, None
+
+
+IMPORT_PARSERS = {"csv": iter_csv_products, "ndjson": iter_ndjson_products}
+
+
+async def record_progress(import_id: str, results: List[dict], rows_read: int):
+    counts = summarize_results(results)
+    errors = [
+        {"row": result["index"], "external_code": result.get("external_code"), "error": result["error"]}
+        for result in results
+        if result["status"] == "failed"
+    ]
+    await db["catalog_imports"].update_one(
+        {"_id": import_id},
+        {
+            "$inc": {
+                "processed": counts["total"],
+                "created": counts["created"],
+                "updated": counts["updated"],
+                "failed": counts["failed"]
+            },
+            "$push": {"errors": {"$each": errors, "$slice": settings.catalog_import_max_errors}},
+            "$set": {"rows_read": rows_read, "updated_at": datetime.utcnow()}
+        }
+    )
+    return counts
+
+
+async def run_catalog_import(store_id: str, import_format: str, chunks: AsyncIterator[bytes]) -> dict:
+    """
+    Streams a CSV or NDJSON catalog into the store's products, upserting by product id or
+    external code in bulk_write chunks as rows arrive. Progress, including `rows_read`, the
+    file lines consumed so far, and the first `catalog_import_max_errors` row errors are kept
+    on the catalog_imports document, which is returned once the stream ends.
+    """
+    now = datetime.utcnow()
+    import_id = f"imp_{generate(size=10)}"
+    await db["catalog_imports"].insert_one({
+        "_id": import_id,
+        "store_id": store_id,
+        "format": import_format,
+        "status": "running",
+        "rows_read": 0,
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "failed": 0,
+        "errors": [],
+        "created_at": now,
+        "updated_at": now
+    })
+
+    batch: List[Tuple[int, dict]] = []
+    failures: List[dict] = []
+    rows_read = 0
+    changed = 0
+
+    async def counted(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, str]]:
+        # Counted as the parser consumes them, so a product spanning several rows counts them all
+        nonlocal rows_read
+        async for line_number, line in lines:
+            rows_read = line_number
+            yield line_number, line
+
+    async def flush():
+        nonlocal batch, failures, changed
+        results = failures + (await upsert_product_chunk(store_id, batch) if batch else [])
+        counts = await record_progress(import_id, results, rows_read)
+        changed += counts["created"] + counts["updated"]
+        batch, failures = [], []
+
+    try:
+        async for row_number, item, error in IMPORT_PARSERS[import_format](counted(iter_lines(chunks))):
+            if error is not None:
+                failures.append({"index": row_number, "status": "failed", "error": error})
+            else:
+                batch.append((row_number, item))
+            if len(batch) + len(failures) >= BULK_WRITE_CHUNK_SIZE:
+                await flush()
+        if batch or failures:
+            await flush()
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else "Import aborted"
+        logger.warning(f"Catalog import {import_id} for {store_id} failed after {rows_read} rows: {e}")
+        await db["catalog_imports"].update_one(
+            {"_id": import_id},
+            {"$set": {"status": "failed", "error": detail, "updated_at": datetime.utcnow()}}
+        )
+        raise
+    finally:
+        if changed:
+            await fuzzy_index_registry.invalidate(store_id)
+
+    return await db["catalog_imports"].find_one_and_update(
+        {"_id": import_id},
+        {"$set": {"status": "completed", "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
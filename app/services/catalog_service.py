@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from nanoid import generate
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.database import db
+from app.models.product import ProductUpsert
+from app.services.search_service import PRODUCT_FIELD_WEIGHTS, build_search_terms
+
+# Operations per bulk_write; also bounds what one chunk holds in memory
+BULK_WRITE_CHUNK_SIZE = 500
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'item'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def match_skus(product: ProductUpsert, existing_skus: List[dict]) -> List[dict]:
+    """
+    SKU documents for a bulk upsert. SKUs sent without an id keep the id of the existing
+    SKU with the same name and unit, so carts, orders and reservations still resolve;
+    only new SKUs get a new id. Stock held by open reservations stays attached.
+    """
+    by_id = {sku["_id"]: sku for sku in existing_skus}
+    by_name = {(sku.get("name"), sku.get("unit")): sku for sku in existing_skus}
+    skus = []
+    for sku in product.skus:
+        match = by_id.get(sku.id) if sku.id else by_name.pop((sku.name, sku.unit), None)
+        fields = sku.dict(by_alias=True)
+        fields["_id"] = sku.id or (match["_id"] if match else f"sku_{generate(size=10)}")
+        if match and match.get("held_by"):
+            fields["held_by"] = match["held_by"]
+        skus.append(fields)
+    return skus
+
+
+def product_fields(product: ProductUpsert, existing_skus: List[dict]) -> dict:
+    """
+    Fields a bulk upsert sets on the product document. Optional fields left out of the
+    item, like `external_code` on an `_id`-keyed update, are left as they are.
+    """
+    fields = product.dict(exclude={"id", "skus"}, exclude_unset=True)
+    fields["skus"] = match_skus(product, existing_skus)
+    fields["search_terms"] = build_search_terms(fields, PRODUCT_FIELD_WEIGHTS)
+    fields["updated_at"] = datetime.utcnow()
+    return fields
+
+
+def validate_items(items: List[Tuple[int, dict]]) -> Tuple[List[Tuple[int, ProductUpsert]], List[dict]]:
+    """
+    Splits raw items into validated products and failed results.
+    """
+    products, failures = [], []
+    for index, item in items:
+        try:
+            products.append((index, ProductUpsert.model_validate(item)))
+        except ValidationError as e:
+            failures.append({"index": index, "status": "failed", "error": validation_message(e)})
+    return products, failures
+
+
+async def upsert_product_chunk(store_id: str, items: List[Tuple[int, dict]]) -> List[dict]:
+    """
+    Upserts one chunk of a store's products with a single unordered bulk_write and returns
+    a result per item, in input order.
+
+    Items carrying `_id` update that product and fail if the store has no such product.
+    Items carrying only `external_code` update the product with that code, or create it.
+    """
+    products, failures = validate_items(items)
+    results: Dict[int, dict] = {failure["index"]: failure for failure in failures}
+
+    ids = [product.id for _, product in products if product.id]
+    codes = [product.external_code for _, product in products if not product.id]
+    existing_ids, id_by_code, skus_by_id = set(), {}, {}
+    if products:
+        async for existing in db["products"].find(
+            {"store_id": store_id, "$or": [{"_id": {"$in": ids}}, {"external_code": {"$in": codes}}]},
+            {"_id": 1, "external_code": 1, "skus._id": 1, "skus.name": 1, "skus.unit": 1, "skus.held_by": 1}
+        ):
+            existing_ids.add(existing["_id"])
+            skus_by_id[existing["_id"]] = existing.get("skus", [])
+            if existing.get("external_code"):
+                id_by_code[existing["external_code"]] = existing["_id"]
+
+    operations, operation_items = [], []
+    seen_codes = set()
+    now = datetime.utcnow()
+    for index, product in products:
+        result = {"index": index, "external_code": product.external_code}
+        results[index] = result
+        if product.external_code is not None:
+            if product.external_code in seen_codes:
+                result.update(status="failed", error="Duplicate external_code in this batch")
+                continue
+            seen_codes.add(product.external_code)
+
+        existing_id = product.id or id_by_code.get(product.external_code)
+        fields = product_fields(product, skus_by_id.get(existing_id, []))
+        if product.id:
+            if product.id not in existing_ids:
+                result.update(status="failed", product_id=product.id, error="Product not found")
+                continue
+            result.update(status="updated", product_id=product.id)
+            operations.append(UpdateOne({"_id": product.id, "store_id": store_id}, {"$set": fields}))
+        elif product.external_code in id_by_code:
+            result.update(status="updated", product_id=id_by_code[product.external_code])
+            operations.append(UpdateOne(
+                {"store_id": store_id, "external_code": product.external_code},
+                {"$set": fields}
+            ))
+        else:
+            product_id = f"prd_{generate(size=10)}"
+            result.update(status="created", product_id=product_id)
+            operations.append(UpdateOne(
+                {"store_id": store_id, "external_code": product.external_code},
+                {
+                    "$set": fields,
+                    "$setOnInsert": {"_id": product_id, "store_id": store_id, "is_active": True, "created_at": now}
+                },
+                upsert=True
+            ))
+        operation_items.append(index)
+
+    if operations:
+        try:
+            await db["products"].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                result = results[operation_items[error["index"]]]
+                result.update(status="failed", error=error.get("errmsg", "Write failed"))
+
+    return [results[index] for index, _ in items]
+
+
+def summarize_results(results: List[dict]) -> dict:
+    counts = {"created": 0, "updated": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {"total": len(results), **counts, "results": results}
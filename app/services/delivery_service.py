@@ -0,0 +1,48 @@
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class DeliveryQuoter:
+    def __init__(self, slabs: List[Tuple[int, float, int]]):
+        """
+        Prices deliveries from distance slabs.
+
+        Args:
+            slabs (List[Tuple[int, float, int]]): (up to metres, fee, ETA minutes), ascending by
+                distance. Anything beyond the last slab is not deliverable.
+        """
+        slabs = sorted(slabs)
+        self._limits = np.array([slab[0] for slab in slabs], dtype=np.float64)
+        self._fees = np.array([slab[1] for slab in slabs], dtype=np.float64)
+        self._etas = np.array([slab[2] for slab in slabs], dtype=np.int64)
+
+    @property
+    def max_distance(self) -> float:
+        return float(self._limits[-1])
+
+    def quote(self, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns (fees, eta_minutes, deliverable) arrays for an array of distances in metres.
+        Fee and ETA are meaningless where `deliverable` is False.
+        """
+        slab = np.searchsorted(self._limits, distances, side="left")
+        deliverable = slab < len(self._limits)
+        slab = np.minimum(slab, len(self._limits) - 1)
+        return self._fees[slab], self._etas[slab], deliverable
+
+    @staticmethod
+    def fee_amount(fee: float) -> Decimal:
+        return Decimal(str(round(float(fee), 2))).quantize(Decimal("0.01"))
+
+    def quote_one(self, distance: float) -> Optional[Tuple[Decimal, int]]:
+        fees, etas, deliverable = self.quote(np.array([distance]))
+        if not deliverable[0]:
+            return None
+        return self.fee_amount(fees[0]), int(etas[0])
+
+
+delivery_quoter = DeliveryQuoter(slabs=settings.delivery_slabs)
@@ -0,0 +1,96 @@
+import json
+from typing import List
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import db, redis_client
+from app.services.nearby_service import STORE_CARD_PROJECTION, rank_by_distance
+from app.utils.geo import geojson_point
+from app.utils.logger import logger
+
+GENERATION_KEY = "delivery_zones:generation"
+
+# Serving stores returned for one point; bounds the ids cached per address and the cards fetched
+MAX_SERVING_STORES = 500
+
+
+async def stores_delivering_to(latitude: float, longitude: float) -> List[str]:
+    """
+    Ids of stores with a delivery zone containing the point, at most MAX_SERVING_STORES.
+    Past the cap, the nearest by verified address are kept.
+    """
+    point = geojson_point(latitude, longitude)
+    in_zone = {"delivery_zones.area": {"$geoIntersects": {"$geometry": point}}}
+    stores = await db["stores"].find(in_zone, {"_id": 1}) \
+        .limit(MAX_SERVING_STORES + 1).to_list(MAX_SERVING_STORES + 1)
+    if len(stores) > MAX_SERVING_STORES:
+        # Rare, and dense enough that walking outward from the point finds the cap quickly
+        logger.warning(f"More than {MAX_SERVING_STORES} stores deliver to {latitude},{longitude}; serving the nearest {MAX_SERVING_STORES}")
+        stores = await db["stores"].aggregate([
+            {
+                "$geoNear": {
+                    "near": point,
+                    "key": "verified_locations",
+                    "distanceField": "distance",
+                    "query": in_zone,
+                    "spherical": True
+                }
+            },
+            {"$limit": MAX_SERVING_STORES},
+            {"$project": {"_id": 1}}
+        ]).to_list(MAX_SERVING_STORES)
+    return [store["_id"] for store in stores]
+
+
+async def store_cards(store_ids: List[str], latitude: float, longitude: float, limit: int) -> List[dict]:
+    """
+    Cards for the given stores, nearest verified address first.
+    """
+    if not store_ids:
+        return []
+    cards = await db["stores"].find({"_id": {"$in": store_ids}}, STORE_CARD_PROJECTION).to_list(len(store_ids))
+    return rank_by_distance(cards, latitude, longitude, float("inf"), limit)
+
+
+class ServingStoreCache:
+    def __init__(self, ttl: int):
+        """
+        Caches, per saved user address, the ids of the stores whose zones cover it.
+
+        Keys carry the address coordinates, so editing an address misses naturally, and a
+        zone generation counter, so any store changing its zones recomputes every address
+        on its next read and nothing else ever does.
+        """
+        self.ttl = ttl
+
+    async def get_store_ids(self, address: dict) -> List[str]:
+        latitude, longitude = address["latitude"], address["longitude"]
+        try:
+            generation = int(await redis_client.get(GENERATION_KEY) or 0)
+            key = f"serving:{generation}:{address['_id']}:{latitude:.6f},{longitude:.6f}"
+            cached = await redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Serving store cache read failed: {e}")
+            return await stores_delivering_to(latitude, longitude)
+        if cached is not None:
+            return json.loads(cached)
+
+        store_ids = await stores_delivering_to(latitude, longitude)
+        try:
+            await redis_client.set(key, json.dumps(store_ids), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Serving store cache write failed: {e}")
+        return store_ids
+
+    async def invalidate(self):
+        """
+        Call after any store's delivery zones change.
+        """
+        try:
+            await redis_client.incr(GENERATION_KEY)
+        except RedisError as e:
+            logger.warning(f"Serving store cache invalidation failed: {e}")
+
+
+serving_store_cache = ServingStoreCache(ttl=settings.serving_store_cache_ttl)
@@ -0,0 +1,299 @@
+import asyncio
+import heapq
+import re
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import db, redis_client
+from app.services.search_service import tokenize
+from app.utils.logger import logger
+
+# Spelling variants that should match each other. The first entry of each group is the
+# canonical form; every variant is indexed so typos of any of them still land nearby.
+SYNONYM_GROUPS = [
+    ["onion", "pyaaz", "pyaz", "piyaz", "piyaaz", "pyaj", "kanda"],
+    ["potato", "aloo", "alu", "batata"],
+    ["tomato", "tamatar", "tamater", "tamaatar"],
+    ["rice", "chawal", "chaawal"],
+    ["flour", "atta", "aata"],
+    ["lentils", "dal", "daal", "dhal"],
+    ["milk", "doodh", "dudh"],
+    ["curd", "dahi", "yogurt", "yoghurt"],
+    ["sugar", "cheeni", "chini", "shakkar"],
+    ["salt", "namak"],
+    ["ginger", "adrak"],
+    ["garlic", "lahsun", "lehsun", "lasun"],
+    ["chilli", "chili", "mirch", "mirchi"],
+    ["coriander", "dhania", "dhaniya"],
+    ["turmeric", "haldi"],
+    ["cumin", "jeera", "jira"],
+    ["spinach", "palak"],
+    ["cauliflower", "gobi", "gobhi"],
+    ["okra", "bhindi", "ladyfinger"],
+    ["peas", "matar", "mattar"],
+    ["ghee", "ghi"],
+    ["egg", "eggs", "anda", "ande"],
+    ["oil", "tel"],
+    ["gram", "chana", "channa"],
+    ["poha", "pohe"],
+]
+
+# Fields the index reads from product documents
+FUZZY_INDEX_PROJECTION = {"name": 1, "brand": 1, "category": 1, "sub_category": 1, "skus.name": 1}
+
+SIMILARITY_THRESHOLD = 0.35
+REPEATED_CHARACTERS = re.compile(r"(.)\1+")
+
+
+def _build_synonym_maps(groups: List[List[str]]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    canonical = {}
+    variants = {}
+    for group in groups:
+        normalized = [normalize_word(word) for word in group]
+        for word in normalized:
+            canonical[word] = normalized[0]
+        variants[normalized[0]] = list(dict.fromkeys(normalized))
+    return canonical, variants
+
+
+def normalize_word(word: str) -> str:
+    """
+    Collapses repeated letters so "pyaaz"/"pyaz" and "mattar"/"matar" share trigrams.
+    """
+    return REPEATED_CHARACTERS.sub(r"\1", word.casefold())
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+CANONICAL_WORDS, SYNONYM_VARIANTS = _build_synonym_maps(SYNONYM_GROUPS)
+
+
+def expand_word(word: str) -> List[str]:
+    """
+    Returns the normalized word plus every spelling variant of its synonym group.
+    """
+    normalized = normalize_word(word)
+    canonical = CANONICAL_WORDS.get(normalized)
+    if canonical is None:
+        return [normalized]
+    return SYNONYM_VARIANTS[canonical]
+
+
+def product_words(product: dict) -> Set[str]:
+    text = " ".join(
+        filter(None, [product.get("name"), product.get("brand"), product.get("category"), product.get("sub_category")]
+               + [sku.get("name") for sku in product.get("skus") or []])
+    )
+    words = set()
+    for token in tokenize(text):
+        words.update(expand_word(token))
+    return words
+
+
+class FuzzyCatalogIndex:
+    def __init__(self):
+        """
+        Trigram index over one store's catalog.
+
+        Trigrams index the vocabulary rather than the products: a query token is first
+        matched to similar vocabulary words, then to the products containing them. The
+        vocabulary of a store is far smaller than its SKU count, which keeps queries in
+        the low milliseconds at tens of thousands of SKUs.
+        """
+        self.version: Optional[int] = None
+        self._word_products: Dict[str, Set[str]] = {}
+        self._word_trigram_counts: Dict[str, int] = {}
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._product_words: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._product_words)
+
+    def _add_word(self, word: str, product_id: str):
+        products = self._word_products.get(word)
+        if products is None:
+            products = self._word_products[word] = set()
+            word_trigrams = trigrams(word)
+            self._word_trigram_counts[word] = len(word_trigrams)
+            for trigram in word_trigrams:
+                self._trigram_words.setdefault(trigram, set()).add(word)
+        products.add(product_id)
+
+    def _remove_word(self, word: str, product_id: str):
+        products = self._word_products.get(word)
+        if products is None:
+            return
+        products.discard(product_id)
+        if products:
+            return
+        del self._word_products[word]
+        del self._word_trigram_counts[word]
+        for trigram in trigrams(word):
+            words = self._trigram_words.get(trigram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._trigram_words[trigram]
+
+    def upsert(self, product: dict):
+        product_id = product["_id"]
+        new_words = product_words(product)
+        old_words = self._product_words.get(product_id, set())
+        for word in old_words - new_words:
+            self._remove_word(word, product_id)
+        for word in new_words - old_words:
+            self._add_word(word, product_id)
+        self._product_words[product_id] = new_words
+
+    def remove(self, product_id: str):
+        for word in self._product_words.pop(product_id, set()):
+            self._remove_word(word, product_id)
+
+    def _similar_words(self, token: str) -> Dict[str, float]:
+        """
+        Dice similarity between the token and every vocabulary word sharing a trigram with it.
+        """
+        best: Dict[str, float] = {}
+        for variant in expand_word(token):
+            variant_trigrams = trigrams(variant)
+            overlaps = Counter()
+            for trigram in variant_trigrams:
+                overlaps.update(self._trigram_words.get(trigram, ()))
+            for word, overlap in overlaps.items():
+                similarity = 2 * overlap / (len(variant_trigrams) + self._word_trigram_counts[word])
+                if similarity >= SIMILARITY_THRESHOLD and similarity > best.get(word, 0.0):
+                    best[word] = similarity
+        return best
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        Returns (product_id, score) pairs, best first. A product's score is the mean over
+        query tokens of its best matching word, so every token contributes.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores: Optional[Dict[str, float]] = None
+        for token in tokens:
+            token_scores: Dict[str, float] = {}
+            # Ascending similarity, so a product's best word is written last
+            for word, similarity in sorted(self._similar_words(token).items(), key=itemgetter(1)):
+                token_scores.update(dict.fromkeys(self._word_products[word], similarity))
+            if scores is None:
+                scores = token_scores
+                continue
+            for product_id, similarity in token_scores.items():
+                scores[product_id] = scores.get(product_id, 0.0) + similarity
+        ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [(product_id, score / len(tokens)) for product_id, score in ranked]
+
+
+def build_catalog_index(products: List[dict], version: Optional[int]) -> FuzzyCatalogIndex:
+    index = FuzzyCatalogIndex()
+    for product in products:
+        index.upsert(product)
+    index.version = version
+    return index
+
+
+class FuzzyIndexRegistry:
+    def __init__(self, max_stores: int):
+        """
+        Per-worker cache of store catalog indexes, kept coherent across workers through a
+        catalog version counter in Redis. Every catalog write bumps the counter; a worker
+        whose index is exactly one version behind applies the change in place, anything
+        else rebuilds from Mongo on the next query.
+
+        Builds take seconds for large catalogs, so they run on a thread rather than the
+        event loop. The GIL still serializes the work, but the loop gets a turn every few
+        milliseconds instead of stalling for the whole build. One build thread is enough:
+        more would only contend with each other and the loop.
+        """
+        self.max_stores = max_stores
+        self._indexes: "OrderedDict[str, FuzzyCatalogIndex]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fuzzy-index")
+
+    @staticmethod
+    def _version_key(store_id: str) -> str:
+        return f"catalog_version:{store_id}"
+
+    async def _current_version(self, store_id: str) -> Optional[int]:
+        try:
+            version = await redis_client.get(self._version_key(store_id))
+        except RedisError as e:
+            logger.warning(f"Catalog version read failed for {store_id}: {e}")
+            return None
+        return int(version) if version is not None else 0
+
+    async def _bump_version(self, store_id: str) -> Optional[int]:
+        try:
+            return await redis_client.incr(self._version_key(store_id))
+        except RedisError as e:
+            logger.warning(f"Catalog version bump failed for {store_id}: {e}")
+            return None
+
+    def _remember(self, store_id: str, index: FuzzyCatalogIndex):
+        self._indexes[store_id] = index
+        self._indexes.move_to_end(store_id)
+        while len(self._indexes) > self.max_stores:
+            evicted, _ = self._indexes.popitem(last=False)
+            self._locks.pop(evicted, None)
+
+    async def _build(self, store_id: str, version: Optional[int]) -> FuzzyCatalogIndex:
+        products = await db["products"].find({"store_id": store_id}, FUZZY_INDEX_PROJECTION).to_list(None)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, build_catalog_index, products, version)
+
+    async def get(self, store_id: str) -> FuzzyCatalogIndex:
+        version = await self._current_version(store_id)
+        index = self._indexes.get(store_id)
+        if index is not None and (version is None or index.version == version):
+            self._indexes.move_to_end(store_id)
+            return index
+
+        lock = self._locks.setdefault(store_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(store_id)
+            if index is None or (version is not None and index.version != version):
+                index = await self._build(store_id, version)
+                self._remember(store_id, index)
+        return index
+
+    async def _apply(self, store_id: str, change):
+        version = await self._bump_version(store_id)
+        index = self._indexes.get(store_id)
+        if index is None:
+            return
+        if version is not None and index.version != version - 1:
+            # Missed a write from another worker; rebuild lazily on the next query
+            self._indexes.pop(store_id, None)
+            return
+        change(index)
+        index.version = version
+
+    async def upsert_product(self, store_id: str, product: dict):
+        await self._apply(store_id, lambda index: index.upsert(product))
+
+    async def remove_product(self, store_id: str, product_id: str):
+        await self._apply(store_id, lambda index: index.remove(product_id))
+
+    async def invalidate(self, store_id: str):
+        """
+        Marks a store's catalog as changed without applying the change locally.
+        """
+        await self._bump_version(store_id)
+        self._indexes.pop(store_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+fuzzy_index_registry = FuzzyIndexRegistry(max_stores=settings.fuzzy_index_max_stores)
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.utils.logger import logger
+
+# Seconds between checks while a duplicate waits for the first request to finish
+WAIT_POLL_INTERVAL = 0.05
+
+
+class IdempotencyKeys:
+    def __init__(self, ttl: int, lock_ttl: int, wait_timeout: float):
+        """
+        Makes retried creates safe: the first request carrying an `Idempotency-Key` runs and
+        its response is kept for `ttl` seconds; retries with the same key get that response
+        back instead of creating again.
+
+        The first request claims the key with SET NX. Duplicates arriving while it runs
+        wait up to `wait_timeout` seconds for its result rather than redoing the work. A
+        claim left by a crashed worker expires after `lock_ttl` seconds. Client errors are
+        replayed like successes; server errors free the key so a retry can try again.
+        """
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"idempotency:{scope}:{key}"
+
+    @staticmethod
+    def _replay(entry: dict, response: Response) -> dict:
+        response.headers["Idempotent-Replayed"] = "true"
+        if entry["status_code"] >= 400:
+            raise HTTPException(status_code=entry["status_code"], detail=entry["body"])
+        return entry["body"]
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        request: BaseModel,
+        response: Response,
+        work: Callable[[], Awaitable[BaseModel]]
+    ):
+        """
+        Runs `work` once per `key` within `scope`, e.g. one user's order creation.
+        Reusing a key with a different request body is rejected with 422.
+        """
+        if key is None:
+            return await work()
+
+        redis_key = self._key(scope, key)
+        fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while True:
+                claim = json.dumps({"state": "pending", "fingerprint": fingerprint})
+                if await redis_client.set(redis_key, claim, nx=True, ex=self.lock_ttl):
+                    break
+                raw = await redis_client.get(redis_key)
+                if raw is None:
+                    # The first request failed and freed the key; claim it ourselves
+                    continue
+                entry = json.loads(raw)
+                if entry["fingerprint"] != fingerprint:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was already used with a different request"
+                    )
+                if entry["state"] == "done":
+                    return self._replay(entry, response)
+                if time.monotonic() >= deadline:
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is still in progress")
+                await asyncio.sleep(WAIT_POLL_INTERVAL)
+        except RedisError as e:
+            # Better a possible duplicate than refusing every create while Redis is down
+            logger.warning(f"Idempotency check failed for {redis_key}, running unguarded: {e}")
+            return await work()
+
+        try:
+            result = await work()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                await self._release(redis_key)
+            else:
+                await self._store(redis_key, fingerprint, e.status_code, e.detail)
+            raise
+        except BaseException:
+            await self._release(redis_key)
+            raise
+        await self._store(redis_key, fingerprint, status.HTTP_200_OK, result.model_dump(mode="json", by_alias=True))
+        return result
+
+    async def _store(self, redis_key: str, fingerprint: str, status_code: int, body):
+        entry = {"state": "done", "fingerprint": fingerprint, "status_code": status_code, "body": body}
+        try:
+            await redis_client.set(redis_key, json.dumps(entry), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Could not store idempotent response for {redis_key}: {e}")
+
+    async def _release(self, redis_key: str):
+        try:
+            await redis_client.delete(redis_key)
+        except RedisError as e:
+            logger.warning(f"Could not free idempotency key {redis_key}: {e}")
+
+
+idempotency_keys = IdempotencyKeys(
+    ttl=settings.idempotency_key_ttl,
+    lock_ttl=settings.idempotency_lock_ttl,
+    wait_timeout=settings.idempotency_wait_timeout
+)
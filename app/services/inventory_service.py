@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import List
+
+from app.models.inventory import InventoryItemPatch
+
+
+def item_patch_filter(patches: List[InventoryItemPatch]) -> dict:
+    """
+    Match conditions a patch needs: every SKU present, and enough quantity for decrements.
+    """
+    conditions = [{"items.sku_id": {"$all": [patch.sku_id for patch in patches]}}]
+    for patch in patches:
+        if patch.quantity_delta is not None and patch.quantity_delta < 0:
+            conditions.append({"items": {"$elemMatch": {"sku_id": patch.sku_id, "quantity": {"$gte": -patch.quantity_delta}}}})
+    return {"$and": conditions}
+
+
+def item_patch_pipeline(patches: List[InventoryItemPatch], now: datetime) -> List[dict]:
+    """
+    Update pipeline applying item-level changes in place. `total` moves by the change in
+    value (quantity x price) of the patched items only, computed server-side from the
+    stored values, so concurrent patches never overwrite each other's totals.
+    """
+    sku_ids = [patch.sku_id for patch in patches]
+    changes = [
+        {
+            "quantity": patch.quantity,
+            "quantity_delta": patch.quantity_delta or 0,
+            "price": patch.price
+        }
+        for patch in patches
+    ]
+
+    def patched(field: str) -> dict:
+        # The patch's new value for `field`, falling back to the stored one
+        return {"$ifNull": [f"$$change.{field}", f"$$item.{field}"]}
+
+    def for_each_item(unchanged, changed) -> dict:
+        # Maps `items`, evaluating `changed` with $$change bound for patched SKUs
+        return {
+            "$map": {
+                "input": "$items",
+                "as": "item",
+                "in": {
+                    "$let": {
+                        "vars": {"at": {"$indexOfArray": [{"$literal": sku_ids}, "$$item.sku_id"]}},
+                        "in": {
+                            "$cond": [
+                                {"$eq": ["$$at", -1]},
+                                unchanged,
+                                {"$let": {"vars": {"change": {"$arrayElemAt": [{"$literal": changes}, "$$at"]}}, "in": changed}}
+                            ]
+                        }
+                    }
+                }
+            }
+        }
+
+    new_quantity = {"$add": [patched("quantity"), "$$change.quantity_delta"]}
+    value_change = for_each_item(0, {
+        "$subtract": [
+            {"$multiply": [new_quantity, patched("price")]},
+            {"$multiply": ["$$item.quantity", "$$item.price"]}
+        ]
+    })
+    items = for_each_item("$$item", {"$mergeObjects": ["$$item", {"quantity": new_quantity, "price": patched("price")}]})
+    return [
+        # Total first, while `items` still holds the old values
+        {"$set": {"total": {"$add": ["$total", {"$sum": value_change}]}, "updated_at": now}},
+        {"$set": {"items": items}}
+    ]
@@ -0,0 +1,248 @@
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from bson import json_util
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import db, redis_client
+from app.services.search_service import build_search_filter
+from app.services.delivery_service import delivery_quoter
+from app.utils.geo import geohash_bounds, geojson_point, haversine_m, haversine_m_many
+from app.utils.logger import logger
+from app.utils.metrics import nearby_cache_requests, nearby_lookup_seconds
+
+# Geohash precision 6 cells are roughly 1.2 km x 0.6 km
+CELL_PRECISION = 6
+# Requested radii are rounded up to one of these so nearby callers share entries
+RADIUS_BUCKETS_M = [1000, 2000, 5000, 10000, 20000]
+# Stores cached per cell; callers re-rank and trim these to their own limit. Cells with
+# more stores than this are not cached, since a truncated set can miss stores in range
+CELL_CANDIDATE_LIMIT = 100
+
+GENERATION_KEY = "nearby:generation"
+
+# Fields a nearby-store card needs; `locations` (verified addresses only) lets cached
+# cards be re-ranked per caller
+STORE_CARD_PROJECTION = {
+    "name": 1,
+    "phone": 1,
+    "description": 1,
+    "distance": 1,
+    "location": 1,
+    "locations": "$verified_locations"
+}
+
+
+def closest_per_owner(owners: np.ndarray, distances: np.ndarray, max_distance: float, limit: int) -> np.ndarray:
+    """
+    Given one entry per candidate address, returns the indices of each owner's closest
+    address within `max_distance`, nearest first, at most `limit` of them.
+    """
+    order = np.lexsort((distances, owners))
+    first_of_owner = np.ones(len(order), dtype=bool)
+    first_of_owner[1:] = owners[order][1:] != owners[order][:-1]
+    closest = order[first_of_owner]
+    closest = closest[distances[closest] <= max_distance]
+    return closest[np.argsort(distances[closest], kind="stable")][:limit]
+
+
+def quoted_cards(cards: List[dict], latitudes: np.ndarray, longitudes: np.ndarray, distances: np.ndarray) -> List[dict]:
+    """
+    Sets distance, closest location and the delivery quote on already ranked cards.
+    """
+    fees, etas, deliverable = delivery_quoter.quote(distances)
+    return [
+        {
+            **card,
+            "distance": float(distances[position]),
+            "location": geojson_point(float(latitudes[position]), float(longitudes[position])),
+            "delivery_fee": delivery_quoter.fee_amount(fees[position]) if deliverable[position] else None,
+            "eta_minutes": int(etas[position]) if deliverable[position] else None
+        }
+        for position, card in enumerate(cards)
+    ]
+
+
+def rank_by_distance(cards: List[dict], latitude: float, longitude: float, max_distance: float, limit: int) -> List[dict]:
+    """
+    Re-ranks store cards for a caller by exact distance to each card's closest address,
+    setting `distance`, `location` and the delivery quote for that caller. Distances and
+    quotes for all candidate addresses are computed in one vectorized pass.
+    """
+    owners, latitudes, longitudes = [], [], []
+    for position, card in enumerate(cards):
+        for location in card.get("locations") or []:
+            if not location:
+                continue
+            owners.append(position)
+            longitudes.append(location["coordinates"][0])
+            latitudes.append(location["coordinates"][1])
+    if not owners:
+        return []
+
+    owners = np.array(owners)
+    latitudes = np.array(latitudes)
+    longitudes = np.array(longitudes)
+    distances = haversine_m_many(latitude, longitude, latitudes, longitudes)
+    closest = closest_per_owner(owners, distances, max_distance, limit)
+    return quoted_cards([cards[owner] for owner in owners[closest]], latitudes[closest], longitudes[closest], distances[closest])
+
+
+async def quote_store_delivery(store_id: str, latitude: float, longitude: float) -> Optional[dict]:
+    """
+    Card for one store with distance and delivery quote to a point, or None if the store
+    doesn't exist or has no verified address.
+    """
+    card = await db["stores"].find_one({"_id": store_id}, STORE_CARD_PROJECTION)
+    if card is None:
+        return None
+    ranked = rank_by_distance([card], latitude, longitude, float("inf"), 1)
+    return ranked[0] if ranked else None
+
+
+def in_stock_filter(category: Optional[str], product: Optional[str]) -> Optional[dict]:
+    """
+    Products filter for "has this in stock", or None when the caller didn't ask for one.
+    """
+    if not category and not product:
+        return None
+    product_filter = {"is_active": True, "skus.in_stock": True}
+    if category:
+        product_filter["category"] = category
+    search_filter = build_search_filter(product)
+    if search_filter:
+        product_filter.update(search_filter)
+    return product_filter
+
+
+async def query_nearby_stores(
+    latitude: float,
+    longitude: float,
+    max_distance: float,
+    limit: int,
+    product_filter: Optional[dict] = None
+) -> List[dict]:
+    """
+    One $geoNear round trip returning cards for stores with a verified address, with
+    distance to the closest verified one, optionally restricted to stores with a matching
+    product in stock. Runs over `verified_locations`, so an unverified address never
+    sets a store's distance or rank.
+    """
+    pipeline = [
+        {
+            "$geoNear": {
+                "near": geojson_point(latitude, longitude),
+                "key": "verified_locations",
+                "distanceField": "distance",
+                "includeLocs": "location",
+                "maxDistance": max_distance,
+                "spherical": True
+            }
+        }
+    ]
+    if product_filter:
+        pipeline += [
+            {
+                "$lookup": {
+                    "from": "products",
+                    "localField": "_id",
+                    "foreignField": "store_id",
+                    "pipeline": [{"$match": product_filter}, {"$limit": 1}, {"$project": {"_id": 1}}],
+                    "as": "in_stock_products"
+                }
+            },
+            {"$match": {"in_stock_products.0": {"$exists": True}}}
+        ]
+    pipeline += [
+        {"$limit": limit},
+        {"$project": STORE_CARD_PROJECTION}
+    ]
+    return await db["stores"].aggregate(pipeline).to_list(limit)
+
+
+class NearbyStoreCache:
+    def __init__(self, ttl: int):
+        """
+        Caches nearby-store candidates per geohash cell and radius bucket.
+
+        A cell entry holds every store within `bucket + half the cell diagonal` of the cell
+        centre, which is a superset of the stores within `bucket` of any point in the cell.
+        Each caller then re-ranks the shared candidates by exact distance. A cell with more
+        than CELL_CANDIDATE_LIMIT such stores is cached as dense instead, and its callers
+        query Mongo directly. Address and profile changes bump a generation counter that is
+        part of every key, so invalidation is O(1). In-stock filtered lookups are not
+        cached, since stock moves faster than addresses.
+        """
+        self.ttl = ttl
+
+    @staticmethod
+    def _radius_bucket(max_distance: int) -> Optional[int]:
+        for bucket in RADIUS_BUCKETS_M:
+            if max_distance <= bucket:
+                return bucket
+        return None
+
+    async def _generation(self) -> int:
+        generation = await redis_client.get(GENERATION_KEY)
+        return int(generation) if generation is not None else 0
+
+    async def _cell_candidates(self, latitude: float, longitude: float, bucket: int) -> Tuple[Optional[List[dict]], str]:
+        cell, min_lat, max_lat, min_lon, max_lon = geohash_bounds(latitude, longitude, CELL_PRECISION)
+        center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+        half_diagonal = haversine_m(min_lat, min_lon, max_lat, max_lon) / 2
+
+        try:
+            key = f"nearby:{await self._generation()}:{cell}:{bucket}"
+            cached = await redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Nearby cache read failed: {e}")
+            return None, "bypass"
+        if cached is not None:
+            candidates = json_util.loads(cached)
+            return candidates, "hit" if candidates is not None else "dense"
+
+        candidates = await query_nearby_stores(center_lat, center_lon, bucket + half_diagonal, CELL_CANDIDATE_LIMIT + 1)
+        if len(candidates) > CELL_CANDIDATE_LIMIT:
+            candidates = None
+        try:
+            await redis_client.set(key, json_util.dumps(candidates), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Nearby cache write failed: {e}")
+        return candidates, "miss" if candidates is not None else "dense"
+
+    async def get_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: int,
+        limit: int,
+        product_filter: Optional[dict] = None
+    ) -> List[dict]:
+        started = time.perf_counter()
+        bucket = self._radius_bucket(max_distance)
+        candidates, result = None, "bypass"
+        if bucket is not None and limit <= CELL_CANDIDATE_LIMIT and not product_filter:
+            candidates, result = await self._cell_candidates(latitude, longitude, bucket)
+
+        if candidates is None:
+            candidates = await query_nearby_stores(latitude, longitude, max_distance, limit, product_filter)
+        stores = rank_by_distance(candidates, latitude, longitude, max_distance, limit)
+
+        nearby_cache_requests.labels(result=result).inc()
+        nearby_lookup_seconds.labels(result=result).observe(time.perf_counter() - started)
+        return stores
+
+    async def invalidate(self):
+        """
+        Drops every cached cell. Call after any store address is added, changed or verified,
+        and after a change to a field the cards carry.
+        """
+        try:
+            await redis_client.incr(GENERATION_KEY)
+        except RedisError as e:
+            logger.warning(f"Nearby cache invalidation failed: {e}")
+
+
+nearby_store_cache = NearbyStoreCache(ttl=settings.nearby_cache_ttl)
@@ -0,0 +1,10 @@
+from app.services.order_inbox import order_inbox
+from app.services.order_stream import order_stream_hub
+
+
+async def order_changed(order: dict):
+    """
+    Called with the order as written after every status change, including creation.
+    """
+    await order_inbox.record(order)
+    await order_stream_hub.publish(order)
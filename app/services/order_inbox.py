@@ -0,0 +1,201 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import db, redis_client
+from app.models.order import OrderResponse
+from app.utils.logger import logger
+
+# Statuses a store still has to act on
+LIVE_STATUSES = ("pending", "accepted", "dispatched")
+
+# Seconds an order's last filed version is remembered; far longer than transitions race
+VERSION_TTL = 86400
+
+# Files an order unless a newer version of it is already filed, so transitions recorded
+# out of order by different workers cannot leave a stale status behind.
+# KEYS: orders hash, the order's version key, one sorted set per live status
+# ARGV: order id, version, its status's sorted set ("" once it left the live statuses),
+#       score, serialized order, seconds the version is remembered
+FILE_ORDER = redis_client.register_script("""
+local filed = redis.call('get', KEYS[2])
+if filed and tonumber(filed) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('set', KEYS[2], ARGV[2], 'EX', ARGV[6])
+local live = false
+for i = 3, #KEYS do
+    if KEYS[i] == ARGV[3] then
+        live = true
+        redis.call('zadd', KEYS[i], ARGV[4], ARGV[1])
+    else
+        redis.call('zrem', KEYS[i], ARGV[1])
+    end
+end
+if live then
+    redis.call('hset', KEYS[1], ARGV[1], ARGV[5])
+else
+    redis.call('hdel', KEYS[1], ARGV[1])
+end
+return 1
+""")
+
+# Drops orders a rebuild's snapshot no longer lists as live, except those filed after the
+# snapshot was read: a newer version means a transition the snapshot could not see.
+# KEYS: orders hash, one sorted set per live status
+# ARGV: version key prefix, snapshot time, then the ids in the snapshot
+PRUNE_INBOX = redis_client.register_script("""
+local snapshot = {}
+for i = 3, #ARGV do
+    snapshot[ARGV[i]] = true
+end
+local filed = redis.call('hkeys', KEYS[1])
+for i = 2, #KEYS do
+    for _, order_id in ipairs(redis.call('zrange', KEYS[i], 0, -1)) do
+        table.insert(filed, order_id)
+    end
+end
+local pruned = 0
+for _, order_id in ipairs(filed) do
+    if not snapshot[order_id] then
+        local version = redis.call('get', ARGV[1] .. order_id)
+        if not version or tonumber(version) <= tonumber(ARGV[2]) then
+            redis.call('hdel', KEYS[1], order_id)
+            for i = 2, #KEYS do
+                redis.call('zrem', KEYS[i], order_id)
+            end
+            pruned = pruned + 1
+        end
+    end
+end
+return pruned
+""")
+
+
+def epoch_ms(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        # Mongo hands back naive UTC
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class OrderInbox:
+    def __init__(self, rebuild_interval: int):
+        """
+        Live orders per store, held in Redis so stores read their queue without touching
+        Mongo.
+
+        Each store has a sorted set per live status scored by creation time, oldest first,
+        and one hash of serialized orders. Every order transition calls `record`, which
+        files the order under its new status or drops it once it leaves the live statuses,
+        unless a later version of the order (by `updated_at`) was already filed.
+        An inbox missing from Redis is rebuilt from Mongo on its next read, and rebuilt
+        again every `rebuild_interval` seconds so a lost write cannot leave it wrong for long.
+        """
+        self.rebuild_interval = rebuild_interval
+
+    @staticmethod
+    def _status_key(store_id: str, status: str) -> str:
+        return f"inbox:{store_id}:{status}"
+
+    @staticmethod
+    def _orders_key(store_id: str) -> str:
+        return f"inbox:{store_id}:orders"
+
+    @staticmethod
+    def _version_key(store_id: str, order_id: str) -> str:
+        return f"{OrderInbox._version_prefix(store_id)}{order_id}"
+
+    @staticmethod
+    def _version_prefix(store_id: str) -> str:
+        return f"inbox:{store_id}:version:"
+
+    @staticmethod
+    def _built_key(store_id: str) -> str:
+        return f"inbox:{store_id}:built"
+
+    def _file_args(self, order: dict) -> Tuple[list, list]:
+        """
+        FILE_ORDER keys and arguments for an order. Raises ValidationError for an order
+        that is not a valid OrderResponse.
+        """
+        store_id = order["store_id"]
+        live = order["status"] in LIVE_STATUSES
+        serialized = OrderResponse(**order).model_dump_json(by_alias=True) if live else ""
+        keys = [self._orders_key(store_id), self._version_key(store_id, order["_id"])]
+        keys += [self._status_key(store_id, status) for status in LIVE_STATUSES]
+        status_key = self._status_key(store_id, order["status"]) if live else ""
+        args = [
+            order["_id"], epoch_ms(order["updated_at"]), status_key, epoch_ms(order["created_at"]), serialized,
+            VERSION_TTL
+        ]
+        return keys, args
+
+    async def _file(self, pipe, order: dict):
+        keys, args = self._file_args(order)
+        # Only queued on a pipeline, but the async client's script call must still be awaited
+        await FILE_ORDER(keys=keys, args=args, client=pipe)
+
+    async def record(self, order: dict):
+        """
+        Files an order under its current status. Call with the order as written after
+        every transition.
+        """
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                await self._file(pipe, order)
+                await pipe.execute()
+        except (RedisError, ValidationError) as e:
+            logger.warning(f"Order inbox update failed for {order['_id']}: {e}")
+
+    async def rebuild(self, store_id: str):
+        """
+        Replaces a store's inbox with what Mongo holds. Transitions recorded while Mongo is
+        being read carry newer versions, so neither the prune nor the refiling undoes them.
+        """
+        read_at = epoch_ms(datetime.now(timezone.utc))
+        orders = await db["orders"].find({"store_id": store_id, "status": {"$in": list(LIVE_STATUSES)}}).to_list(None)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            await PRUNE_INBOX(
+                keys=[self._orders_key(store_id), *(self._status_key(store_id, status) for status in LIVE_STATUSES)],
+                args=[self._version_prefix(store_id), read_at, *(order["_id"] for order in orders)],
+                client=pipe
+            )
+            for order in orders:
+                try:
+                    await self._file(pipe, order)
+                except ValidationError as e:
+                    # One malformed legacy order must not take the whole inbox down
+                    logger.warning(f"Order inbox skipped invalid order {order['_id']}: {e}")
+            pipe.set(self._built_key(store_id), 1, ex=self.rebuild_interval)
+            await pipe.execute()
+
+    async def list(self, store_id: str, status: str, offset: int, limit: int) -> List[OrderResponse]:
+        """
+        Orders in one status, oldest first. O(log n + limit) in the store's live orders.
+        """
+        try:
+            if not await redis_client.exists(self._built_key(store_id)):
+                await self.rebuild(store_id)
+            order_ids = await redis_client.zrange(self._status_key(store_id, status), offset, offset + limit - 1)
+            serialized = await redis_client.hmget(self._orders_key(store_id), order_ids) if order_ids else []
+        except RedisError as e:
+            logger.warning(f"Order inbox read failed for {store_id}, reading Mongo: {e}")
+            orders = await db["orders"].find({"store_id": store_id, "status": status}) \
+                .sort([("created_at", 1), ("_id", 1)]).skip(offset).limit(limit).to_list(limit)
+            return [order for order in map(self._validated, orders) if order is not None]
+        return [OrderResponse.model_validate_json(order) for order in serialized if order is not None]
+
+    @staticmethod
+    def _validated(order: dict):
+        try:
+            return OrderResponse(**order)
+        except ValidationError as e:
+            logger.warning(f"Order inbox skipped invalid order {order['_id']}: {e}")
+            return None
+
+
+order_inbox = OrderInbox(rebuild_interval=settings.order_inbox_rebuild_interval)
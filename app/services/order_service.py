@@ -0,0 +1,86 @@
+from fastapi import HTTPException, status
+from nanoid import generate
+
+from app.core.database import db
+from app.core.repository import update_and_fetch
+from app.models.order import OrderCreate, OrderResponse
+from app.services.nearby_service import quote_store_delivery
+from app.services.order_events import order_changed
+from app.services.outbox import outbox_event
+from app.services.reservation_service import stock_reservations
+from app.utils.datetime import get_ist_time
+
+# Store-driven status changes and the statuses each may follow
+ORDER_TRANSITIONS = {
+    "accepted": ["pending"],
+    "rejected": ["pending"],
+    "dispatched": ["accepted"],
+    "delivered": ["dispatched"]
+}
+
+
+async def place_order(order: OrderCreate, user_id: str) -> OrderResponse:
+    """
+    Prices delivery, reserves stock and records a new order for a customer.
+    """
+    latitude = order.delivery_address.get("latitude")
+    longitude = order.delivery_address.get("longitude")
+    if latitude is None or longitude is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Delivery address must include latitude and longitude")
+    quote = await quote_store_delivery(order.store_id, latitude, longitude)
+    if quote is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
+    if quote["delivery_fee"] is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Store does not deliver to this address")
+
+    order_id = f"ord_{generate(size=10)}"
+    reservation = await stock_reservations.reserve(
+        order_id, order.store_id, [(item.product_id, item.sku_id, item.quantity) for item in order.items]
+    )
+
+    order_data = order.dict()
+    date = get_ist_time()
+    order_data.update({
+        "_id": order_id,
+        "delivery_fee": quote["delivery_fee"],
+        "total": order.subtotal + order.platform_fee + quote["delivery_fee"],
+        "delivery_distance": round(quote["distance"]),
+        "eta_minutes": quote["eta_minutes"],
+        "reservation_expires_at": reservation["expires_at"],
+        "user_id": user_id,
+        "status": "pending",
+        "payment_status": "pending",
+        "created_at": date,
+        "updated_at": date,
+        "outbox": [outbox_event("order.created")]
+    })
+
+    try:
+        await db["orders"].insert_one(order_data)
+    except Exception:
+        await stock_reservations.release(order_id, reason="order_not_created")
+        raise
+    await order_changed(order_data)
+    return OrderResponse(**order_data)
+
+
+async def set_order_status(order_id: str, store_id: str, new_status: str) -> dict:
+    """
+    Moves a store's order to `new_status` if its current status allows it, and returns
+    the updated order.
+    """
+    if new_status not in ORDER_TRANSITIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
+
+    updated_order = await update_and_fetch(
+        "orders",
+        {"_id": order_id, "store_id": store_id},
+        {"$set": {"status": new_status, "updated_at": get_ist_time()}, "$push": {"outbox": outbox_event(f"order.{new_status}")}},
+        precondition={"status": {"$in": ORDER_TRANSITIONS[new_status]}},
+        not_found="Order not found or unauthorized",
+        precondition_failed=f"Order cannot be marked {new_status} from its current status"
+    )
+    if new_status == "rejected":
+        await stock_reservations.release(order_id, reason="rejected")
+    await order_changed(updated_order)
+    return updated_order
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Optional, Set
+
+from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.models.order import OrderResponse
+from app.utils.logger import logger
+
+# Redis pub/sub channel every worker publishes order changes to
+ORDER_EVENTS_CHANNEL = "order_events"
+
+
+def sse_event(event: str, data: str, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in data.splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+class OrderStreamHub:
+    def __init__(self, heartbeat_interval: int, queue_size: int):
+        """
+        Fans order changes out to this worker's open order streams.
+
+        Any worker that changes an order publishes it on one Redis channel; each worker
+        holds a single subscription to that channel and hands every message to the local
+        streams watching its store or customer, so an idle stream costs a queue and no
+        Redis connection. A stream whose client reads slower than orders change is cut
+        off once `queue_size` events are waiting, with a `resync` event telling the client
+        to refetch and reconnect. Idle streams get a comment every `heartbeat_interval`
+        seconds so proxies keep them open and dead clients are noticed.
+        """
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_size = queue_size
+        self._streams: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def open_streams(self) -> int:
+        return sum(len(queues) for queues in self._streams.values())
+
+    async def publish(self, order: dict):
+        try:
+            await redis_client.publish(ORDER_EVENTS_CHANNEL, OrderResponse(**order).model_dump_json(by_alias=True))
+        except RedisError as e:
+            logger.warning(f"Order event publish failed for {order['_id']}: {e}")
+
+    def deliver(self, message: str):
+        """
+        Queues a published order for every local stream watching its store or customer.
+        """
+        order = json.loads(message)
+        # Formatted once however many streams receive it
+        event = (order["_id"], sse_event("order", message, event_id=order["_id"]))
+        for key in (f"store:{order['store_id']}", f"user:{order['user_id']}"):
+            for queue in list(self._streams.get(key, ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # The reader fell behind; drop its backlog and tell it to resync
+                    self._close(key, queue)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    def _close(self, key: str, queue: asyncio.Queue):
+        queues = self._streams.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._streams[key]
+
+    async def stream(self, key: str, order_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Server-sent events for every order change under `key`, or only `order_id`'s.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._streams[key].add(queue)
+        try:
+            yield f"retry: {self.heartbeat_interval * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    yield sse_event("resync", "{}")
+                    return
+                changed_order_id, formatted = event
+                if order_id is None or changed_order_id == order_id:
+                    yield formatted
+        finally:
+            self._close(key, queue)
+
+    def response(self, key: str, order_id: Optional[str] = None) -> StreamingResponse:
+        return StreamingResponse(
+            self.stream(key, order_id),
+            media_type="text/event-stream",
+            # Proxies must pass each event through as it is written
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def _listen_forever(self):
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(ORDER_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.deliver(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Streams stay open; events published while disconnected are missed
+                logger.warning(f"Order event subscription failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+order_stream_hub = OrderStreamHub(
+    heartbeat_interval=settings.order_stream_heartbeat_interval,
+    queue_size=settings.order_stream_queue_size
+)
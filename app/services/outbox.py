@@ -0,0 +1,219 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from nanoid import generate
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.whatsapp_service import whatsapp_service
+from app.utils.logger import logger
+
+# Event type -> (who is told, WhatsApp template). The templates are not yet approved in
+# WhatsApp Business, so dispatch stays off (`outbox_dispatch_enabled`) until they are
+NOTIFICATIONS = {
+    "order.created": ("store", "new_order"),
+    "order.cancelled": ("store", "order_cancelled"),
+    "order.accepted": ("user", "order_accepted"),
+    "order.rejected": ("user", "order_rejected"),
+    "order.dispatched": ("user", "order_dispatched"),
+    "order.delivered": ("user", "order_delivered"),
+    "order.expired": ("user", "order_expired"),
+    "payment.captured": ("user", "payment_received")
+}
+
+# Collections whose documents carry an outbox
+OUTBOX_COLLECTIONS = ("orders", "payments")
+
+# Longest wait between delivery attempts of one event
+MAX_RETRY_DELAY = timedelta(minutes=30)
+# Events older than this are dropped unsent; news of a day-old order change is noise
+STALE_AFTER = timedelta(hours=24)
+
+
+def outbox_event(event_type: str) -> dict:
+    """
+    A pending notification, to be `$push`ed onto `outbox` by the same write that makes
+    the change it announces. Both land or neither does.
+    """
+    now = datetime.utcnow()
+    return {
+        "_id": f"evt_{generate(size=10)}",
+        "type": event_type,
+        "status": "pending",
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now
+    }
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=5 * 2 ** attempts), MAX_RETRY_DELAY)
+
+
+async def notification_for(collection: str, document: dict, event: dict) -> Optional[Tuple[str, str, List[str], bool]]:
+    """
+    (phone, template, placeholders, is_store) for an event, or None if there is no one
+    to tell.
+    """
+    recipient, template = NOTIFICATIONS[event["type"]]
+    order = document
+    placeholders = [document["_id"]]
+    if collection == "payments":
+        order = await db["orders"].find_one({"_id": document["order_id"]}, {"user_id": 1, "store_id": 1})
+        placeholders = [document["order_id"], f"{document['amount']:.2f}"]
+        if order is None:
+            return None
+    if recipient == "store":
+        principal = await db["stores"].find_one({"_id": order["store_id"]}, {"phone": 1})
+    else:
+        principal = await db["users"].find_one({"_id": order["user_id"]}, {"phone": 1})
+    if not principal or not principal.get("phone"):
+        return None
+    return principal["phone"], template, placeholders, recipient == "store"
+
+
+async def prune_finished_events():
+    """
+    Drops the delivered, skipped and failed events the dispatcher used to leave on
+    documents. Runs once per database: the first worker to start claims it in `migrations`.
+    """
+    try:
+        await db["migrations"].insert_one({"_id": "outbox_finished_events", "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return
+    try:
+        for collection in OUTBOX_COLLECTIONS:
+            await db[collection].update_many(
+                {"outbox.status": {"$in": ["delivered", "skipped", "failed"]}},
+                {"$pull": {"outbox": {"status": {"$ne": "pending"}}}}
+            )
+    except BaseException:
+        # Let the next start try again
+        await db["migrations"].delete_one({"_id": "outbox_finished_events"})
+        raise
+    await db["migrations"].update_one({"_id": "outbox_finished_events"}, {"$set": {"finished_at": datetime.utcnow()}})
+
+
+class OutboxDispatcher:
+    def __init__(self, batch_size: int, poll_interval: int, lease: int, max_attempts: int):
+        """
+        Sends the notifications queued on order and payment documents.
+
+        Request handlers only write events; this worker finds due ones in batches, leases
+        each for `lease` seconds so other workers' dispatchers skip it, sends it over
+        WhatsApp and removes it from the document. Delivery is at least once: a send that
+        succeeds but is not recorded is sent again when the lease runs out. Failed sends
+        back off exponentially and are given up, and removed, after `max_attempts`, as
+        are events no one can be told about or that went stale waiting.
+        """
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim(self, collection: str, document_id: str, event: dict) -> bool:
+        # Conditional on the event's current availability, so exactly one dispatcher wins it
+        result = await db[collection].update_one(
+            {"_id": document_id, "outbox": {"$elemMatch": {"_id": event["_id"], "status": "pending", "available_at": event["available_at"]}}},
+            {"$set": {"outbox.$.available_at": datetime.utcnow() + self.lease}}
+        )
+        return result.modified_count == 1
+
+    async def _deliver(self, collection: str, document: dict, event: dict) -> bool:
+        if event["created_at"] < datetime.utcnow() - STALE_AFTER:
+            await self._finish(collection, document["_id"], event)
+            return True
+        notification = await notification_for(collection, document, event)
+        if notification is None:
+            await self._finish(collection, document["_id"], event)
+            return True
+
+        phone, template, placeholders, is_store = notification
+        result = await whatsapp_service.send_message(phone, template, placeholders, is_store=is_store)
+        if "error" not in result:
+            await self._finish(collection, document["_id"], event)
+            return True
+
+        attempts = event["attempts"] + 1
+        if attempts >= self.max_attempts:
+            logger.error(f"Giving up on {event['type']} notification {event['_id']} after {attempts} attempts: {result}")
+            await self._finish(collection, document["_id"], event)
+        else:
+            await self._mark(collection, document["_id"], event, {
+                "attempts": attempts,
+                "available_at": datetime.utcnow() + retry_delay(attempts),
+                "error": result
+            })
+        return False
+
+    async def _finish(self, collection: str, document_id: str, event: dict):
+        # Sent, skipped or given up: nothing is left to do, so the document stops carrying it
+        await db[collection].update_one({"_id": document_id}, {"$pull": {"outbox": {"_id": event["_id"]}}})
+
+    async def _mark(self, collection: str, document_id: str, event: dict, fields: dict):
+        await db[collection].update_one(
+            {"_id": document_id, "outbox._id": event["_id"]},
+            {"$set": {f"outbox.$.{field}": value for field, value in fields.items()}}
+        )
+
+    async def drain(self) -> int:
+        """
+        Delivers one batch of due events per collection. Returns how many were sent.
+        """
+        delivered = 0
+        for collection in OUTBOX_COLLECTIONS:
+            now = datetime.utcnow()
+            documents = await db[collection].find(
+                {"outbox.status": "pending", "outbox": {"$elemMatch": {"status": "pending", "available_at": {"$lte": now}}}},
+                {"outbox": 1, "user_id": 1, "store_id": 1, "order_id": 1, "amount": 1}
+            ).limit(self.batch_size).to_list(self.batch_size)
+
+            due = [
+                (document, event)
+                for document in documents
+                for event in document["outbox"]
+                if event["status"] == "pending" and event["available_at"] <= now
+            ]
+            claimed = await asyncio.gather(*(self._claim(collection, document["_id"], event) for document, event in due))
+            results = await asyncio.gather(*(
+                self._deliver(collection, document, event)
+                for (document, event), won in zip(due, claimed) if won
+            ))
+            delivered += sum(results)
+        return delivered
+
+    async def _dispatch_forever(self):
+        while True:
+            try:
+                delivered = await self.drain()
+                if delivered:
+                    logger.info(f"Delivered {delivered} outbox notifications")
+                    # More may be waiting behind a full batch
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox dispatch failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._dispatch_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.outbox_batch_size,
+    poll_interval=settings.outbox_poll_interval,
+    lease=settings.outbox_lease,
+    max_attempts=settings.outbox_max_attempts
+)
@@ -0,0 +1,248 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from nanoid import generate
+from pymongo import ASCENDING, UpdateOne
+
+from app.core.config import settings
+from app.core.database import db, redis_client
+from app.core.razorpay_client import PaymentGatewayError, RazorpayGateway, payment_gateway
+from app.services.outbox import outbox_event
+from app.services.payment_service import settle_reservation
+from app.services.payment_status import payment_status_waiters
+from app.services.reservation_service import stock_reservations
+from app.utils.logger import logger
+
+# Payment ids listed per outcome in a report; counts are always complete
+REPORT_SAMPLE_SIZE = 1000
+
+# Held across workers so one reconciliation runs at a time, extended while it runs
+LOCK_KEY = "payment_reconciliation:lock"
+LOCK_TTL = 60
+
+# Set after a pass so other workers skip until the next interval
+LAST_RUN_KEY = "payment_reconciliation:last_run"
+
+# Only the worker holding the lock may extend or release it
+EXTEND_LOCK = redis_client.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+)
+RELEASE_LOCK = redis_client.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+)
+
+
+def gateway_outcome(payments: dict) -> tuple:
+    """
+    ("captured", payment id), ("failed", None) or ("unpaid", None) from a Razorpay
+    order's payment attempts.
+    """
+    attempts = payments.get("items", [])
+    for attempt in attempts:
+        if attempt["status"] == "captured":
+            return "captured", attempt["id"]
+    if any(attempt["status"] == "failed" for attempt in attempts):
+        return "failed", None
+    return "unpaid", None
+
+
+def reconciled_outcome(lookup, created_at: datetime, expire_cutoff: datetime) -> tuple:
+    """
+    What a pass does with a payment given its Razorpay lookup, or the error fetching it.
+    Still unpaid at Razorpay, or only declined attempts, and created before `expire_cutoff`
+    means abandoned: "expired".
+    """
+    if isinstance(lookup, Exception):
+        return "error", None
+    outcome = gateway_outcome(lookup)
+    if outcome[0] in ("unpaid", "failed") and created_at < expire_cutoff:
+        return "expired", None
+    return outcome
+
+
+class PaymentReconciler:
+    def __init__(
+        self,
+        gateway: RazorpayGateway,
+        min_age: int,
+        batch_size: int,
+        concurrency: int,
+        interval: int,
+        expire_after: int,
+        max_age: int
+    ):
+        """
+        Repairs payments left in `created` because their webhook never arrived.
+
+        Walks payments older than `min_age` minutes still in `created`, a page of
+        `batch_size` at a time by an indexed keyset, so memory stays flat however many are
+        stale. Each page's Razorpay orders are looked up at most `concurrency` at a time,
+        and the corrections are written in one bulk write, conditional on the payment
+        still being `created` so a webhook landing meanwhile wins. Runs every `interval`
+        seconds on whichever worker takes the lock, and stores a report of what it did.
+
+        Payments still unpaid at Razorpay, or with only declined attempts, after
+        `expire_after` minutes are abandoned checkouts and are moved to `expired`, returning
+        their order's stock, so passes do not keep asking about them.
+        Ones Razorpay could not be asked about are retried for `max_age` days.
+        """
+        self.gateway = gateway
+        self.min_age = timedelta(minutes=min_age)
+        self.expire_after = timedelta(minutes=expire_after)
+        self.max_age = timedelta(days=max_age)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _lookup(self, payment: dict, limit: asyncio.Semaphore):
+        async with limit:
+            try:
+                return await self.gateway.fetch_order_payments(payment["razorpay_order_id"])
+            except PaymentGatewayError as e:
+                return e
+
+    async def _apply(self, page: list, outcomes: list, report: dict):
+        now = datetime.utcnow()
+        updates, corrected = [], []
+        for payment, (outcome, razorpay_payment_id) in zip(page, outcomes):
+            if outcome == "unpaid":
+                continue
+            fields = {"status": outcome, "updated_at": now, "reconciled_at": now}
+            update = {"$set": fields}
+            if outcome == "captured":
+                fields["razorpay_payment_id"] = razorpay_payment_id
+                update["$push"] = {"outbox": outbox_event("payment.captured")}
+            updates.append(UpdateOne({"_id": payment["_id"], "status": "created"}, update))
+            corrected.append({**payment, "status": outcome})
+        if not updates:
+            return
+
+        result = await db["payments"].bulk_write(updates, ordered=False)
+        if result.modified_count < len(updates):
+            # Some were settled meanwhile; only follow up the ones this pass changed
+            report["conflicts"] += len(updates) - result.modified_count
+            changed = {payment["_id"] for payment in await db["payments"].find(
+                {"_id": {"$in": [payment["_id"] for payment in corrected]}, "reconciled_at": now}, {"_id": 1}
+            ).to_list(None)}
+            corrected = [payment for payment in corrected if payment["_id"] in changed]
+        for payment in corrected:
+            if payment["status"] == "captured" and payment.get("payment_type") == "order":
+                if not await stock_reservations.commit(payment["order_id"]):
+                    # Money taken for an order whose stock was already given back
+                    self._note(report, "captured_after_release", payment["_id"])
+            elif payment["status"] == "expired":
+                # A declined attempt can still be retried, so only expiry returns the stock
+                await settle_reservation(payment, captured=False)
+            await payment_status_waiters.publish(payment)
+
+    @staticmethod
+    def _note(report: dict, outcome: str, payment_id: str):
+        report["counts"][outcome] = report["counts"].get(outcome, 0) + 1
+        sample = report["payments"].setdefault(outcome, [])
+        if len(sample) < REPORT_SAMPLE_SIZE:
+            sample.append(payment_id)
+
+    async def run(self) -> dict:
+        """
+        One full pass over stale payments. Returns the stored report.
+        """
+        started = datetime.utcnow()
+        cutoff = started - self.min_age
+        expire_cutoff = started - self.expire_after
+        report = {
+            "_id": f"rec_{generate(size=10)}",
+            "cutoff": cutoff,
+            "counts": {},
+            "payments": {},
+            "conflicts": 0,
+            "started_at": started
+        }
+        limit = asyncio.Semaphore(self.concurrency)
+        query = {"status": "created", "created_at": {"$lt": cutoff, "$gte": started - self.max_age}}
+        last = None
+        while True:
+            page_query = query if last is None else {**query, "$or": [
+                {"created_at": {"$gt": last["created_at"]}},
+                {"created_at": last["created_at"], "_id": {"$gt": last["_id"]}}
+            ]}
+            page = await db["payments"].find(
+                page_query,
+                {"razorpay_order_id": 1, "payment_type": 1, "order_id": 1, "created_at": 1}
+            ).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).limit(self.batch_size).to_list(self.batch_size)
+            if not page:
+                break
+            last = page[-1]
+
+            lookups = await asyncio.gather(*(self._lookup(payment, limit) for payment in page))
+            outcomes = []
+            for payment, lookup in zip(page, lookups):
+                outcome = reconciled_outcome(lookup, payment["created_at"], expire_cutoff)
+                self._note(report, outcome[0], payment["_id"])
+                outcomes.append(outcome if outcome[0] != "error" else ("unpaid", None))
+            await self._apply(page, outcomes, report)
+
+        report["finished_at"] = datetime.utcnow()
+        await db["reconciliation_reports"].insert_one(report)
+        logger.info(f"Payment reconciliation {report['_id']}: {report['counts']}, {report['conflicts']} changed meanwhile")
+        return report
+
+    async def _hold_lock(self, token: str):
+        while True:
+            await asyncio.sleep(LOCK_TTL / 3)
+            if not await EXTEND_LOCK(keys=[LOCK_KEY], args=[token, LOCK_TTL]):
+                logger.warning("Payment reconciliation lost its lock mid-run")
+                return
+
+    async def run_exclusive(self):
+        """
+        Runs a pass unless another worker is running one or ran one this interval.
+        """
+        token = uuid.uuid4().hex
+        # Expires on its own if this worker dies mid-run
+        if not await redis_client.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL):
+            return
+        holder = asyncio.create_task(self._hold_lock(token))
+        try:
+            # Checked under the lock, so a pass that just finished is not repeated
+            if await redis_client.exists(LAST_RUN_KEY):
+                return
+            await self.run()
+            await redis_client.set(LAST_RUN_KEY, 1, ex=self.interval)
+        finally:
+            holder.cancel()
+            await RELEASE_LOCK(keys=[LOCK_KEY], args=[token])
+
+    async def _reconcile_forever(self):
+        while True:
+            try:
+                await self.run_exclusive()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Payment reconciliation failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._reconcile_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+payment_reconciler = PaymentReconciler(
+    gateway=payment_gateway,
+    min_age=settings.payment_reconcile_min_age,
+    batch_size=settings.payment_reconcile_batch_size,
+    concurrency=settings.payment_reconcile_concurrency,
+    interval=settings.payment_reconcile_interval,
+    expire_after=settings.payment_reconcile_expire_after,
+    max_age=settings.payment_reconcile_max_age
+)
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import db
+from app.services.outbox import outbox_event
+from app.services.payment_status import payment_status_waiters
+from app.services.reservation_service import stock_reservations
+from app.utils.logger import logger
+
+
+async def settle_reservation(payment: dict, captured: bool):
+    """
+    Commits an order's held stock once its payment is captured, or returns it once the
+    payment expired unpaid.
+    """
+    if payment.get("payment_type") != "order":
+        return
+    if not captured:
+        await stock_reservations.release(payment["order_id"], reason="payment_expired")
+    elif not await stock_reservations.commit(payment["order_id"]):
+        logger.warning(f"Payment {payment['_id']} captured after order {payment['order_id']} released its stock")
+
+
+async def capture_payment(razorpay_order_id: str, razorpay_payment_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Marks a payment captured, queueing its notification in the same write, and settles its
+    order's stock. Returns None if the payment is missing or was already captured, so
+    repeated confirmations neither notify nor settle twice.
+    """
+    fields = {"status": "captured", "updated_at": datetime.utcnow()}
+    if razorpay_payment_id is not None:
+        fields["razorpay_payment_id"] = razorpay_payment_id
+    payment = await db["payments"].find_one_and_update(
+        {"razorpay_order_id": razorpay_order_id, "status": {"$ne": "captured"}},
+        {"$set": fields, "$push": {"outbox": outbox_event("payment.captured")}},
+        return_document=ReturnDocument.AFTER
+    )
+    if payment is not None:
+        await settle_reservation(payment, captured=True)
+        await payment_status_waiters.publish(payment)
+    return payment
+
+
+async def fail_payment(razorpay_order_id: str) -> Optional[dict]:
+    """
+    Marks a payment failed. A captured payment is never downgraded, and one already failed
+    is left alone; both return None.
+
+    The order's stock stays held: Razorpay reports every declined attempt, and the
+    customer may pay on the same order again. The reservation's expiry or the reconciler
+    returns it if no payment follows.
+    """
+    payment = await db["payments"].find_one_and_update(
+        {"razorpay_order_id": razorpay_order_id, "status": {"$nin": ["captured", "failed"]}},
+        {"$set": {"status": "failed", "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if payment is not None:
+        await payment_status_waiters.publish(payment)
+    return payment
+
+
+async def backfill_payment_owners():
+    """
+    Copies the paying user onto order payments recorded before payments stored `user_id`.
+    Runs once per database: the first worker to start claims it in `migrations`.
+    """
+    try:
+        await db["migrations"].insert_one({"_id": "payment_owners", "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return
+    try:
+        await db["payments"].aggregate([
+            {"$match": {"user_id": {"$exists": False}, "payment_type": "order"}},
+            {"$lookup": {"from": "orders", "localField": "order_id", "foreignField": "_id", "as": "order"}},
+            {"$unwind": "$order"},
+            {"$project": {"user_id": "$order.user_id"}},
+            {"$merge": {"into": "payments", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+        ]).to_list(None)
+    except BaseException:
+        # Let the next start try again
+        await db["migrations"].delete_one({"_id": "payment_owners"})
+        raise
+    await db["migrations"].update_one({"_id": "payment_owners"}, {"$set": {"finished_at": datetime.utcnow()}})
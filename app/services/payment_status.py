@@ -0,0 +1,84 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from redis.exceptions import RedisError
+
+from app.core.database import redis_client
+from app.utils.logger import logger
+
+# Redis pub/sub channel every worker publishes payment status changes to
+PAYMENT_STATUS_CHANNEL = "payment_status"
+
+
+class PaymentStatusWaiters:
+    def __init__(self):
+        """
+        Wakes requests parked on a payment when its status changes on any worker.
+
+        Whoever changes a payment publishes its id on one Redis channel. Each worker holds a
+        single subscription to it and sets the events of its local waiters for that id, so
+        a parked request costs an event, not a Redis connection.
+        """
+        self._waiters: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, payment: dict):
+        try:
+            await redis_client.publish(PAYMENT_STATUS_CHANNEL, json.dumps({"_id": payment["_id"], "status": payment["status"]}))
+        except RedisError as e:
+            logger.warning(f"Payment status publish failed for {payment['_id']}: {e}")
+
+    def deliver(self, message: str):
+        for changed in self._waiters.get(json.loads(message)["_id"], ()):
+            changed.set()
+
+    @asynccontextmanager
+    async def watching(self, payment_id: str) -> AsyncIterator[asyncio.Event]:
+        """
+        An event set when `payment_id` next changes. Enter it before reading the payment so
+        a change between the read and the wait is not missed.
+        """
+        changed = asyncio.Event()
+        self._waiters[payment_id].add(changed)
+        try:
+            yield changed
+        finally:
+            waiters = self._waiters.get(payment_id)
+            if waiters is not None:
+                waiters.discard(changed)
+                if not waiters:
+                    del self._waiters[payment_id]
+
+    async def _listen_forever(self):
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PAYMENT_STATUS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.deliver(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Parked requests still return at their timeout with the stored status
+                logger.warning(f"Payment status subscription failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+payment_status_waiters = PaymentStatusWaiters()
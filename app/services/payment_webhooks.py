@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from nanoid import generate
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.payment_service import capture_payment, fail_payment
+from app.utils.logger import logger
+
+# Processed events are kept this long for auditing before the TTL index removes them
+PROCESSED_RETENTION = timedelta(days=30)
+
+# Seconds before retrying events whose payment is not recorded yet
+MISSING_PAYMENT_RETRY = 30
+
+
+def razorpay_order_id(payload: dict) -> Optional[str]:
+    entities = payload.get("payload", {})
+    if "order" in entities:
+        return entities["order"]["entity"]["id"]
+    if "payment" in entities:
+        return entities["payment"]["entity"].get("order_id")
+    return None
+
+
+def razorpay_payment_id(payload: dict) -> Optional[str]:
+    payment = payload.get("payload", {}).get("payment")
+    return payment["entity"]["id"] if payment else None
+
+
+class WebhookQueue:
+    def __init__(self, batch_size: int, poll_interval: float, lease: int, max_attempts: int):
+        """
+        Durable intake for Razorpay webhooks.
+
+        `ingest` stores each verified delivery raw under its event id and returns; that one
+        insert is all the request waits for, so acknowledgement time does not depend on
+        processing or on how many deliveries are arriving. A redelivered event hits the
+        unique id and is dropped.
+
+        A worker applies stored events in the order Razorpay created them, one payment at a
+        time: it leases the payment document for `lease` seconds, so another worker never
+        applies the same payment's events concurrently or out of order. Each event is
+        applied through a conditional state change and then marked processed, so applying
+        it again after a crash changes nothing.
+        """
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ingest(self, body: str, event_id: Optional[str]) -> bool:
+        """
+        Stores a verified webhook body. False if this event was already received.
+        """
+        payload = json.loads(body)
+        now = datetime.utcnow()
+        try:
+            await db["webhook_events"].insert_one({
+                # Razorpay sends the id as a header; a redelivery repeats the exact body
+                "_id": event_id or hashlib.sha256(body.encode()).hexdigest(),
+                "event": payload.get("event"),
+                "razorpay_order_id": razorpay_order_id(payload),
+                "created_at": datetime.utcfromtimestamp(payload.get("created_at", now.timestamp())),
+                "body": body,
+                "status": "pending",
+                "attempts": 0,
+                "available_at": now,
+                "received_at": now
+            })
+        except DuplicateKeyError:
+            return False
+        self._wake.set()
+        return True
+
+    async def apply(self, event: dict) -> str:
+        """
+        Applies one event to its payment and returns the status to record for it.
+        """
+        payload = json.loads(event["body"])
+        if event["event"] in ("payment.captured", "order.paid"):
+            await capture_payment(event["razorpay_order_id"], razorpay_payment_id(payload))
+            return "processed"
+        if event["event"] == "payment.failed":
+            await fail_payment(event["razorpay_order_id"])
+            return "processed"
+        # e.g. payment.authorized; capture is automatic so there is nothing to do
+        return "ignored"
+
+    async def _finish(self, event: dict, fields: dict):
+        now = datetime.utcnow()
+        await db["webhook_events"].update_one(
+            {"_id": event["_id"]},
+            {"$set": {**fields, "processed_at": now, "purge_at": now + PROCESSED_RETENTION}}
+        )
+
+    async def _defer(self, event_ids: list, attempts: int):
+        fields = {"available_at": datetime.utcnow() + timedelta(seconds=MISSING_PAYMENT_RETRY)}
+        if attempts + 1 >= self.max_attempts:
+            fields = {"status": "orphaned", "purge_at": datetime.utcnow() + PROCESSED_RETENTION}
+        await db["webhook_events"].update_many({"_id": {"$in": event_ids}}, {"$set": fields, "$inc": {"attempts": 1}})
+
+    async def process_payment(self, order_id: Optional[str]) -> int:
+        """
+        Applies every pending event of one Razorpay order, oldest first. Returns how many
+        were applied; 0 if another worker holds the payment.
+        """
+        events = await db["webhook_events"].find(
+            {"razorpay_order_id": order_id, "status": "pending"}
+        ).sort([("created_at", 1), ("received_at", 1)]).to_list(None)
+        if not events:
+            return 0
+        if order_id is None:
+            # Not about a payment at all
+            for event in events:
+                await self._finish(event, {"status": "ignored"})
+            return len(events)
+
+        now = datetime.utcnow()
+        lease_id = generate(size=10)
+        payment = await db["payments"].find_one_and_update(
+            {"razorpay_order_id": order_id, "$or": [{"webhook_lease": {"$exists": False}}, {"webhook_lease": {"$lt": now}}]},
+            {"$set": {"webhook_lease": now + self.lease, "webhook_lease_id": lease_id}},
+            projection={"_id": 1}
+        )
+        if payment is None:
+            if not await db["payments"].count_documents({"razorpay_order_id": order_id}, limit=1):
+                # Razorpay can call back before our payment insert lands; retry later
+                await self._defer([event["_id"] for event in events], max(event["attempts"] for event in events))
+            return 0
+
+        try:
+            # Re-read under the lease so nothing another worker finished is applied again
+            events = await db["webhook_events"].find(
+                {"razorpay_order_id": order_id, "status": "pending"}
+            ).sort([("created_at", 1), ("received_at", 1)]).to_list(None)
+            for event in events:
+                await self._finish(event, {"status": await self.apply(event)})
+            return len(events)
+        finally:
+            # Only our own lease; if this worker overran it, the worker that took over keeps it
+            await db["payments"].update_one(
+                {"_id": payment["_id"], "webhook_lease_id": lease_id},
+                {"$unset": {"webhook_lease": "", "webhook_lease_id": ""}}
+            )
+
+    async def drain(self) -> int:
+        """
+        Processes the payments behind one batch of due events, concurrently across payments.
+        """
+        due = await db["webhook_events"].find(
+            {"status": "pending", "available_at": {"$lte": datetime.utcnow()}},
+            {"razorpay_order_id": 1}
+        ).sort("available_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        order_ids = {event.get("razorpay_order_id") for event in due}
+        return sum(await asyncio.gather(*(self.process_payment(order_id) for order_id in order_ids)))
+
+    async def _process_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                if await self.drain():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Webhook processing failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._process_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+webhook_queue = WebhookQueue(
+    batch_size=settings.webhook_batch_size,
+    poll_interval=settings.webhook_poll_interval,
+    lease=settings.webhook_lease,
+    max_attempts=settings.webhook_max_attempts
+)
@@ -0,0 +1,155 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from bson import json_util
+from nanoid import generate
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.database import redis_client
+from app.utils.logger import logger
+
+# Writes a principal only if it was not invalidated since the caller read the generation
+# KEYS: principal key, its generation key
+# ARGV: generation read before loading the principal, serialized entry, TTL in seconds
+FILL_PRINCIPAL = redis_client.register_script("""
+if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+""")
+
+
+class PrincipalCache:
+    def __init__(self, ttl: int, local_ttl: int, max_entries: int):
+        """
+        Two-level cache of authenticated principals (users and stores) keyed by subject id.
+
+        Args:
+            ttl (int): Upper bound in seconds for a Redis entry; token expiry may shorten it.
+            local_ttl (int): Upper bound in seconds for the in-process copy. Kept short because
+                invalidations issued by other workers only reach Redis.
+            max_entries (int): Size of the in-process LRU.
+
+        Every invalidation gives the principal a fresh random generation. A miss hands back
+        the generation it saw, and the fill that follows is dropped if the generation
+        changed, so a reader that loaded the principal before a write cannot cache the
+        stale copy.
+        """
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _key(kind: str, principal_id: str) -> str:
+        return f"principal:{kind}:{principal_id}"
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:generation"
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return principal
+
+    def _set_local(self, key: str, principal: dict, ttl: float):
+        self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), principal)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, kind: str, principal_id: str) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        Returns (principal, None) on a hit. On a miss returns (None, generation), to be
+        passed to `set` with the principal loaded afterwards; the generation is None if
+        Redis could not be read.
+        """
+        key = self._key(kind, principal_id)
+        principal = self._get_local(key)
+        if principal is not None:
+            return principal, None
+
+        try:
+            raw, generation = await redis_client.mget(key, self._generation_key(key))
+        except RedisError as e:
+            logger.warning(f"Principal cache read failed for {key}: {e}")
+            return None, None
+        generation = generation.decode() if generation is not None else ""
+        if raw is None:
+            return None, generation
+
+        entry = json_util.loads(raw)
+        remaining = entry["expires_at"] - time.time()
+        if remaining <= 0:
+            return None, generation
+        principal = entry["principal"]
+        self._set_local(key, principal, remaining)
+        return principal, None
+
+    async def set(
+        self,
+        kind: str,
+        principal_id: str,
+        principal: dict,
+        generation: Optional[str],
+        token_exp: Optional[float] = None
+    ):
+        """
+        Caches a principal document loaded after a miss that returned `generation`, unless
+        it was invalidated since. The entry never outlives the token that loaded it.
+        """
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, int(token_exp - time.time()))
+        if ttl <= 0:
+            return
+
+        key = self._key(kind, principal_id)
+        if generation is not None:
+            try:
+                entry = {"expires_at": time.time() + ttl, "principal": principal}
+                filled = await FILL_PRINCIPAL(
+                    keys=[key, self._generation_key(key)], args=[generation, json_util.dumps(entry), ttl],
+                    client=redis_client
+                )
+            except RedisError as e:
+                logger.warning(f"Principal cache write failed for {key}: {e}")
+            else:
+                if not filled:
+                    # Invalidated while this copy was loading
+                    return
+        self._set_local(key, principal, ttl)
+
+    async def invalidate(self, kind: str, principal_id: str):
+        """
+        Drops a principal from both cache levels and fences off fills of copies loaded
+        before now. Call after any write to the principal document.
+        """
+        key = self._key(kind, principal_id)
+        self._local.pop(key, None)
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                # Random rather than a counter, so an expired generation is never reissued;
+                # the TTL only has to outlive the fills in flight
+                pipe.set(self._generation_key(key), generate(size=10), ex=self.ttl)
+                pipe.delete(key)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Principal cache invalidation failed for {key}: {e}")
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.principal_cache_ttl,
+    local_ttl=settings.principal_cache_local_ttl,
+    max_entries=settings.principal_cache_max_entries
+)
@@ -0,0 +1,206 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from nanoid import generate
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import db
+from app.services.order_events import order_changed
+from app.services.outbox import outbox_event
+from app.utils.logger import logger
+
+# Order statuses an unpaid order is cancelled from once its reservation expires; a store
+# may accept an order before it is paid, but it cannot ship stock that was given back
+EXPIRABLE_ORDER_STATUSES = ["pending", "accepted"]
+# Finished reservations are kept this long for auditing before the TTL index removes them
+FINISHED_RETENTION = timedelta(days=7)
+
+
+async def decrement_stock(store_id: str, product_id: str, sku_id: str, quantity: int, reservation_id: str) -> bool:
+    """
+    Takes `quantity` units of a SKU for a reservation if, and only if, that many are in
+    stock. The check and the decrement are one conditional update, so concurrent orders
+    cannot oversell. The SKU records the reservation in `held_by` in the same write, so
+    the units are returned at most once and only if they were really taken.
+    """
+    product = await db["products"].find_one_and_update(
+        {
+            "_id": product_id,
+            "store_id": store_id,
+            "skus": {"$elemMatch": {
+                "_id": sku_id, "in_stock": True, "stock_count": {"$gte": quantity}, "held_by": {"$ne": reservation_id}
+            }}
+        },
+        {"$inc": {"skus.$.stock_count": -quantity}, "$push": {"skus.$.held_by": reservation_id}},
+        projection={"skus": {"$elemMatch": {"_id": sku_id}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if product is None:
+        return False
+    if product["skus"][0]["stock_count"] <= 0:
+        # Conditional on the count, so a concurrent release is never overwritten; `sold_out`
+        # marks the flag as ours to set back, unlike a SKU the store switched off
+        await db["products"].update_one(
+            {"_id": product_id, "skus": {"$elemMatch": {"_id": sku_id, "stock_count": {"$lte": 0}}}},
+            {"$set": {"skus.$.in_stock": False, "skus.$.sold_out": True}}
+        )
+    return True
+
+
+async def restore_stock(product_id: str, sku_id: str, quantity: int, reservation_id: str):
+    """
+    Returns units a reservation took; a no-op if it never took them or already gave them back.
+    """
+    result = await db["products"].update_one(
+        {"_id": product_id, "skus": {"$elemMatch": {"_id": sku_id, "held_by": reservation_id}}},
+        {"$inc": {"skus.$.stock_count": quantity}, "$pull": {"skus.$.held_by": reservation_id}}
+    )
+    if result.modified_count:
+        await db["products"].update_one(
+            {"_id": product_id, "skus": {"$elemMatch": {"_id": sku_id, "sold_out": True, "stock_count": {"$gt": 0}}}},
+            {"$set": {"skus.$.in_stock": True}, "$unset": {"skus.$.sold_out": ""}}
+        )
+
+
+async def forget_hold(product_id: str, sku_id: str, reservation_id: str):
+    await db["products"].update_one(
+        {"_id": product_id, "skus._id": sku_id},
+        {"$pull": {"skus.$.held_by": reservation_id}}
+    )
+
+
+class StockReservations:
+    def __init__(self, ttl: int, sweep_interval: int):
+        """
+        Holds stock for orders between creation and payment.
+
+        Reserving records each item on a `stock_reservations` document and then decrements
+        SKU stock in place. A reservation is committed when payment is
+        captured, or released (stock put back) on cancellation, rejection, payment expiry
+        or after `ttl` seconds unpaid. Release flips the document's status first, so each
+        reservation's stock is returned at most once however many paths race to release it.
+        """
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def reserve(self, order_id: str, store_id: str, items: Iterable[Tuple[str, str, int]]) -> dict:
+        """
+        Reserves (product_id, sku_id, quantity) items for an order, all or nothing.
+        Raises 409 naming the first SKU that is short.
+        """
+        wanted = Counter()
+        for product_id, sku_id, quantity in items:
+            wanted[(product_id, sku_id)] += quantity
+
+        now = datetime.utcnow()
+        reservation = {
+            "_id": f"res_{generate(size=10)}",
+            "order_id": order_id,
+            "store_id": store_id,
+            "items": [],
+            "status": "held",
+            "expires_at": now + timedelta(seconds=self.ttl),
+            "created_at": now,
+            "updated_at": now
+        }
+        await db["stock_reservations"].insert_one(reservation)
+
+        for (product_id, sku_id), quantity in wanted.items():
+            item = {"product_id": product_id, "sku_id": sku_id, "quantity": quantity}
+            # Recorded before the stock is taken, so a crash in between leaves nothing the
+            # sweeper cannot find; restoring an item whose stock was never taken is a no-op
+            await db["stock_reservations"].update_one({"_id": reservation["_id"]}, {"$push": {"items": item}})
+            reservation["items"].append(item)
+            if not await decrement_stock(store_id, product_id, sku_id, quantity, reservation["_id"]):
+                await self.release(order_id, reason="insufficient_stock")
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Insufficient stock for SKU {sku_id}")
+        return reservation
+
+    async def _finish(self, query: dict, new_status: str, reason: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db["stock_reservations"].find_one_and_update(
+            {**query, "status": "held"},
+            {"$set": {"status": new_status, "reason": reason, "updated_at": now, "purge_at": now + FINISHED_RETENTION}}
+        )
+
+    async def release(self, order_id: str, reason: str) -> bool:
+        """
+        Returns an order's held stock. False if nothing was held.
+        """
+        reservation = await self._finish({"order_id": order_id}, "released", reason)
+        if reservation is None:
+            return False
+        for item in reservation["items"]:
+            await restore_stock(item["product_id"], item["sku_id"], item["quantity"], reservation["_id"])
+        return True
+
+    async def commit(self, order_id: str) -> bool:
+        """
+        Makes an order's reservation permanent once it is paid. False if it had already
+        been released, e.g. it expired before the payment arrived.
+        """
+        reservation = await self._finish({"order_id": order_id}, "committed", "payment_captured")
+        if reservation is None:
+            return False
+        for item in reservation["items"]:
+            await forget_hold(item["product_id"], item["sku_id"], reservation["_id"])
+        return True
+
+    async def sweep(self) -> int:
+        """
+        Releases every reservation past its expiry and cancels its order, which is still
+        unpaid: a captured payment would have committed the reservation.
+        """
+        expired: List[dict] = await db["stock_reservations"].find(
+            {"status": "held", "expires_at": {"$lte": datetime.utcnow()}},
+            {"order_id": 1}
+        ).to_list(1000)
+        released = 0
+        for reservation in expired:
+            if await self.release(reservation["order_id"], reason="expired"):
+                released += 1
+                order = await db["orders"].find_one_and_update(
+                    {"_id": reservation["order_id"], "status": {"$in": EXPIRABLE_ORDER_STATUSES}, "payment_status": "pending"},
+                    {
+                        "$set": {"status": "cancelled", "cancel_reason": "reservation_expired", "updated_at": datetime.utcnow()},
+                        "$push": {"outbox": outbox_event("order.expired")}
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+                if order is not None:
+                    await order_changed(order)
+        return released
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                released = await self.sweep()
+                if released:
+                    logger.info(f"Released {released} expired stock reservations")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stock reservation sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+stock_reservations = StockReservations(
+    ttl=settings.stock_reservation_ttl,
+    sweep_interval=settings.stock_reservation_sweep_interval
+)
@@ -0,0 +1,158 @@
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import db
+from app.utils.logger import logger
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Relative weight of a query token hitting each indexed field
+PRODUCT_FIELD_WEIGHTS = {"name": 4.0, "brand": 2.0, "category": 1.0, "sub_category": 1.0}
+STORE_FIELD_WEIGHTS = {"name": 1.0}
+
+# Matches fetched from Mongo before ranking; bounds work per query regardless of catalog size.
+# Name matches are fetched first, so a common term that matches more documents than this
+# only loses weaker matches (brand or category hits) to the cut, never stronger ones
+SEARCH_CANDIDATE_LIMIT = 200
+
+# Name tokens are stored a second time under this prefix, so name matches can be found
+# through the same `search_terms` index. Tokens are word characters only, so it never clashes
+NAME_TERM_PREFIX = "name:"
+BACKFILL_BATCH_SIZE = 1000
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Splits text into lower-cased word tokens. Unicode word characters are kept so
+    Devanagari product names tokenize the same way as Latin ones.
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def build_search_terms(document: dict, field_weights: Dict[str, float]) -> List[str]:
+    """
+    Returns the sorted, de-duplicated token list stored in a document's `search_terms` field,
+    including the name's tokens under NAME_TERM_PREFIX.
+    """
+    terms = set()
+    for field in field_weights:
+        terms.update(tokenize(document.get(field)))
+    terms.update(NAME_TERM_PREFIX + token for token in tokenize(document.get("name")))
+    return sorted(terms)
+
+
+def build_search_filter(query: Optional[str], term_prefix: str = "") -> Optional[dict]:
+    """
+    Translates a user query into a `search_terms` filter. Every token must match exactly
+    except the last, which is matched as a prefix so results update while the user types.
+    Prefix regexes are anchored and escaped, so they run as index range scans. With
+    NAME_TERM_PREFIX as `term_prefix`, only names are matched.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    *complete, partial = tokens
+    clauses = [{"search_terms": term_prefix + token} for token in complete]
+    clauses.append({"search_terms": {"$regex": f"^{re.escape(term_prefix + partial)}"}})
+    return {"$and": clauses} if len(clauses) > 1 else clauses[0]
+
+
+def score_document(document: dict, query: str, field_weights: Dict[str, float]) -> float:
+    """
+    Relevance of a candidate: exact token hits count double a prefix hit, weighted by field,
+    with a bonus when the name itself starts with the query.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return 0.0
+    score = 0.0
+    for field, weight in field_weights.items():
+        field_tokens = tokenize(document.get(field))
+        if not field_tokens:
+            continue
+        for token in tokens:
+            if token in field_tokens:
+                score += 2 * weight
+            elif any(field_token.startswith(token) for field_token in field_tokens):
+                score += weight
+    if (document.get("name") or "").casefold().startswith(query.strip().casefold()):
+        score += 1.0
+    return score
+
+
+def rank_documents(documents: Iterable[dict], query: str, field_weights: Dict[str, float], limit: int) -> List[dict]:
+    ranked = sorted(
+        documents,
+        key=lambda document: (-score_document(document, query, field_weights), len(document.get("name") or "")),
+    )
+    return ranked[:limit]
+
+
+async def find_candidates(collection, query: str, base_filter: dict, projection: Optional[dict] = None) -> List[dict]:
+    """
+    Up to SEARCH_CANDIDATE_LIMIT documents matching `query` for `rank_documents`: those
+    matching on name first, then the remainder matching on any field.
+    """
+    name_filter = {**base_filter, **build_search_filter(query, NAME_TERM_PREFIX)}
+    candidates = await collection.find(name_filter, projection) \
+        .limit(SEARCH_CANDIDATE_LIMIT).to_list(SEARCH_CANDIDATE_LIMIT)
+    remaining = SEARCH_CANDIDATE_LIMIT - len(candidates)
+    if remaining > 0:
+        other_filter = {
+            **base_filter,
+            **build_search_filter(query),
+            "_id": {"$nin": [candidate["_id"] for candidate in candidates]}
+        }
+        candidates += await collection.find(other_filter, projection).limit(remaining).to_list(remaining)
+    return candidates
+
+
+async def backfill_search_terms(collection: str, field_weights: Dict[str, float], rebuild: bool = False):
+    """
+    Populates `search_terms` on documents written before the field existed, or on every
+    document with `rebuild`.
+    """
+    projection = {field: 1 for field in field_weights}
+    query = {} if rebuild else {"search_terms": {"$exists": False}}
+    cursor = db[collection].find(query, projection)
+    operations = []
+    updated = 0
+    async for document in cursor:
+        operations.append(UpdateOne(
+            {"_id": document["_id"]},
+            {"$set": {"search_terms": build_search_terms(document, field_weights)}}
+        ))
+        if len(operations) >= BACKFILL_BATCH_SIZE:
+            await db[collection].bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await db[collection].bulk_write(operations, ordered=False)
+        updated += len(operations)
+    if updated:
+        logger.info(f"Backfilled search terms on {updated} {collection} documents")
+
+
+async def migrate_search_name_terms(collections: Dict[str, Dict[str, float]]):
+    """
+    Rebuilds `search_terms` once per database so documents indexed before name terms
+    existed carry them. The first worker to start claims it in `migrations`.
+    """
+    try:
+        await db["migrations"].insert_one({"_id": "search_name_terms", "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return
+    try:
+        for collection, field_weights in collections.items():
+            await backfill_search_terms(collection, field_weights, rebuild=True)
+    except BaseException:
+        # Let the next start try again
+        await db["migrations"].delete_one({"_id": "search_name_terms"})
+        raise
+    await db["migrations"].update_one({"_id": "search_name_terms"}, {"$set": {"finished_at": datetime.utcnow()}})
@@ -0,0 +1,234 @@
+import asyncio
+import math
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from app.core.database import db, redis_client
+from app.services.nearby_service import closest_per_owner, query_nearby_stores, quoted_cards
+from app.utils.geo import geojson_point, haversine_m_many
+from app.utils.logger import logger
+from app.utils.metrics import nearby_cache_requests, nearby_lookup_seconds
+
+# Grid cells are 0.02 degrees square, about 2.2 km north-south
+CELL_SIZE_DEG = 0.02
+METRES_PER_DEGREE = 111320.0
+# Beyond this many cells a query scans every store instead of walking the grid
+MAX_CELLS_PER_QUERY = 2500
+
+CHANGES_CHANNEL = "stores:location_changes"
+RECONNECT_DELAY_SECONDS = 5
+
+STORE_PROJECTION = {"name": 1, "phone": 1, "description": 1, "addresses": 1}
+
+
+def store_card(store: dict) -> Optional[dict]:
+    """
+    Nearby-store card for a store document, or None if it has no verified address.
+    """
+    locations = [
+        address.get("location") or geojson_point(address["latitude"], address["longitude"])
+        for address in store.get("addresses") or []
+        if address.get("is_verified")
+    ]
+    if not locations:
+        return None
+    return {
+        "_id": store["_id"],
+        "name": store.get("name"),
+        "phone": store.get("phone"),
+        "description": store.get("description"),
+        "locations": locations
+    }
+
+
+class StoreSpatialIndex:
+    def __init__(self):
+        """
+        Uniform grid over verified store addresses, held in each worker.
+
+        Every worker loads all verified stores at startup and then applies changes
+        announced on a Redis channel. A worker re-subscribes and reloads after losing the
+        channel, and reports itself not ready in between so callers fall back to Mongo.
+        """
+        self.ready = False
+        self._cards: Dict[str, dict] = {}
+        self._store_cells: Dict[str, Set[Tuple[int, int]]] = {}
+        # cell -> store id -> (latitude, longitude) of that store's addresses in the cell
+        self._cells: Dict[Tuple[int, int], Dict[str, List[Tuple[float, float]]]] = {}
+        # cell -> (owner slots, latitudes, longitudes), rebuilt lazily after the cell changes
+        self._cell_arrays: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._slots: Dict[str, int] = {}
+        self._slot_cards: Dict[int, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._cards)
+
+    @staticmethod
+    def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / CELL_SIZE_DEG), math.floor(longitude / CELL_SIZE_DEG)
+
+    def upsert(self, store: dict):
+        self.remove(store["_id"])
+        card = store_card(store)
+        if card is None:
+            return
+        store_id = card["_id"]
+        slot = self._slots.setdefault(store_id, len(self._slots))
+        for location in card["locations"]:
+            longitude, latitude = location["coordinates"]
+            cell = self._cell(latitude, longitude)
+            self._cells.setdefault(cell, {}).setdefault(store_id, []).append((latitude, longitude))
+            self._cell_arrays.pop(cell, None)
+            self._store_cells.setdefault(store_id, set()).add(cell)
+        self._cards[store_id] = card
+        self._slot_cards[slot] = card
+
+    def remove(self, store_id: str):
+        self._cards.pop(store_id, None)
+        slot = self._slots.get(store_id)
+        if slot is not None:
+            self._slot_cards.pop(slot, None)
+        for cell in self._store_cells.pop(store_id, set()):
+            members = self._cells.get(cell)
+            if members is not None:
+                members.pop(store_id, None)
+                self._cell_arrays.pop(cell, None)
+                if not members:
+                    del self._cells[cell]
+
+    def _arrays(self, cell: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        arrays = self._cell_arrays.get(cell)
+        if arrays is None:
+            owners, points = [], []
+            for store_id, coordinates in self._cells[cell].items():
+                owners.extend([self._slots[store_id]] * len(coordinates))
+                points.extend(coordinates)
+            points = np.array(points, dtype=np.float64)
+            arrays = np.array(owners, dtype=np.int64), points[:, 0], points[:, 1]
+            self._cell_arrays[cell] = arrays
+        return arrays
+
+    def nearby(self, latitude: float, longitude: float, max_distance: float, limit: int) -> List[dict]:
+        started = time.perf_counter()
+        lat_span = max_distance / METRES_PER_DEGREE
+        lon_span = max_distance / (METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        min_row, min_col = self._cell(latitude - lat_span, longitude - lon_span)
+        max_row, max_col = self._cell(latitude + lat_span, longitude + lon_span)
+
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > MAX_CELLS_PER_QUERY:
+            cells = list(self._cells)
+        else:
+            cells = [
+                (row, col)
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self._cells
+            ]
+
+        stores = []
+        if cells:
+            parts = [self._arrays(cell) for cell in cells]
+            owners = np.concatenate([part[0] for part in parts])
+            latitudes = np.concatenate([part[1] for part in parts])
+            longitudes = np.concatenate([part[2] for part in parts])
+            distances = haversine_m_many(latitude, longitude, latitudes, longitudes)
+            closest = closest_per_owner(owners, distances, max_distance, limit)
+            stores = quoted_cards(
+                [self._slot_cards[slot] for slot in owners[closest]],
+                latitudes[closest], longitudes[closest], distances[closest]
+            )
+        nearby_cache_requests.labels(result="index").inc()
+        nearby_lookup_seconds.labels(result="index").observe(time.perf_counter() - started)
+        return stores
+
+    async def load(self):
+        """
+        Replaces the index with every store that has a verified address.
+        """
+        fresh = StoreSpatialIndex()
+        async for store in db["stores"].find({"addresses.is_verified": True}, STORE_PROJECTION):
+            fresh.upsert(store)
+        for cell in fresh._cells:
+            fresh._arrays(cell)
+        (self._cards, self._store_cells, self._cells, self._cell_arrays, self._slots, self._slot_cards) = (
+            fresh._cards, fresh._store_cells, fresh._cells, fresh._cell_arrays, fresh._slots, fresh._slot_cards
+        )
+        logger.info(f"Loaded {len(self._cards)} stores into the spatial index")
+
+    async def reload_store(self, store_id: str):
+        store = await db["stores"].find_one({"_id": store_id}, STORE_PROJECTION)
+        if store is None:
+            self.remove(store_id)
+        else:
+            self.upsert(store)
+
+    async def publish_change(self, store_id: str):
+        """
+        Applies a change to a store's card locally and announces it to the other workers.
+        """
+        await self.reload_store(store_id)
+        try:
+            await redis_client.publish(CHANGES_CHANNEL, store_id)
+        except RedisError as e:
+            # Other workers lose their feed too and fall back to Mongo until they reload
+            logger.warning(f"Store location change for {store_id} not published: {e}")
+
+    async def _listen(self):
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(CHANGES_CHANNEL)
+                # Subscribe before loading so no change can fall between the two
+                await self.load()
+                self.ready = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self.reload_store(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Spatial index lost its change feed, falling back to Mongo: {e}")
+            finally:
+                self.ready = False
+                await pubsub.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+async def check_consistency(index: StoreSpatialIndex, samples: int = 100, max_distance: int = 5000, limit: int = 20) -> List[dict]:
+    """
+    Compares index answers with Mongo $geoNear at random indexed store locations and
+    returns the points where the two disagree.
+    """
+    cards = list(index._cards.values())
+    mismatches = []
+    for card in random.sample(cards, min(samples, len(cards))):
+        longitude, latitude = card["locations"][0]["coordinates"]
+        from_index = [store["_id"] for store in index.nearby(latitude, longitude, max_distance, limit)]
+        from_mongo = [store["_id"] for store in await query_nearby_stores(latitude, longitude, max_distance, limit)]
+        if set(from_index) != set(from_mongo):
+            mismatches.append({
+                "latitude": latitude,
+                "longitude": longitude,
+                "only_index": sorted(set(from_index) - set(from_mongo)),
+                "only_mongo": sorted(set(from_mongo) - set(from_index))
+            })
+    return mismatches
+
+
+store_spatial_index = StoreSpatialIndex()
@@ -3,6 +3,18 @@ from nanoid import generate
 from app.utils.datetime import get_ist_time
 from typing import Any, Dict
 
+# GeoJSON points of a store's verified addresses, kept on `verified_locations` so $geoNear
+# ranks stores by the addresses they actually serve from
+VERIFIED_LOCATIONS = {
+    "$map": {
+        "input": {"$filter": {"input": {"$ifNull": ["$addresses", []]}, "cond": {"$and": [
+            {"$eq": ["$$this.is_verified", True]},
+            {"$eq": [{"$type": "$$this.location"}, "object"]}
+        ]}}},
+        "in": "$$this.location"
+    }
+}
+
 async def get_store_by_phone(phone: int) -> str:
     """
     Helper function to fetch the store's name based on the phone number.
@@ -25,4 +37,45 @@ async def create_store_document(phone: int) -> str:
         "active": True
     }
     result = await db.stores.insert_one(store)
-    return result.inserted_id
\ No newline at end of file
+    return result.inserted_id
+
+async def migrate_store_address_locations() -> int:
+    """
+    Adds a GeoJSON `location` to store addresses that only have latitude/longitude, and
+    fills `verified_locations` on stores that predate it. Returns the stores changed.
+    """
+    result = await db.stores.update_many(
+        {"addresses": {"$elemMatch": {"location": {"$exists": False}, "latitude": {"$type": "number"}}}},
+        [{
+            "$set": {
+                "addresses": {
+                    "$map": {
+                        "input": "$addresses",
+                        "as": "address",
+                        "in": {
+                            "$cond": [
+                                {"$and": [{"$isNumber": "$$address.latitude"}, {"$isNumber": "$$address.longitude"}]},
+                                {"$mergeObjects": ["$$address", {"location": {
+                                    "type": "Point",
+                                    "coordinates": ["$$address.longitude", "$$address.latitude"]
+                                }}]},
+                                "$$address"
+                            ]
+                        }
+                    }
+                }
+            }
+        }, {"$set": {"verified_locations": VERIFIED_LOCATIONS}}]
+    )
+    backfilled = await db.stores.update_many(
+        {"verified_locations": {"$exists": False}},
+        [{"$set": {"verified_locations": VERIFIED_LOCATIONS}}]
+    )
+    return result.modified_count + backfilled.modified_count
+
+
+async def sync_verified_locations(store_id: str):
+    """
+    Recomputes a store's `verified_locations`. Call after any change to its addresses.
+    """
+    await db.stores.update_one({"_id": store_id}, [{"$set": {"verified_locations": VERIFIED_LOCATIONS}}])
\ No newline at end of file
@@ -1,24 +1,70 @@
 import httpx
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.core.config import settings
 
 logger = logging.getLogger("whatsapp_service")
 
 
 class WhatsAppService:
-    def __init__(self, user_number_id: str, store_number_id: str, token: str):
+    def __init__(
+        self,
+        user_number_id: str,
+        store_number_id: str,
+        token: str,
+        base_url: str = "https://graph.facebook.com",
+        http2: bool = True,
+        max_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
         """
         Initialize the WhatsApp Service with API credentials.
 
+        Messages go through one long-lived client per worker, so sends reuse open
+        connections instead of paying a TCP and TLS handshake each; over HTTP/2 they also
+        share a connection concurrently.
+
         Args:
             user_number_id (str): WhatsApp Business ID for user interactions.
             store_number_id (str): WhatsApp Business ID for store interactions.
             token (str): WhatsApp API access token.
+            base_url (str): Graph API origin; point at a fake server for tests and benchmarks.
+            http2 (bool): Negotiate HTTP/2 when the server offers it.
+            max_connections (int): Upper bound on open connections to the Graph API.
+            keepalive_expiry (float): Seconds an idle connection is kept open.
+            timeout (float): Seconds allowed for each send.
+            transport (httpx.AsyncBaseTransport): Optional transport override for tests.
         """
         self.user_number_id = user_number_id
         self.store_number_id = store_number_id
         self.token = token
+        self._client_options = {
+            "base_url": base_url,
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            "timeout": timeout,
+            "headers": {"Authorization": f"Bearer {token}"},
+            "transport": transport
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self):
+        """
+        Opens the shared client. Called on startup; sends before then open it on demand.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self._client_options)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def send_message(self, phone_number: int, template_id: str, placeholders: List[str], is_store: bool = False):
         """
@@ -36,12 +82,7 @@ class WhatsAppService:
         try:
             # Determine the WhatsApp Business ID
             whatsapp_phone_id = self.store_number_id if is_store else self.user_number_id
-            api_url = f"https://graph.facebook.com/v15.0/{whatsapp_phone_id}/messages"
-
-            headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json"
-            }
+            api_url = f"/v15.0/{whatsapp_phone_id}/messages"
 
             # Build the template message payload
             components = [
@@ -62,12 +103,12 @@ class WhatsAppService:
                 }
             }
 
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Sending WhatsApp message to {phone_number} using template '{template_id}'.")
-                response = await client.post(api_url, headers=headers, json=payload)
-                response.raise_for_status()
-                logger.info(f"WhatsApp message sent successfully: {response.json()}")
-                return response.json()
+            self.start()
+            logger.info(f"Sending WhatsApp message to {phone_number} using template '{template_id}'.")
+            response = await self._client.post(api_url, json=payload)
+            response.raise_for_status()
+            logger.info(f"WhatsApp message sent successfully: {response.json()}")
+            return response.json()
 
         except httpx.RequestError as e:
             logger.error(f"Request error while sending WhatsApp message to {phone_number}: {e}")
@@ -83,5 +124,10 @@ class WhatsAppService:
 whatsapp_service = WhatsAppService(
     user_number_id=settings.whatsapp_user_number_id,
     store_number_id=settings.whatsapp_store_number_id,
-    token=settings.whatsapp_token
+    token=settings.whatsapp_token,
+    base_url=settings.whatsapp_base_url,
+    http2=settings.whatsapp_http2,
+    max_connections=settings.whatsapp_max_connections,
+    keepalive_expiry=settings.whatsapp_keepalive_expiry,
+    timeout=settings.whatsapp_timeout
 )
\ No newline at end of file
@@ -0,0 +1,50 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+from pymongo import monitoring
+
+nearby_cache_requests = Counter(
+    "nearby_cache_requests_total",
+    "Nearby store lookups by cache outcome",
+    ["result"],
+)
+
+nearby_lookup_seconds = Histogram(
+    "nearby_lookup_seconds",
+    "Nearby store lookup latency by cache outcome",
+    ["result"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+mongo_round_trips = Histogram(
+    "mongo_round_trips_per_request",
+    "MongoDB commands issued while serving one request, by route",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50),
+)
+
+
+class RoundTripCount:
+    def __init__(self):
+        self.value = 0
+
+
+# Set per request; motor runs commands on its executor with a copy of the caller's context
+current_round_trips: ContextVar[Optional[RoundTripCount]] = ContextVar("current_round_trips", default=None)
+
+
+class RoundTripListener(monitoring.CommandListener):
+    """
+    Counts every command sent to MongoDB, getMore included, against the current request.
+    """
+    def started(self, event):
+        count = current_round_trips.get()
+        if count is not None:
+            count.value += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
@@ -8,6 +10,7 @@ from jose import jwt
 from datetime import datetime, timedelta
 from app.core.config import settings
 from app.core.database import db
+from app.services.principal_cache import principal_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -15,11 +18,46 @@ oauth2_user_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/users/login")
 oauth2_store_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/stores/login")
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class HashingExecutor:
+    def __init__(self, workers: int, max_queue: int):
+        """
+        Runs bcrypt off the event loop on a bounded thread pool.
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+        bcrypt releases the GIL while hashing, so threads are enough to keep the loop
+        responsive without paying process start-up and pickling costs. Jobs beyond
+        `workers + max_queue` are rejected with a 503 instead of piling up.
+        """
+        self.capacity = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+
+    async def run(self, fn, *args):
+        if self._pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+hashing_executor = HashingExecutor(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue
+)
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_executor.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_executor.run(pwd_context.verify, plain_password, hashed_password)
 
 def create_jwt_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
     to_encode = data.copy()
@@ -36,36 +74,30 @@ def decode_jwt_token(token: str):
         return None
 
 
-async def get_current_user(token: str = Depends(oauth2_user_scheme)):
+async def _get_current_principal(token: str, kind: str, collection: str, not_found_detail: str) -> dict:
     payload = decode_jwt_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    
-    user_id = payload.get("sub")
-    user = await db["users"].find_one({"_id": user_id})
-    if not user:
+
+    principal_id = payload.get("sub")
+    principal, generation = await principal_cache.get(kind, principal_id)
+    if principal is not None:
+        return principal
+
+    principal = await db[collection].find_one({"_id": principal_id}, {"hashed_password": 0})
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail=not_found_detail,
         )
-    return user
+    await principal_cache.set(kind, principal_id, principal, generation, token_exp=payload.get("exp"))
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_user_scheme)):
+    return await _get_current_principal(token, "user", "users", "User not found")
 
 async def get_current_store(token: str = Depends(oauth2_store_scheme)):
-    payload = decode_jwt_token(token)
-    if not payload or "sub" not in payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-        )
-    
-    store_id = payload.get("sub")
-    store = await db["stores"].find_one({"_id": store_id})
-    if not store:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Store not found",
-        )
-    return store
\ No newline at end of file
+    return await _get_current_principal(token, "store", "stores", "Store not found")
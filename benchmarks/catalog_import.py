@@ -0,0 +1,109 @@
+"""
+Catalog import benchmark: rows/sec and peak memory of the streaming CSV/NDJSON pipeline.
+
+Generates a synthetic POS export (one row per SKU, two SKUs per product) and streams it
+in fixed-size byte chunks through the import parser and batch validation. With
+--trace-memory the run is traced and peak memory reported, so runs at different sizes
+show it does not grow with the file (tracing slows the run several times). With
+--with-mongo the full import, bulk writes included, runs against the configured
+database for a throwaway store id; point MONGO_DB at a scratch database.
+
+Usage:
+    python -m benchmarks.catalog_import --rows 100000
+    python -m benchmarks.catalog_import --rows 100000 --format ndjson
+    python -m benchmarks.catalog_import --rows 1000000 --trace-memory
+    MONGO_DB=locality_bench python -m benchmarks.catalog_import --rows 100000 --with-mongo
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.core.database import db
+from app.services.catalog_import import IMPORT_PARSERS, iter_lines, run_catalog_import
+from app.services.catalog_service import BULK_WRITE_CHUNK_SIZE, validate_items
+
+CSV_HEADER = "external_code,name,description,category,sub_category,brand,sku_name,price,mrp,unit,quantity,in_stock,stock_count\n"
+ITEMS = ["onion", "tomato", "basmati rice", "toor dal", "atta", "paneer", "ghee", "masala chai", "poha", "besan"]
+BRANDS = ["amul", "tata", "aashirvaad", "haldiram", "britannia", "fortune"]
+SIZES = [("500g", 0.5), ("1kg", 1.0)]
+
+
+def export_lines(rows: int, import_format: str):
+    if import_format == "csv":
+        yield CSV_HEADER
+    for product in range((rows + 1) // 2):
+        name = f"{BRANDS[product % len(BRANDS)]} {ITEMS[product % len(ITEMS)]} {product}"
+        skus = [
+            {"name": size, "price": f"{40 + quantity * 20:.2f}", "mrp": f"{50 + quantity * 20:.2f}", "unit": "kg",
+             "quantity": quantity, "in_stock": True, "stock_count": product % 50}
+            for size, quantity in SIZES
+        ]
+        if import_format == "csv":
+            for sku in skus:
+                yield (f"POS-{product},\"{name}\",,staples,,{BRANDS[product % len(BRANDS)]},{sku['name']},"
+                       f"{sku['price']},{sku['mrp']},kg,{sku['quantity']},true,{sku['stock_count']}\n")
+        else:
+            yield json.dumps({"external_code": f"POS-{product}", "name": name, "description": None,
+                              "category": "staples", "sub_category": None, "brand": BRANDS[product % len(BRANDS)],
+                              "skus": skus}) + "\n"
+
+
+async def export_chunks(rows: int, import_format: str, chunk_size: int):
+    buffer = []
+    size = 0
+    for line in export_lines(rows, import_format):
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+async def parse_and_validate(rows: int, import_format: str, chunk_size: int) -> int:
+    products = 0
+    batch = []
+    async for row_number, item, error in IMPORT_PARSERS[import_format](iter_lines(export_chunks(rows, import_format, chunk_size))):
+        batch.append((row_number, item))
+        if len(batch) >= BULK_WRITE_CHUNK_SIZE:
+            products += len(validate_items(batch)[0])
+            batch = []
+    return products + len(validate_items(batch)[0])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=sorted(IMPORT_PARSERS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="bytes per request body chunk")
+    parser.add_argument("--with-mongo", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true")
+    args = parser.parse_args()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if args.with_mongo:
+        store_id = "str_bench_import"
+        await db["products"].delete_many({"store_id": store_id})
+        report = await run_catalog_import(store_id, args.format, export_chunks(args.rows, args.format, args.chunk_size))
+        products = report["created"] + report["updated"]
+        label = "import"
+    else:
+        products = await parse_and_validate(args.rows, args.format, args.chunk_size)
+        label = "parse+validate"
+    elapsed = time.perf_counter() - started
+
+    print(f"{label}: {args.rows} {args.format} rows ({products} products) in {elapsed:.2f}s, "
+          f"{args.rows / elapsed:,.0f} rows/sec")
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Delivery quote benchmark: vectorized distance + slab pricing vs a per-store Python loop.
+
+Scores N candidate store addresses around one customer point, the way a nearby-store
+listing does, with NumPy (one haversine pass plus a searchsorted over the slabs) and with
+the straightforward per-candidate loop, and checks both give the same quotes.
+
+Usage:
+    python -m benchmarks.delivery_quotes --candidates 5000
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.delivery_service import delivery_quoter
+from app.utils.geo import haversine_m, haversine_m_many
+
+
+def quote_loop(latitude, longitude, points):
+    quotes = []
+    for point_lat, point_lon in points:
+        distance = haversine_m(latitude, longitude, point_lat, point_lon)
+        for limit, fee, eta in settings.delivery_slabs:
+            if distance <= limit:
+                quotes.append((fee, eta))
+                break
+        else:
+            quotes.append(None)
+    return quotes
+
+
+def quote_vectorized(latitude, longitude, latitudes, longitudes):
+    distances = haversine_m_many(latitude, longitude, latitudes, longitudes)
+    return delivery_quoter.quote(distances)
+
+
+def timed(fn, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    latitude, longitude = 12.9716, 77.5946
+    points = [(latitude + rng.gauss(0, 0.05), longitude + rng.gauss(0, 0.05)) for _ in range(args.candidates)]
+    latitudes = np.array([point[0] for point in points])
+    longitudes = np.array([point[1] for point in points])
+
+    expected = quote_loop(latitude, longitude, points)
+    fees, etas, deliverable = quote_vectorized(latitude, longitude, latitudes, longitudes)
+    actual = [(float(fee), int(eta)) if ok else None for fee, eta, ok in zip(fees, etas, deliverable)]
+    assert actual == expected, "vectorized quotes disagree with the loop"
+
+    for label, fn in (
+        ("loop", lambda: quote_loop(latitude, longitude, points)),
+        ("numpy", lambda: quote_vectorized(latitude, longitude, latitudes, longitudes))
+    ):
+        p50, p99 = timed(fn, args.rounds)
+        print(f"{label:>6}: {args.candidates} candidates p50={p50:.3f}ms p99={p99:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
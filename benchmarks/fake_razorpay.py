@@ -0,0 +1,98 @@
+"""
+Local stand-in for the Razorpay orders API, for benchmarks and manual testing.
+
+Serves POST /v1/orders, GET /v1/orders/{id} and GET /v1/orders/{id}/payments with a fixed
+added latency. Orders it did not create get a stable made-up outcome derived from their
+id: most paid, some with a failed attempt, the rest still unpaid.
+
+Usage:
+    python -m benchmarks.fake_razorpay --port 8790 --latency-ms 50
+    RAZORPAY_BASE_URL=http://127.0.0.1:8790 uvicorn main:app
+"""
+import argparse
+import asyncio
+import itertools
+import subprocess
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+HOST = "127.0.0.1"
+
+
+def outcome(order_id: str) -> str:
+    """
+    "paid", "attempted" (a failed payment) or "created" (no payment yet), stable per id.
+    """
+    bucket = zlib.crc32(order_id.encode()) % 10
+    return "paid" if bucket < 6 else "attempted" if bucket < 8 else "created"
+
+
+def build_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    orders = {}
+    sequence = itertools.count(1)
+
+    @app.post("/v1/orders")
+    async def create_order(order: dict):
+        await asyncio.sleep(latency)
+        order_id = f"order_fake{next(sequence):012d}"
+        orders[order_id] = {**order, "id": order_id, "entity": "order", "status": "created", "created_at": int(time.time())}
+        return orders[order_id]
+
+    @app.get("/v1/orders/{order_id}")
+    async def fetch_order(order_id: str):
+        await asyncio.sleep(latency)
+        return orders.get(order_id) or {"id": order_id, "entity": "order", "status": outcome(order_id)}
+
+    @app.get("/v1/orders/{order_id}/payments")
+    async def fetch_order_payments(order_id: str):
+        await asyncio.sleep(latency)
+        status = "created" if order_id in orders else outcome(order_id)
+        payment_status = {"paid": "captured", "attempted": "failed"}.get(status)
+        items = [] if payment_status is None else [
+            {"id": f"pay_{order_id[-14:]}", "entity": "payment", "order_id": order_id, "status": payment_status}
+        ]
+        return {"entity": "collection", "count": len(items), "items": items}
+
+    return app
+
+
+@contextmanager
+def fake_razorpay(port: int, latency_ms: float):
+    """
+    Runs the fake in a subprocess for the duration of the block; yields its base URL.
+    """
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_razorpay",
+                               "--port", str(port), "--latency-ms", str(latency_ms)])
+    base_url = f"http://{HOST}:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/v1/orders/order_probe")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("Fake Razorpay did not start")
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms / 1000), host=HOST, port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Fuzzy catalog search benchmark.
+
+Builds an in-process FuzzyCatalogIndex over a synthetic store catalog (50k SKUs by default)
+and reports build time, per-query latency percentiles and incremental update cost.
+No database is needed.
+
+Usage:
+    python -m benchmarks.fuzzy_search --skus 50000
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+
+from app.services.fuzzy_search import FuzzyCatalogIndex
+
+BASE_ITEMS = ["onion", "potato", "tomato", "basmati rice", "toor dal", "wheat atta", "paneer", "desi ghee",
+              "masala chai", "marie biscuits", "aloo bhujia", "mustard oil", "jaggery", "poha", "besan", "curd",
+              "brown bread", "salted butter", "cornflakes", "honey", "green chilli", "garlic", "ginger", "coriander"]
+BRANDS = ["amul", "tata", "aashirvaad", "haldiram", "britannia", "fortune", "patanjali", "mother dairy", "parle", "mtr"]
+QUERIES = ["pyaaz", "piyaz", "onion", "aloo", "tamatar", "chawal basmati", "daal", "atta", "ghee", "mirchi",
+           "lahsun", "adrak", "haldiram bhujia", "bisucits", "panner", "honney", "brd", "xyzzy"]
+
+
+def synthetic_catalog(skus: int, rng: random.Random):
+    for index in range(skus):
+        suffix = "".join(rng.choices(string.ascii_lowercase, k=5))
+        yield {
+            "_id": f"prd_bench_{index}",
+            "name": f"{rng.choice(BASE_ITEMS)} {suffix}",
+            "brand": rng.choice(BRANDS),
+            "category": "grocery",
+            "skus": [{"name": f"{rng.choice([250, 500, 1000])} g"}],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skus", type=int, default=50_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    catalog = list(synthetic_catalog(args.skus, rng))
+
+    index = FuzzyCatalogIndex()
+    started = time.perf_counter()
+    for product in catalog:
+        index.upsert(product)
+    print(f"build: {args.skus} SKUs in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    latencies = []
+    for _ in range(args.repeats):
+        for query in QUERIES:
+            started = time.perf_counter()
+            index.search(query, args.limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(
+        f"query: p50={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[int(0.99 * (len(latencies) - 1))]:.2f}ms max={latencies[-1]:.2f}ms"
+    )
+
+    started = time.perf_counter()
+    for product in catalog[:1000]:
+        index.upsert({**product, "name": product["name"] + " fresh"})
+    print(f"update: {(time.perf_counter() - started) * 1000 / 1000:.3f}ms per product")
+
+
+if __name__ == "__main__":
+    main()
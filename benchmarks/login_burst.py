@@ -0,0 +1,94 @@
+"""
+Login burst benchmark.
+
+Fires a burst of concurrent logins at a running instance while probing an unrelated
+endpoint at a fixed rate, then reports probe latency percentiles with and without the
+burst. With hashing on the event loop the probe p99 tracks the bcrypt queue; with the
+hashing executor it should stay flat.
+
+Usage:
+    python -m benchmarks.login_burst --base-url http://localhost:8000 \
+        --email user@example.com --password password123 --logins 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_burst(client: httpx.AsyncClient, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses = {}
+
+    async def login():
+        async with semaphore:
+            response = await client.post(args.login_path, json={"email": args.email, "password": args.password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    return statuses
+
+
+async def measure(client: httpx.AsyncClient, args, with_burst: bool):
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(client, args.probe_path, stop, args.probe_interval))
+    statuses = {}
+    if with_burst:
+        statuses = await login_burst(client, args)
+    else:
+        await asyncio.sleep(args.idle_seconds)
+    stop.set()
+    return await probe_task, statuses
+
+
+def report(label, latencies, statuses=None):
+    print(
+        f"{label:>10}: probes={len(latencies)} "
+        f"p50={statistics.median(latencies):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms "
+        f"max={max(latencies):.1f}ms"
+        + (f" login_statuses={statuses}" if statuses else "")
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--login-path", default="/api/v1/users/login")
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        idle, _ = await measure(client, args, with_burst=False)
+        report("idle", idle)
+        burst, statuses = await measure(client, args, with_burst=True)
+        report("burst", burst, statuses)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
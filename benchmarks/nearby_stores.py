@@ -0,0 +1,115 @@
+"""
+Nearby-store benchmark: in-process spatial index vs Mongo $geoNear.
+
+Generates synthetic verified stores (100k by default) scattered around Indian metros and
+times nearby lookups against the in-process grid. With --with-mongo the same stores are
+written to the configured database's `stores` collection, the $geoNear path is timed as
+well, and the two paths are checked for consistency. Point MONGO_DB at a scratch
+database for that mode; the collection is replaced.
+
+Usage:
+    python -m benchmarks.nearby_stores --stores 100000
+    MONGO_DB=locality_bench python -m benchmarks.nearby_stores --stores 100000 --with-mongo
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.database import db
+from app.services.nearby_service import query_nearby_stores
+from app.services.spatial_index import StoreSpatialIndex, check_consistency
+from app.utils.geo import geojson_point
+
+METROS = [(28.6139, 77.2090), (19.0760, 72.8777), (12.9716, 77.5946), (13.0827, 80.2707),
+          (22.5726, 88.3639), (17.3850, 78.4867), (18.5204, 73.8567), (23.0225, 72.5714)]
+BATCH_SIZE = 5000
+
+
+def synthetic_store(index: int, rng: random.Random) -> dict:
+    base_lat, base_lon = rng.choice(METROS)
+    latitude = base_lat + rng.gauss(0, 0.15)
+    longitude = base_lon + rng.gauss(0, 0.15)
+    location = geojson_point(latitude, longitude)
+    return {
+        "_id": f"str_bench_{index}",
+        "name": f"Bench Store {index}",
+        "phone": f"9{index:09d}",
+        "description": None,
+        "addresses": [{
+            "_id": f"adr_bench_{index}",
+            "address": "Synthetic address",
+            "latitude": latitude,
+            "longitude": longitude,
+            "location": location,
+            "is_verified": True,
+            "verification_status": "verified",
+            "verified_at": None
+        }],
+        "verified_locations": [location]
+    }
+
+
+def query_points(count: int, rng: random.Random):
+    points = []
+    for _ in range(count):
+        base_lat, base_lon = rng.choice(METROS)
+        points.append((base_lat + rng.gauss(0, 0.1), base_lon + rng.gauss(0, 0.1)))
+    return points
+
+
+def summarize(label: str, latencies):
+    latencies = sorted(latencies)
+    print(f"{label:>8}: p50={statistics.median(latencies):.3f}ms p99={latencies[int(0.99 * (len(latencies) - 1))]:.3f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--max-distance", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--with-mongo", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    stores = [synthetic_store(index, rng) for index in range(args.stores)]
+    points = query_points(args.queries, rng)
+
+    index = StoreSpatialIndex()
+    started = time.perf_counter()
+    for store in stores:
+        index.upsert(store)
+    print(f"build: {len(index)} stores in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    latencies = []
+    for latitude, longitude in points:
+        started = time.perf_counter()
+        index.nearby(latitude, longitude, args.max_distance, args.limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+    summarize("index", latencies)
+
+    if not args.with_mongo:
+        return
+
+    await db["stores"].drop()
+    for start in range(0, len(stores), BATCH_SIZE):
+        await db["stores"].insert_many(stores[start:start + BATCH_SIZE], ordered=False)
+    await db["stores"].create_index([("verified_locations", "2dsphere")])
+
+    latencies = []
+    for latitude, longitude in points:
+        started = time.perf_counter()
+        await query_nearby_stores(latitude, longitude, args.max_distance, args.limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+    summarize("geoNear", latencies)
+
+    mismatches = await check_consistency(index, samples=200, max_distance=args.max_distance, limit=args.limit)
+    print(f"consistency: {len(mismatches)} of 200 sampled points disagree")
+    for mismatch in mismatches[:5]:
+        print(f"  {mismatch}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Order listing benchmark: keyset cursor pages vs skip/limit at increasing depth.
+
+Seeds one store with synthetic orders (200k by default), then times fetching a page at
+several depths both by walking X-Next-Cursor positions and with skip(). Keyset pages stay
+flat; skip grows with depth. Requires a reachable MongoDB; point MONGO_DB at a scratch
+database, the orders of the benchmark store are replaced.
+
+Usage:
+    MONGO_DB=locality_bench python -m benchmarks.order_pagination --orders 200000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+
+from app.core.database import db
+from app.core.indexes import NEWEST_FIRST, ensure_indexes
+from app.core.pagination import PageParams, encode_cursor, fetch_page
+
+STORE_ID = "str_bench_pagination"
+BATCH_SIZE = 10000
+
+
+async def seed(count: int):
+    await db["orders"].delete_many({"store_id": STORE_ID})
+    started = datetime(2022, 1, 1)
+    for start in range(0, count, BATCH_SIZE):
+        await db["orders"].insert_many([
+            {"_id": f"ord_bench_{index:08d}", "store_id": STORE_ID, "user_id": "usr_bench", "status": "delivered",
+             "created_at": started + timedelta(minutes=index // 3)}
+            for index in range(start, min(start + BATCH_SIZE, count))
+        ], ordered=False)
+
+
+async def timed(fn, rounds: int) -> float:
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    await seed(args.orders)
+    query = {"store_id": STORE_ID}
+
+    for depth in (0, args.orders // 100, args.orders // 10, args.orders // 2, args.orders - args.limit):
+        # The document just before the page, as a client arriving via cursors would hold
+        cursor = None
+        if depth:
+            before = await db["orders"].find(query).sort(NEWEST_FIRST).skip(depth - 1).limit(1).to_list(1)
+            cursor = encode_cursor(before[0])
+        page = PageParams(limit=args.limit, cursor=cursor)
+        keyset = await timed(lambda: fetch_page("orders", query, page, Response()), args.rounds)
+        skip = await timed(
+            lambda: db["orders"].find(query).sort(NEWEST_FIRST).skip(depth).limit(args.limit).to_list(args.limit),
+            args.rounds
+        )
+        print(f"depth {depth:>8}: keyset p50={keyset:.2f}ms skip p50={skip:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Order stream load test: many idle server-sent event streams on one uvicorn worker.
+
+Starts a single-worker server holding only the order stream endpoint (no auth), opens
+`--connections` idle streams to it, then reports the worker's memory per stream, checks
+every stream receives a heartbeat, and times fanning one order change out to all of them.
+Events are handed to the hub directly, the step after Redis pub/sub, so no Redis or
+MongoDB is needed. Client and server each hold one socket per stream; raise `ulimit -n`
+above the connection count first.
+
+Usage:
+    python -m benchmarks.order_streams --connections 10000
+    python -m benchmarks.order_streams --connections 10000 --stores 100 --heartbeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.services.order_stream import OrderStreamHub
+
+HOST = "127.0.0.1"
+
+
+def build_app(hub: OrderStreamHub) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/stream/{store_id}")
+    async def stream(store_id: str):
+        return hub.response(f"store:{store_id}")
+
+    @app.post("/publish/{store_id}")
+    async def publish(store_id: str):
+        order = f'{{"_id": "ord_bench", "store_id": "{store_id}", "user_id": "usr_bench", "status": "accepted"}}'
+        hub.deliver(order)
+        return {"delivered": len(hub._streams.get(f"store:{store_id}", ()))}
+
+    @app.get("/stats")
+    async def stats():
+        with open("/proc/self/status") as status:
+            rss = next(int(line.split()[1]) for line in status if line.startswith("VmRSS"))
+        return {"open_streams": hub.open_streams, "rss_kib": rss}
+
+    return app
+
+
+class Streams:
+    def __init__(self):
+        self.heartbeats = set()
+        self.received = []
+        self.published_at = 0.0
+
+
+async def hold(index: int, port: int, store_id: str, streams: Streams, ready: asyncio.Semaphore):
+    async with ready:
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(f"GET /stream/{store_id} HTTP/1.1\r\nHost: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await reader.readuntil(b"retry:")
+    try:
+        while line := await reader.readline():
+            if line.startswith(b": heartbeat"):
+                streams.heartbeats.add(index)
+            elif line.startswith(b"event: order"):
+                streams.received.append((time.perf_counter() - streams.published_at) * 1000)
+    finally:
+        writer.close()
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--stores", type=int, default=1, help="Stores the streams are spread over")
+    parser.add_argument("--heartbeat", type=int, default=5, help="Seconds between heartbeats")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        hub = OrderStreamHub(heartbeat_interval=args.heartbeat, queue_size=64)
+        config = uvicorn.Config(build_app(hub), host=HOST, port=args.port, log_level="warning", backlog=4096,
+                                timeout_graceful_shutdown=1)
+        await uvicorn.Server(config).serve()
+        return
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.order_streams", "--serve",
+                               "--port", str(args.port), "--heartbeat", str(args.heartbeat)])
+    try:
+        async with httpx.AsyncClient(base_url=f"http://{HOST}:{args.port}") as client:
+            for _ in range(100):
+                try:
+                    baseline = (await client.get("/stats")).json()
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Benchmark server did not start")
+
+            streams = Streams()
+            ready = asyncio.Semaphore(500)
+            started = time.perf_counter()
+            tasks = [asyncio.create_task(hold(index, args.port, f"str_{index % args.stores}", streams, ready))
+                     for index in range(args.connections)]
+            while (stats := (await client.get("/stats")).json())["open_streams"] < args.connections:
+                if any(task.done() for task in tasks):
+                    failed = next(task for task in tasks if task.done())
+                    raise RuntimeError(f"A stream closed while opening: {failed.exception()!r}")
+                await asyncio.sleep(0.1)
+            connect_seconds = time.perf_counter() - started
+            per_stream = (stats["rss_kib"] - baseline["rss_kib"]) / args.connections
+            print(f"opened {args.connections} streams in {connect_seconds:.1f}s; "
+                  f"worker RSS {baseline['rss_kib'] / 1024:.0f} -> {stats['rss_kib'] / 1024:.0f} MiB "
+                  f"({per_stream:.1f} KiB per stream)")
+
+            streams.heartbeats.clear()
+            beat = await wait_for(lambda: len(streams.heartbeats) == args.connections, args.heartbeat * 3)
+            print(f"heartbeats: {len(streams.heartbeats)}/{args.connections} streams within {args.heartbeat * 3}s"
+                  + ("" if beat else " (missing)"))
+
+            streams.published_at = time.perf_counter()
+            for store in range(args.stores):
+                await client.post(f"/publish/str_{store}")
+            delivered = await wait_for(lambda: len(streams.received) == args.connections, 30)
+            latencies = sorted(streams.received)
+            print(f"fan-out: {len(latencies)}/{args.connections} streams received the event"
+                  + ("" if delivered else " (missing)"))
+            if latencies:
+                print(f"  p50={statistics.median(latencies):.1f}ms p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms "
+                      f"max={latencies[-1]:.1f}ms")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
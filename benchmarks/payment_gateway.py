@@ -0,0 +1,80 @@
+"""
+Razorpay client benchmark: the blocking SDK inside async code vs the pooled async gateway.
+
+Starts the local fake Razorpay (benchmarks/fake_razorpay.py) with a fixed latency, then
+creates `--orders` Razorpay orders `--concurrency` at a time through each client, the way
+concurrent checkout requests would inside one worker. Reports orders/sec and the worst
+event loop stall seen by a 10ms ticker: with the SDK every call freezes the loop for the
+full gateway round trip, so nothing else on the worker runs meanwhile.
+
+Usage:
+    python -m benchmarks.payment_gateway --orders 500 --concurrency 50 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+
+import razorpay
+
+from app.core.razorpay_client import RazorpayGateway
+from benchmarks.fake_razorpay import fake_razorpay
+
+TICK = 0.01
+
+
+async def ticker(stalls: list):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        stalls.append(time.perf_counter() - started - TICK)
+
+
+async def run(create, orders: int, concurrency: int):
+    limit = asyncio.Semaphore(concurrency)
+    stalls = []
+    tick = asyncio.create_task(ticker(stalls))
+
+    async def one(index: int):
+        async with limit:
+            await create(f"pay_bench_{index}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(orders)))
+    elapsed = time.perf_counter() - started
+    # Let the ticker record a stall still in progress
+    await asyncio.sleep(TICK * 2)
+    tick.cancel()
+    return orders / elapsed, max(stalls, default=0) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    with fake_razorpay(args.port, args.latency_ms) as base_url:
+        sdk = razorpay.Client(auth=("rzp_bench", "secret"), base_url=base_url)
+
+        async def sdk_create(receipt: str):
+            # What create_payment_order did: a blocking call straight from the handler
+            sdk.order.create({"amount": 1000, "currency": "INR", "receipt": receipt, "payment_capture": 1})
+
+        gateway = RazorpayGateway(
+            key_id="rzp_bench", key_secret="secret", base_url=base_url,
+            connect_timeout=3, read_timeout=10, max_connections=args.concurrency, max_retries=2
+        )
+
+        async def gateway_create(receipt: str):
+            await gateway.create_order(1000, "INR", receipt)
+
+        for name, create in (("sync SDK", sdk_create), ("async gateway", gateway_create)):
+            rate, stall = await run(create, args.orders, args.concurrency)
+            print(f"{name:>14}: {rate:8.1f} orders/s, worst event loop stall {stall:7.1f}ms")
+        await gateway.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
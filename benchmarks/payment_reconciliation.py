@@ -0,0 +1,78 @@
+"""
+Payment reconciliation benchmark against the local fake Razorpay.
+
+Seeds `--payments` stale payments in `created`, starts benchmarks/fake_razorpay.py with a
+fixed latency (it reports most orders paid, some failed, the rest unpaid), then runs one
+reconciliation pass and prints its report, throughput and peak Python memory, which
+should stay flat as `--payments` grows. Requires a reachable MongoDB; point MONGO_DB at a
+scratch database.
+
+Usage:
+    MONGO_DB=locality_bench python -m benchmarks.payment_reconciliation --payments 100000
+    MONGO_DB=locality_bench python -m benchmarks.payment_reconciliation --payments 100000 --concurrency 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.core.database import db
+from app.core.indexes import ensure_indexes
+from app.core.razorpay_client import RazorpayGateway
+from app.services.payment_reconciliation import PaymentReconciler
+from benchmarks.fake_razorpay import fake_razorpay
+
+PREFIX = "bench_reconcile"
+BATCH_SIZE = 10000
+
+
+async def seed(count: int):
+    await db["payments"].delete_many({"_id": {"$regex": f"^pay_{PREFIX}"}})
+    created_at = datetime.utcnow() - timedelta(days=1)
+    for start in range(0, count, BATCH_SIZE):
+        await db["payments"].insert_many([
+            {"_id": f"pay_{PREFIX}_{index:08d}", "order_id": f"ord_{PREFIX}_{index}", "payment_type": "subscription",
+             "amount": 100, "currency": "INR", "razorpay_order_id": f"order_{PREFIX}_{index:08d}", "status": "created",
+             "created_at": created_at + timedelta(milliseconds=index), "updated_at": created_at}
+            for index in range(start, min(start + BATCH_SIZE, count))
+        ], ordered=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    await seed(args.payments)
+    with fake_razorpay(args.port, args.latency_ms) as base_url:
+        gateway = RazorpayGateway(
+            key_id="rzp_bench", key_secret="secret", base_url=base_url,
+            connect_timeout=3, read_timeout=10, max_connections=args.concurrency, max_retries=2
+        )
+        reconciler = PaymentReconciler(
+            gateway, min_age=30, batch_size=args.batch_size, concurrency=args.concurrency, interval=900,
+            expire_after=60 * 24 * 2, max_age=7
+        )
+        tracemalloc.start()
+        started = time.perf_counter()
+        report = await reconciler.run()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await gateway.close()
+
+    print(f"reconciled {args.payments} payments in {elapsed:.1f}s ({args.payments / elapsed:.0f}/s), "
+          f"peak Python memory {peak / 2 ** 20:.1f} MiB")
+    print(f"counts: {report['counts']}; changed meanwhile: {report['conflicts']}")
+    remaining = await db["payments"].count_documents({"_id": {"$regex": f"^pay_{PREFIX}"}, "status": "created"})
+    print(f"still created (unpaid at the gateway): {remaining}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Product search benchmark: unanchored case-insensitive $regex vs the `search_terms` index.
+
+Seeds a throwaway database with synthetic products (1M by default), then runs the same
+queries through both paths and reports latency percentiles. Requires a reachable MongoDB.
+
+Usage:
+    python -m benchmarks.product_search --mongo-uri mongodb://localhost:27017 --products 1000000
+"""
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.search_service import (
+    PRODUCT_FIELD_WEIGHTS, build_search_terms, find_candidates, rank_documents
+)
+
+ADJECTIVES = ["fresh", "organic", "premium", "classic", "crunchy", "spicy", "roasted", "instant", "pure", "lite"]
+ITEMS = ["onion", "tomato", "basmati rice", "toor dal", "atta", "paneer", "ghee", "masala chai", "biscuits", "namkeen",
+         "mustard oil", "jaggery", "poha", "besan", "curd", "bread", "butter", "cornflakes", "honey", "peanut butter"]
+BRANDS = ["amul", "tata", "aashirvaad", "haldiram", "britannia", "fortune", "patanjali", "mother dairy", "parle", "mtr"]
+CATEGORIES = {"staples": ["rice", "flour", "pulses"], "dairy": ["milk", "cheese", "butter"],
+              "snacks": ["chips", "biscuits", "namkeen"], "beverages": ["tea", "coffee", "juice"]}
+QUERIES = ["oni", "onion", "basmati", "tata sa", "organic toor", "amul", "pea", "masala chai", "hald", "zzz"]
+BATCH_SIZE = 10000
+
+
+def synthetic_product(index: int, rng: random.Random) -> dict:
+    category = rng.choice(list(CATEGORIES))
+    product = {
+        "_id": f"prd_bench_{index}",
+        "store_id": f"str_bench_{index % 5000}",
+        "name": f"{rng.choice(ADJECTIVES)} {rng.choice(ITEMS)} {rng.randint(1, 999)}",
+        "brand": rng.choice(BRANDS),
+        "category": category,
+        "sub_category": rng.choice(CATEGORIES[category]),
+        "skus": [],
+        "is_active": True,
+    }
+    product["search_terms"] = build_search_terms(product, PRODUCT_FIELD_WEIGHTS)
+    return product
+
+
+async def seed(collection, count: int):
+    existing = await collection.estimated_document_count()
+    if existing >= count:
+        return
+    await collection.drop()
+    rng = random.Random(42)
+    for start in range(0, count, BATCH_SIZE):
+        batch = [synthetic_product(i, rng) for i in range(start, min(start + BATCH_SIZE, count))]
+        await collection.insert_many(batch, ordered=False)
+    await collection.create_index([("search_terms", 1)])
+
+
+async def regex_search(collection, query: str, limit: int):
+    return await collection.find({"name": {"$regex": re.escape(query), "$options": "i"}}).limit(limit).to_list(limit)
+
+
+async def index_search(collection, query: str, limit: int):
+    candidates = await find_candidates(collection, query, {})
+    return rank_documents(candidates, query, PRODUCT_FIELD_WEIGHTS, limit)
+
+
+async def time_path(search, collection, repeats: int, limit: int):
+    latencies = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            started = time.perf_counter()
+            await search(collection, query, limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="locality_bench")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongo_uri)
+    collection = client[args.db]["products"]
+    await seed(collection, args.products)
+
+    for label, search in [("regex", regex_search), ("search_terms", index_search)]:
+        p50, p99 = await time_path(search, collection, args.repeats, args.limit)
+        print(f"{label:>12}: p50={p50:.1f}ms p99={p99:.1f}ms over {len(QUERIES) * args.repeats} queries")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
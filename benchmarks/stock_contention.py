@@ -0,0 +1,73 @@
+"""
+Stock reservation contention benchmark.
+
+Seeds one SKU with a fixed stock, then fires many concurrent single-unit reservations at
+it, the rush-hour pattern of everyone ordering the same item. Reports reservation
+latency and throughput, and checks that exactly `stock` reservations succeeded and the
+SKU ended at zero. Requires a reachable MongoDB; point MONGO_DB at a scratch database.
+
+Usage:
+    MONGO_DB=locality_bench python -m benchmarks.stock_contention --stock 100 --orders 1000
+    MONGO_DB=locality_bench python -m benchmarks.stock_contention --stock 1 --orders 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from app.core.database import db
+from app.services.reservation_service import stock_reservations
+
+PRODUCT_ID = "prd_bench_contention"
+SKU_ID = "sku_bench_contention"
+STORE_ID = "str_bench_contention"
+
+
+async def seed(stock: int):
+    await db["products"].delete_many({"_id": PRODUCT_ID})
+    await db["stock_reservations"].delete_many({"store_id": STORE_ID})
+    await db["products"].insert_one({
+        "_id": PRODUCT_ID,
+        "store_id": STORE_ID,
+        "name": "Contended SKU",
+        "skus": [{"_id": SKU_ID, "name": "1kg", "stock_count": stock, "in_stock": True}]
+    })
+
+
+async def attempt(index: int, latencies: list) -> bool:
+    started = time.perf_counter()
+    try:
+        await stock_reservations.reserve(f"ord_bench_{index}", STORE_ID, [(PRODUCT_ID, SKU_ID, 1)])
+        return True
+    except HTTPException:
+        return False
+    finally:
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+
+    await seed(args.stock)
+    latencies = []
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(attempt(index, latencies) for index in range(args.orders)))
+    elapsed = time.perf_counter() - started
+
+    product = await db["products"].find_one({"_id": PRODUCT_ID})
+    remaining = product["skus"][0]["stock_count"]
+    latencies.sort()
+    print(f"{args.orders} concurrent orders for {args.stock} units: {outcomes.count(True)} reserved, "
+          f"{outcomes.count(False)} refused, {remaining} left")
+    print(f"{args.orders / elapsed:,.0f} reservations/sec, p50={statistics.median(latencies):.2f}ms "
+          f"p99={latencies[int(0.99 * (len(latencies) - 1))]:.2f}ms")
+    assert outcomes.count(True) == min(args.stock, args.orders) and remaining == args.stock - outcomes.count(True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
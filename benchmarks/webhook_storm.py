@@ -0,0 +1,106 @@
+"""
+Razorpay webhook storm benchmark: acknowledgement latency and exactly-once application.
+
+Seeds `--payments` pending payments, then posts signed payment.captured webhooks for
+them through the app, each delivered `--redeliveries` extra times the way Razorpay
+retries, `--concurrency` at a time. Reports acknowledgement latency per tenth of the
+storm (it should stay flat), then waits for the webhook worker to drain and checks every
+payment was captured with exactly one notification queued. Requires a reachable MongoDB;
+point MONGO_DB at a scratch database.
+
+Usage:
+    MONGO_DB=locality_bench python -m benchmarks.webhook_storm --payments 2000 --redeliveries 4
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.indexes import ensure_indexes
+from app.services.payment_webhooks import webhook_queue
+from main import app
+
+PREFIX = "bench_storm"
+
+
+async def seed(payments: int):
+    await db["payments"].delete_many({"_id": {"$regex": f"^pay_{PREFIX}"}})
+    await db["webhook_events"].delete_many({"_id": {"$regex": f"^evt_{PREFIX}"}})
+    now = datetime.utcnow()
+    await db["payments"].insert_many([
+        {"_id": f"pay_{PREFIX}_{index}", "order_id": f"ord_{PREFIX}_{index}", "payment_type": "subscription",
+         "amount": 100, "currency": "INR", "razorpay_order_id": f"order_{PREFIX}_{index}", "status": "created",
+         "created_at": now, "updated_at": now}
+        for index in range(payments)
+    ])
+
+
+def delivery(index: int):
+    body = json.dumps({
+        "event": "payment.captured",
+        "created_at": int(time.time()),
+        "payload": {"payment": {"entity": {"id": f"pay_rzp_{PREFIX}_{index}", "order_id": f"order_{PREFIX}_{index}"}}}
+    })
+    signature = hmac.new(settings.razorpay_api_secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+    headers = {"X-Razorpay-Signature": signature, "X-Razorpay-Event-Id": f"evt_{PREFIX}_{index}", "Content-Type": "application/json"}
+    return body, headers
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--redeliveries", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    await seed(args.payments)
+    deliveries = [delivery(index) for index in range(args.payments) for _ in range(1 + args.redeliveries)]
+    random.shuffle(deliveries)
+
+    latencies = [0.0] * len(deliveries)
+    limit = asyncio.Semaphore(args.concurrency)
+    webhook_queue.start()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        async def post(position: int, body: str, headers: dict):
+            async with limit:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/payments/webhook", content=body, headers=headers)
+                latencies[position] = (time.perf_counter() - started) * 1000
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(position, body, headers) for position, (body, headers) in enumerate(deliveries)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(deliveries)} deliveries in {elapsed:.1f}s ({len(deliveries) / elapsed:.0f}/s)")
+    tenth = max(len(latencies) // 10, 1)
+    for start in range(0, len(latencies), tenth):
+        window = sorted(latencies[start:start + tenth])
+        print(f"  deliveries {start:>7}+: ack p50={statistics.median(window):6.1f}ms p99={window[int(len(window) * 0.99) - 1]:6.1f}ms")
+
+    query = {"_id": {"$regex": f"^pay_{PREFIX}"}}
+    drain_started = time.perf_counter()
+    while await db["payments"].count_documents({**query, "status": {"$ne": "captured"}}):
+        await asyncio.sleep(0.2)
+    print(f"worker applied all payments {time.perf_counter() - drain_started:.1f}s after the storm ended")
+    await webhook_queue.stop()
+
+    pipeline = [{"$match": query}, {"$project": {"notifications": {"$size": {"$ifNull": ["$outbox", []]}}}},
+                {"$group": {"_id": "$notifications", "payments": {"$sum": 1}}}]
+    counts = {row["_id"]: row["payments"] async for row in db["payments"].aggregate(pipeline)}
+    stored = await db["webhook_events"].count_documents({"_id": {"$regex": f"^evt_{PREFIX}"}})
+    print(f"stored events: {stored} (expected {args.payments}); payments by notifications queued: {counts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""
+WhatsApp send throughput against a local fake Graph API, before and after pooling.
+
+Starts a fake Graph API messages endpoint over TLS with a throwaway self-signed
+certificate and a fixed added latency, then sends `--messages` template messages
+`--concurrency` at a time twice: once opening a client per message the way
+WhatsAppService used to (a TCP and TLS handshake every send), and once through
+WhatsAppService's shared client. Prints sends/sec for both.
+
+uvicorn only speaks HTTP/1.1, so the pooled run negotiates HTTP/1.1 with keep-alive here;
+against the real Graph API the same client multiplexes sends over HTTP/2.
+
+Usage:
+    python -m benchmarks.whatsapp_sends --messages 2000 --concurrency 20
+    python -m benchmarks.whatsapp_sends --serve --port 8791 --latency-ms 20
+"""
+import argparse
+import asyncio
+import ipaddress
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from fastapi import FastAPI
+
+from app.services.whatsapp_service import WhatsAppService
+
+HOST = "127.0.0.1"
+PHONE_ID = "100000000000001"
+
+
+def build_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v15.0/{phone_id}/messages")
+    async def send_message(phone_id: str, message: dict):
+        await asyncio.sleep(latency)
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": message["to"], "wa_id": message["to"]}],
+            "messages": [{"id": f"wamid.fake.{phone_id}.{time.monotonic_ns()}"}]
+        }
+
+    return app
+
+
+def write_certificate(directory: str) -> tuple:
+    """
+    A self-signed certificate for 127.0.0.1; returns the certificate and key paths.
+    """
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, HOST)])
+    now = datetime.utcnow()
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(HOST))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certificate_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(certificate_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return certificate_path, key_path
+
+
+@contextmanager
+def fake_graph_api(port: int, latency_ms: float):
+    """
+    Runs the fake over TLS in a subprocess for the duration of the block; yields its base
+    URL and the certificate to trust.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        certificate_path, key_path = write_certificate(directory)
+        server = subprocess.Popen([sys.executable, "-m", "benchmarks.whatsapp_sends", "--serve",
+                                   "--port", str(port), "--latency-ms", str(latency_ms),
+                                   "--certificate", certificate_path, "--key", key_path])
+        base_url = f"https://{HOST}:{port}"
+        try:
+            for _ in range(100):
+                try:
+                    httpx.get(f"{base_url}/docs", verify=certificate_path)
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("Fake Graph API did not start")
+            yield base_url, certificate_path
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def payload(index: int) -> dict:
+    return {
+        "messaging_product": "whatsapp",
+        "to": f"91900000{index % 10000:04d}",
+        "type": "template",
+        "template": {
+            "name": "order_update",
+            "language": {"code": "en"},
+            "components": [{"type": "body", "parameters": [{"type": "text", "text": f"ORD{index}"}]}]
+        }
+    }
+
+
+async def run(send, messages: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with limit:
+            await send(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(messages)))
+    return messages / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--serve", action="store_true", help="Only run the fake Graph API")
+    parser.add_argument("--certificate")
+    parser.add_argument("--key")
+    args = parser.parse_args()
+
+    if args.serve:
+        config = uvicorn.Config(
+            build_app(args.latency_ms / 1000), host=HOST, port=args.port, log_level="warning", backlog=4096,
+            ssl_certfile=args.certificate, ssl_keyfile=args.key
+        )
+        await uvicorn.Server(config).serve()
+        return
+
+    logging.getLogger("whatsapp_service").setLevel(logging.WARNING)
+    with fake_graph_api(args.port, args.latency_ms) as (base_url, certificate_path):
+        # httpx trusts SSL_CERT_FILE, so the service's own client accepts the fake's certificate
+        os.environ["SSL_CERT_FILE"] = certificate_path
+        headers = {"Authorization": "Bearer bench", "Content-Type": "application/json"}
+
+        async def per_message(index: int):
+            async with httpx.AsyncClient() as client:
+                response = await client.post(f"{base_url}/v15.0/{PHONE_ID}/messages", headers=headers, json=payload(index))
+                response.raise_for_status()
+
+        service = WhatsAppService(
+            user_number_id=PHONE_ID, store_number_id=PHONE_ID, token="bench",
+            base_url=base_url, max_connections=args.concurrency
+        )
+        service.start()
+
+        async def pooled(index: int):
+            response = await service.send_message(f"91900000{index % 10000:04d}", "order_update", [f"ORD{index}"])
+            assert "error" not in response, response
+
+        # Warm both paths so neither pays for first-use imports
+        await run(per_message, args.concurrency, args.concurrency)
+        await run(pooled, args.concurrency, args.concurrency)
+
+        before = await run(per_message, args.messages, args.concurrency)
+        after = await run(pooled, args.messages, args.concurrency)
+        await service.close()
+
+    print(f"{args.messages} sends, {args.concurrency} concurrent, {args.latency_ms:.0f}ms server latency")
+    print(f"  client per message: {before:7.0f} sends/s")
+    print(f"  shared client:      {after:7.0f} sends/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
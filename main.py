@@ -1,7 +1,28 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from prometheus_client import make_asgi_app
 from app.api.v1 import users, stores, products, orders, payments, search, whatsapp, inventory
-from app.core.database import mongo_client, redis_client, create_indexes
+from app.core.database import mongo_client, redis_client
+from app.core.config import settings
+from app.core.indexes import ensure_indexes, verify_query_plans
 from app.utils.datetime import get_ist_time
+from app.utils.metrics import RoundTripCount, current_round_trips, mongo_round_trips
+from app.utils.security import hashing_executor
+from app.services.search_service import (
+    PRODUCT_FIELD_WEIGHTS, STORE_FIELD_WEIGHTS, backfill_search_terms, migrate_search_name_terms
+)
+from app.services.store_service import migrate_store_address_locations
+from app.services.fuzzy_search import fuzzy_index_registry
+from app.services.nearby_service import nearby_store_cache
+from app.services.spatial_index import store_spatial_index
+from app.services.reservation_service import stock_reservations
+from app.services.order_stream import order_stream_hub
+from app.services.outbox import outbox_dispatcher, prune_finished_events
+from app.core.razorpay_client import payment_gateway
+from app.services.payment_webhooks import webhook_queue
+from app.services.payment_status import payment_status_waiters
+from app.services.payment_service import backfill_payment_owners
+from app.services.payment_reconciliation import payment_reconciler
+from app.services.whatsapp_service import whatsapp_service
 
 app = FastAPI()
 
@@ -15,18 +36,91 @@ app.include_router(search.router, prefix="/api/v1/search")
 app.include_router(whatsapp.router, prefix="/api/v1/whatsapp")
 app.include_router(inventory.router, prefix="/api/v1/inventory")
 
+# Prometheus scrape endpoint
+app.mount("/metrics", make_asgi_app())
+
+@app.middleware("http")
+async def count_mongo_round_trips(request: Request, call_next):
+    count = RoundTripCount()
+    token = current_round_trips.set(count)
+    try:
+        response = await call_next(request)
+    finally:
+        current_round_trips.reset(token)
+    route = request.scope.get("route")
+    if route is not None:
+        mongo_round_trips.labels(method=request.method, route=route.path).observe(count.value)
+        if settings.expose_mongo_round_trips:
+            response.headers["X-Mongo-Round-Trips"] = str(count.value)
+    return response
+
 @app.on_event("startup")
 async def startup_db_client():
     print("Connecting to MongoDB and Redis...")
 
+    # One pooled Graph API client per worker
+    whatsapp_service.start()
+
     # Create indexes for MongoDB collections
-    await create_indexes()
+    await ensure_indexes()
+    if settings.verify_query_plans:
+        collscans = await verify_query_plans()
+        if collscans:
+            raise RuntimeError(f"Hot queries scan whole collections: {'; '.join(collscans)}")
+
+    # Index documents written before search terms existed
+    await backfill_search_terms("products", PRODUCT_FIELD_WEIGHTS)
+    await backfill_search_terms("stores", STORE_FIELD_WEIGHTS)
+    await migrate_search_name_terms({"products": PRODUCT_FIELD_WEIGHTS, "stores": STORE_FIELD_WEIGHTS})
+
+    # Payment status lookups filter on the paying user
+    await backfill_payment_owners()
+
+    # Notifications are removed once finished; drop the ones kept before that
+    await prune_finished_events()
+
+    # Store addresses must carry GeoJSON points, and stores their verified ones, for $geoNear
+    if await migrate_store_address_locations():
+        await nearby_store_cache.invalidate()
+
+    # Serve nearby lookups from memory once the spatial index has loaded
+    store_spatial_index.start()
+
+    # Return stock held by orders that were never paid
+    stock_reservations.start()
+
+    # Relay order changes from every worker to this worker's order streams
+    order_stream_hub.start()
+
+    # Send queued order and payment notifications off the request path
+    if settings.outbox_dispatch_enabled:
+        outbox_dispatcher.start()
+
+    # Apply stored Razorpay webhooks
+    webhook_queue.start()
+
+    # Wake payment status long-polls when another worker settles the payment
+    payment_status_waiters.start()
+
+    # Repair payments whose webhook never arrived
+    payment_reconciler.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     print("Disconnecting MongoDB and Redis...")
+    await store_spatial_index.stop()
+    await stock_reservations.stop()
+    await order_stream_hub.stop()
+    await outbox_dispatcher.stop()
+    await webhook_queue.stop()
+    await payment_status_waiters.stop()
+    await payment_reconciler.stop()
+    await payment_gateway.close()
+    await whatsapp_service.close()
     mongo_client.close()
     await redis_client.close()
+    hashing_executor.shutdown()
+    fuzzy_index_registry.shutdown()
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.catalog_import import iter_csv_products, iter_lines, iter_ndjson_products
+
+CSV_EXPORT = (
+    "external_code,name,description,category,sub_category,brand,sku_name,price,mrp,unit,quantity,in_stock,stock_count\r\n"
+    "A1,Atta,\"Whole wheat,\nstone ground\",Staples,,Aashirvaad,1kg,50.00,55.00,kg,1,yes,10\r\n"
+    "A1,Atta,,Staples,,Aashirvaad,5kg,240.00,250.00,kg,5,yes,3\r\n"
+    "A2,Rice,,Staples,,,1kg,60.00,65.00,kg,1,no,0\r\n"
+).encode()
+
+async def byte_chunks(data, size=5):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def collect(parser, data):
+    return [row async for row in parser(iter_lines(byte_chunks(data)))]
+
+def test_csv_rows_group_into_products_across_chunk_boundaries():
+    products = asyncio.run(collect(iter_csv_products, CSV_EXPORT))
+    assert [(row, product["external_code"], len(product["skus"])) for row, product, _ in products] == [(2, "A1", 2), (5, "A2", 1)]
+    assert products[0][1]["description"] == "Whole wheat,\nstone ground"
+    assert products[1][1]["brand"] is None
+
+def test_csv_header_must_name_required_columns():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(collect(iter_csv_products, b"external_code,name\nA1,Atta\n"))
+    assert error.value.status_code == 400
+
+def test_ndjson_reports_bad_lines_without_stopping():
+    rows = asyncio.run(collect(iter_ndjson_products, b'{"external_code": "A1"}\nnot json\n\n[1]\n{"external_code": "A2"}'))
+    assert [(row, error is None) for row, _, error in rows] == [(1, True), (2, False), (4, False), (5, True)]
@@ -0,0 +1,26 @@
+from app.models.product import ProductUpsert
+from app.services.catalog_service import product_fields
+
+def upsert(**fields):
+    return ProductUpsert.model_validate({
+        "name": "Atta", "description": None, "category": "Staples", "sub_category": None, "brand": None,
+        "skus": [
+            {"name": "1kg", "price": "50.00", "mrp": "55.00", "unit": "kg", "quantity": 1, "in_stock": True, "stock_count": 10},
+            {"name": "5kg", "price": "240.00", "mrp": "250.00", "unit": "kg", "quantity": 5, "in_stock": True, "stock_count": 3}
+        ],
+        **fields
+    })
+
+def test_skus_without_ids_keep_existing_ids():
+    existing = [{"_id": "sku_onekg", "name": "1kg", "unit": "kg", "held_by": ["res_abc"]}]
+    fields = product_fields(upsert(external_code="A1"), existing)
+    assert fields["skus"][0]["_id"] == "sku_onekg"
+    assert fields["skus"][0]["held_by"] == ["res_abc"]
+    assert fields["skus"][1]["_id"].startswith("sku_") and fields["skus"][1]["_id"] != "sku_onekg"
+
+    again = product_fields(upsert(external_code="A1"), existing)
+    assert again["skus"][0]["_id"] == "sku_onekg"
+
+def test_update_by_id_leaves_external_code_alone():
+    assert "external_code" not in product_fields(upsert(_id="prd_abc"), [])
+    assert product_fields(upsert(_id="prd_abc", external_code=None), [])["external_code"] is None
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.services import delivery_zone_service
+from app.services.delivery_service import DeliveryQuoter
+from app.services.delivery_zone_service import MAX_SERVING_STORES, stores_delivering_to
+from app.services.nearby_service import closest_per_owner, quoted_cards
+
+SLABS = [(5000, 40.0, 45), (2000, 20.0, 30), (10000, 60.0, 60)]
+
+def test_distance_at_a_slab_limit_is_priced_by_that_slab():
+    quoter = DeliveryQuoter(SLABS)
+    fees, etas, deliverable = quoter.quote(np.array([0.0, 2000.0, 2000.5, 5000.0, 10000.0]))
+    assert fees.tolist() == [20.0, 20.0, 40.0, 40.0, 60.0]
+    assert etas.tolist() == [30, 30, 45, 45, 60]
+    assert deliverable.all()
+
+def test_beyond_the_last_slab_is_not_deliverable():
+    quoter = DeliveryQuoter(SLABS)
+    _, _, deliverable = quoter.quote(np.array([10000.1, 50000.0]))
+    assert not deliverable.any()
+    assert quoter.quote_one(10001) is None
+    assert quoter.quote_one(1500) == (Decimal("20.00"), 30)
+    assert quoter.max_distance == 10000
+
+def test_each_owner_keeps_only_its_closest_address():
+    owners = np.array([0, 0, 1, 2, 2, 3])
+    distances = np.array([900.0, 300.0, 500.0, 7000.0, 100.0, 6000.0])
+    assert closest_per_owner(owners, distances, 5000, 10).tolist() == [4, 1, 2]
+    assert closest_per_owner(owners, distances, 5000, 2).tolist() == [4, 1]
+    assert closest_per_owner(owners, distances, 50, 10).tolist() == []
+
+def test_quoted_cards_carry_distance_location_and_quote():
+    cards = quoted_cards(
+        [{"_id": "str_near"}, {"_id": "str_far"}],
+        np.array([28.61, 28.70]), np.array([77.20, 77.30]), np.array([1500.0, 50000.0])
+    )
+    assert cards[0]["distance"] == 1500.0
+    assert cards[0]["location"]["coordinates"] == [77.20, 28.61]
+    assert cards[0]["delivery_fee"] is not None and cards[0]["eta_minutes"] is not None
+    assert cards[1]["delivery_fee"] is None and cards[1]["eta_minutes"] is None
+
+class ZoneStores:
+    """
+    Stands in for `db["stores"]` with `serving` stores in zone, listed farthest first.
+    """
+    def __init__(self, serving):
+        self.serving = serving
+        self.pipelines = []
+
+    def find(self, query, projection):
+        self.query = query
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        self.count = pipeline[1]["$limit"]
+        self.serving = self.serving[::-1]
+        return self
+
+    async def to_list(self, length):
+        return [{"_id": f"str_{index}"} for index in self.serving[:self.count]]
+
+@pytest.mark.asyncio
+async def test_serving_stores_past_the_cap_are_the_nearest(monkeypatch):
+    stores = ZoneStores(list(range(MAX_SERVING_STORES + 50, 0, -1)))
+    monkeypatch.setattr(delivery_zone_service, "db", {"stores": stores})
+
+    store_ids = await stores_delivering_to(28.6139, 77.2090)
+    assert len(store_ids) == MAX_SERVING_STORES
+    assert store_ids[0] == "str_1"
+    geo_near = stores.pipelines[0][0]["$geoNear"]
+    assert geo_near["key"] == "verified_locations" and geo_near["query"] == stores.query
+
+@pytest.mark.asyncio
+async def test_serving_stores_under_the_cap_skip_ranking(monkeypatch):
+    stores = ZoneStores(list(range(3)))
+    monkeypatch.setattr(delivery_zone_service, "db", {"stores": stores})
+
+    assert await stores_delivering_to(28.6139, 77.2090) == ["str_0", "str_1", "str_2"]
+    assert stores.pipelines == []
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from app.services import fuzzy_search
+from app.services.fuzzy_search import FuzzyCatalogIndex, FuzzyIndexRegistry, build_catalog_index
+
+def build_index():
+    index = FuzzyCatalogIndex()
+    index.upsert({"_id": "prd_onion", "name": "Onion", "category": "Vegetables", "skus": [{"name": "1 kg"}]})
+    index.upsert({"_id": "prd_tomato", "name": "Tomato", "category": "Vegetables"})
+    index.upsert({"_id": "prd_chilli", "name": "Red Chilli Powder", "brand": "MDH", "category": "Spices"})
+    return index
+
+def test_fuzzy_search_matches_hinglish_variants():
+    index = build_index()
+    for query in ["onion", "pyaaz", "piyaz", "piyaaj", "kanda"]:
+        assert index.search(query, 5)[0][0] == "prd_onion"
+    assert index.search("tamatar", 5)[0][0] == "prd_tomato"
+    assert index.search("chili powdr", 5)[0][0] == "prd_chilli"
+    assert index.search("xyzzy", 5) == []
+
+def test_fuzzy_index_updates_incrementally():
+    index = build_index()
+    index.upsert({"_id": "prd_onion", "name": "Potato", "category": "Vegetables"})
+    assert [product_id for product_id, _ in index.search("aloo", 5)] == ["prd_onion"]
+    assert index.search("pyaaz", 5) == []
+
+    index.remove("prd_onion")
+    assert index.search("aloo", 5) == []
+    assert len(index) == 2
+
+@pytest.mark.asyncio
+async def test_cold_build_runs_off_the_event_loop(monkeypatch):
+    loop_thread = threading.get_ident()
+    build_threads = []
+
+    def build(products, version):
+        build_threads.append(threading.get_ident())
+        return build_catalog_index(products, version)
+
+    class Products:
+        def find(self, query, projection):
+            return self
+
+        async def to_list(self, length):
+            return [{"_id": "prd_onion", "name": "Onion"}]
+
+    async def current_version(store_id):
+        return 3
+
+    registry = FuzzyIndexRegistry(max_stores=2)
+    monkeypatch.setattr(fuzzy_search, "db", {"products": Products()})
+    monkeypatch.setattr(fuzzy_search, "build_catalog_index", build)
+    monkeypatch.setattr(registry, "_current_version", current_version)
+    try:
+        index = await registry.get("str_abc")
+    finally:
+        registry.shutdown()
+    assert index.version == 3
+    assert index.search("pyaaz", 5)[0][0] == "prd_onion"
+    assert build_threads and build_threads[0] != loop_thread
@@ -0,0 +1,22 @@
+import pytest
+from fastapi import HTTPException, Response
+
+from app.models.order import RateOrder
+from app.services.idempotency import IdempotencyKeys
+
+@pytest.mark.asyncio
+async def test_request_without_key_just_runs():
+    keys = IdempotencyKeys(ttl=60, lock_ttl=10, wait_timeout=1)
+    rating = RateOrder(rating=5, review="Quick")
+
+    async def work():
+        return rating
+
+    assert await keys.run("orders:usr_abc", None, rating, Response(), work) is rating
+
+def test_replayed_client_error_is_raised_again():
+    response = Response()
+    with pytest.raises(HTTPException) as error:
+        IdempotencyKeys._replay({"status_code": 409, "body": "Insufficient stock for SKU sku_abc"}, response)
+    assert error.value.status_code == 409
+    assert response.headers["Idempotent-Replayed"] == "true"
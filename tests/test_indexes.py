@@ -0,0 +1,42 @@
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.core import indexes
+from app.core.indexes import INDEXES, duplicate_key_field, ensure_indexes, plan_stages, verify_query_plans
+
+def test_duplicate_key_field_names_the_unique_field():
+    error = DuplicateKeyError("E11000 duplicate key", 11000, {"keyPattern": {"phone": 1}, "keyValue": {"phone": "9000000000"}})
+    assert duplicate_key_field(error) == "phone"
+    assert duplicate_key_field(DuplicateKeyError("E11000 duplicate key", 11000)) == "value"
+
+class IndexRecorder:
+    """
+    Stands in for a collection whose existing emails are not unique.
+    """
+    def __init__(self, created):
+        self.created = created
+
+    async def create_indexes(self, models):
+        for model in models:
+            if model.document["name"] == "email_1":
+                raise OperationFailure("E11000 duplicate key error", 11000)
+            self.created.append(model.document["name"])
+
+@pytest.mark.asyncio
+async def test_index_blocked_by_duplicates_leaves_the_others_built(monkeypatch):
+    created = []
+    monkeypatch.setattr(indexes, "db", {collection: IndexRecorder(created) for collection in INDEXES})
+    await ensure_indexes()
+    assert "email_1" not in created
+    assert "phone_1" in created and "verified_locations_2dsphere" in created
+
+def test_plan_stages_walks_classic_and_sbe_plans():
+    classic = {"stage": "FETCH", "inputStage": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    sbe = {"queryPlan": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}}
+    assert plan_stages(classic) == ["FETCH", "SORT", "COLLSCAN"]
+    assert plan_stages(sbe) == ["OR", "IXSCAN", "COLLSCAN"]
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes():
+    await ensure_indexes()
+    assert await verify_query_plans() == []
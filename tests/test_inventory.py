@@ -0,0 +1,38 @@
+import pytest
+from httpx import AsyncClient
+from main import app
+
+@pytest.mark.asyncio
+async def test_patch_inventory_items():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/stores/login", json={
+            "email": "store@example.com",
+            "password": "storepass123"
+        })
+        token = login_response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        create_response = await client.post("/api/v1/inventory/", json={
+            "store_id": "str_example_id",
+            "items": [
+                {"sku_id": "sku_a", "product_id": "prd_a", "quantity": 10, "price": "5.00"},
+                {"sku_id": "sku_b", "product_id": "prd_b", "quantity": 4, "price": "20.00"}
+            ],
+            "total": "130.00"
+        }, headers=headers)
+        inventory_id = create_response.json()["_id"]
+
+        response = await client.patch(f"/api/v1/inventory/{inventory_id}", json={
+            "items": [{"sku_id": "sku_a", "price": "6.00"}, {"sku_id": "sku_b", "quantity_delta": -1}]
+        }, headers=headers)
+        assert response.status_code == 200
+        items = {item["sku_id"]: item for item in response.json()["items"]}
+        assert (items["sku_a"]["quantity"], items["sku_a"]["price"]) == (10, "6.00")
+        assert (items["sku_b"]["quantity"], items["sku_b"]["price"]) == (3, "20.00")
+        assert response.json()["total"] == "120.00"
+
+        # Decrementing below zero matches nothing and leaves the inventory alone
+        response = await client.patch(f"/api/v1/inventory/{inventory_id}", json={
+            "items": [{"sku_id": "sku_b", "quantity_delta": -5}]
+        }, headers=headers)
+        assert response.status_code == 404
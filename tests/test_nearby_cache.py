@@ -0,0 +1,75 @@
+import pytest
+
+from app.services import nearby_service
+from app.services.nearby_service import CELL_CANDIDATE_LIMIT, CELL_PRECISION, NearbyStoreCache
+from app.utils.geo import geohash_bounds, geojson_point, haversine_m
+
+class DictRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+def make_card(store_id, latitude, longitude):
+    return {"_id": store_id, "name": store_id, "phone": "1234567890", "locations": [geojson_point(latitude, longitude)]}
+
+def test_radius_rounds_up_to_a_bucket():
+    assert NearbyStoreCache._radius_bucket(1000) == 1000
+    assert NearbyStoreCache._radius_bucket(1001) == 2000
+    assert NearbyStoreCache._radius_bucket(20001) is None
+
+def test_cell_radius_covers_every_point_in_the_cell():
+    cell, min_lat, max_lat, min_lon, max_lon = geohash_bounds(28.6139, 77.2090, CELL_PRECISION)
+    center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    half_diagonal = haversine_m(min_lat, min_lon, max_lat, max_lon) / 2
+    for corner_lat in (min_lat, max_lat):
+        for corner_lon in (min_lon, max_lon):
+            assert haversine_m(center_lat, center_lon, corner_lat, corner_lon) <= half_diagonal + 1
+
+@pytest.mark.asyncio
+async def test_dense_cell_is_not_cached_and_queries_mongo_directly(monkeypatch):
+    queries = []
+
+    async def query_nearby_stores(latitude, longitude, max_distance, limit, product_filter=None):
+        queries.append((latitude, longitude, max_distance, limit))
+        return [make_card(f"str_{index}", 28.6139, 77.2090) for index in range(limit)]
+
+    async def generation():
+        return 0
+
+    monkeypatch.setattr(nearby_service, "redis_client", DictRedis())
+    monkeypatch.setattr(nearby_service, "query_nearby_stores", query_nearby_stores)
+    cache = NearbyStoreCache(ttl=60)
+    monkeypatch.setattr(cache, "_generation", generation)
+
+    for _ in range(2):
+        stores = await cache.get_nearby(28.6139, 77.2090, 5000, 10)
+        assert len(stores) == 10
+    # One cell query that came back truncated, then direct queries with the caller's own radius
+    assert queries[0][3] == CELL_CANDIDATE_LIMIT + 1
+    assert [query[2:] for query in queries[1:]] == [(5000, 10), (5000, 10)]
+
+@pytest.mark.asyncio
+async def test_sparse_cell_is_served_from_cache(monkeypatch):
+    queries = []
+
+    async def query_nearby_stores(latitude, longitude, max_distance, limit, product_filter=None):
+        queries.append(limit)
+        return [make_card("str_near", 28.6140, 77.2091), make_card("str_far", 28.6600, 77.2600)]
+
+    async def generation():
+        return 0
+
+    monkeypatch.setattr(nearby_service, "redis_client", DictRedis())
+    monkeypatch.setattr(nearby_service, "query_nearby_stores", query_nearby_stores)
+    cache = NearbyStoreCache(ttl=60)
+    monkeypatch.setattr(cache, "_generation", generation)
+
+    for _ in range(2):
+        stores = await cache.get_nearby(28.6139, 77.2090, 2000, 10)
+        assert [store["_id"] for store in stores] == ["str_near"]
+    assert queries == [CELL_CANDIDATE_LIMIT + 1]
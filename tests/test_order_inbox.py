@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import fakeredis
+import pytest
+from pydantic import ValidationError
+
+from app.models.order import OrderResponse
+from app.services import order_inbox as order_inbox_module
+from app.services.order_inbox import epoch_ms, order_inbox
+
+def make_order(status, order_id="ord_abc"):
+    return {
+        "_id": order_id, "user_id": "usr_abc", "store_id": "str_abc", "status": status, "payment_status": "pending",
+        "items": [{"sku_id": "sku_abc", "product_id": "prd_abc", "quantity": 2, "price": Decimal("10.00")}],
+        "subtotal": Decimal("20.00"), "platform_fee": Decimal("1.00"), "delivery_fee": Decimal("0.00"), "total": Decimal("21.00"),
+        "created_at": datetime(2024, 5, 1, 6, 0), "updated_at": datetime(2024, 5, 1, 6, 0)
+    }
+
+def test_naive_mongo_time_and_aware_ist_time_score_the_same():
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert epoch_ms(datetime(2024, 5, 1, 6, 0)) == epoch_ms(datetime(2024, 5, 1, 11, 30, tzinfo=ist))
+
+def test_live_order_is_filed_under_its_status_with_its_version():
+    order = make_order("accepted")
+    order["updated_at"] = datetime(2024, 5, 1, 6, 5)
+    keys, args = order_inbox._file_args(order)
+    assert keys == [
+        "inbox:str_abc:orders", "inbox:str_abc:version:ord_abc",
+        "inbox:str_abc:pending", "inbox:str_abc:accepted", "inbox:str_abc:dispatched"
+    ]
+    order_id, version, status_key, score, card, _ = args
+    assert (order_id, status_key) == ("ord_abc", "inbox:str_abc:accepted")
+    assert version == epoch_ms(order["updated_at"]) > score == epoch_ms(order["created_at"])
+    assert OrderResponse.model_validate_json(card) == OrderResponse(**order)
+
+def test_finished_order_leaves_the_inbox():
+    _, args = order_inbox._file_args(make_order("delivered"))
+    assert args[2] == "" and args[4] == ""
+
+def test_invalid_legacy_order_is_skipped_not_raised():
+    order = make_order("pending")
+    del order["items"]
+    assert order_inbox._validated(order) is None
+    with pytest.raises(ValidationError):
+        order_inbox._file_args(order)
+
+class SnapshotOrders:
+    """
+    Stands in for `db["orders"]`: hands back a fixed snapshot, running `during_read` while
+    the read is in flight.
+    """
+    def __init__(self, snapshot, during_read):
+        self.snapshot = snapshot
+        self.during_read = during_read
+
+    def find(self, query):
+        return self
+
+    async def to_list(self, length):
+        await self.during_read()
+        return self.snapshot
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_transitions_recorded_while_it_reads_mongo(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(order_inbox_module, "redis_client", redis)
+
+    # Filed long ago and since lost from Mongo's live orders
+    await order_inbox.record(make_order("pending", "ord_stale"))
+    snapshot = [make_order("pending", "ord_moved")]
+    moved = {**make_order("accepted", "ord_moved"), "updated_at": datetime.utcnow() + timedelta(seconds=1)}
+    created = {**make_order("pending", "ord_created"), "updated_at": datetime.utcnow() + timedelta(seconds=1)}
+
+    async def during_read():
+        await order_inbox.record(moved)
+        await order_inbox.record(created)
+
+    monkeypatch.setattr(order_inbox_module, "db", {"orders": SnapshotOrders(snapshot, during_read)})
+    await order_inbox.rebuild("str_abc")
+
+    assert await redis.zrange("inbox:str_abc:pending", 0, -1) == [b"ord_created"]
+    assert await redis.zrange("inbox:str_abc:accepted", 0, -1) == [b"ord_moved"]
+    assert sorted(await redis.hkeys("inbox:str_abc:orders")) == [b"ord_created", b"ord_moved"]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from app.services.order_stream import OrderStreamHub
+
+def order_message(order_id, store_id="str_abc", user_id="usr_abc"):
+    return json.dumps({"_id": order_id, "store_id": store_id, "user_id": user_id, "status": "accepted"})
+
+@pytest.mark.asyncio
+async def test_stream_receives_its_stores_orders_only():
+    hub = OrderStreamHub(heartbeat_interval=5, queue_size=8)
+    events = hub.stream("store:str_abc")
+    assert (await events.__anext__()).startswith("retry:")
+    hub.deliver(order_message("ord_other", store_id="str_other"))
+    hub.deliver(order_message("ord_abc"))
+    event = await events.__anext__()
+    assert event.startswith("event: order\nid: ord_abc\ndata: ")
+    await events.aclose()
+    assert hub.open_streams == 0
+
+@pytest.mark.asyncio
+async def test_idle_stream_gets_heartbeats():
+    hub = OrderStreamHub(heartbeat_interval=0.01, queue_size=8)
+    events = hub.stream("user:usr_abc")
+    await events.__anext__()
+    assert await events.__anext__() == ": heartbeat\n\n"
+    await events.aclose()
+
+@pytest.mark.asyncio
+async def test_slow_stream_is_told_to_resync():
+    hub = OrderStreamHub(heartbeat_interval=5, queue_size=2)
+    events = hub.stream("store:str_abc")
+    await events.__anext__()
+    for index in range(3):
+        hub.deliver(order_message(f"ord_{index}"))
+    assert hub.open_streams == 0
+    assert (await events.__anext__()).startswith("event: resync")
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
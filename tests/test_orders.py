@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from httpx import AsyncClient
 from main import app
@@ -24,3 +25,31 @@ async def test_create_order():
         }, headers={"Authorization": f"Bearer {token}"})
         assert response.status_code == 200
         assert response.json()["total"] == "16.00"
+
+@pytest.mark.asyncio
+async def test_retried_order_with_idempotency_key_is_created_once():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/users/login", json={
+            "email": "user@example.com",
+            "password": "password123"
+        })
+        token = login_response.json()["access_token"]
+
+        order = {
+            "store_id": "str_example_id",
+            "items": [{"sku_id": "sku_example_id", "product_id": "prd_example_id", "quantity": 1, "price": "10.00"}],
+            "subtotal": "10.00",
+            "platform_fee": "1.00",
+            "total": "16.00",
+            "delivery_address": {"address": "123 Street", "latitude": 0.0, "longitude": 0.0}
+        }
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "test-retry-once"}
+        first, retry = await asyncio.gather(
+            client.post("/api/v1/orders/", json=order, headers=headers),
+            client.post("/api/v1/orders/", json=order, headers=headers)
+        )
+        assert first.status_code == retry.status_code == 200
+        assert first.json()["_id"] == retry.json()["_id"]
+
+        reused = await client.post("/api/v1/orders/", json={**order, "subtotal": "20.00"}, headers=headers)
+        assert reused.status_code == 422
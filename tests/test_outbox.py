@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import outbox
+from app.services.order_service import ORDER_TRANSITIONS
+from app.services.outbox import MAX_RETRY_DELAY, NOTIFICATIONS, STALE_AFTER, OutboxDispatcher, outbox_event, retry_delay
+
+def test_every_store_transition_has_a_notification():
+    assert all(f"order.{new_status}" in NOTIFICATIONS for new_status in ORDER_TRANSITIONS)
+
+def test_new_event_is_due_immediately():
+    event = outbox_event("order.created")
+    assert event["status"] == "pending"
+    assert event["attempts"] == 0
+    assert event["available_at"] == event["created_at"]
+
+def test_retries_back_off_up_to_a_cap():
+    delays = [retry_delay(attempts) for attempts in range(1, 12)]
+    assert delays[0] == timedelta(seconds=10)
+    assert delays == sorted(delays)
+    assert delays[-1] == MAX_RETRY_DELAY
+
+class RecordingCollection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+@pytest.mark.asyncio
+async def test_stale_event_is_removed_unsent(monkeypatch):
+    orders = RecordingCollection()
+    monkeypatch.setattr(outbox, "db", {"orders": orders})
+    event = {**outbox_event("order.accepted"), "created_at": datetime.utcnow() - STALE_AFTER - timedelta(minutes=1)}
+
+    dispatcher = OutboxDispatcher(batch_size=10, poll_interval=1, lease=60, max_attempts=3)
+    assert await dispatcher._deliver("orders", {"_id": "ord_abc", "user_id": "usr_abc"}, event)
+    assert orders.updates == [({"_id": "ord_abc"}, {"$pull": {"outbox": {"_id": event["_id"]}}})]
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+def test_cursor_round_trips_position_to_the_millisecond():
+    cursor = encode_cursor({"created_at": datetime(2024, 5, 1, 12, 30, 1, 123000), "_id": "ord_abc"})
+    assert decode_cursor(cursor) == (datetime(2024, 5, 1, 12, 30, 1, 123000), "ord_abc")
+
+def test_malformed_cursor_is_a_bad_request():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
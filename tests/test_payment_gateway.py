@@ -0,0 +1,48 @@
+import httpx
+import pytest
+
+from app.core.razorpay_client import PaymentGatewayError, RazorpayGateway
+
+def make_gateway(responses):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    gateway = RazorpayGateway(
+        key_id="rzp_test", key_secret="secret", base_url="http://razorpay.test",
+        connect_timeout=1, read_timeout=1, max_connections=2, max_retries=2,
+        transport=httpx.MockTransport(handler)
+    )
+    gateway.backoff = lambda attempt: 0
+    return gateway, calls
+
+@pytest.mark.asyncio
+async def test_reads_are_retried_through_server_errors():
+    gateway, calls = make_gateway([httpx.Response(503), httpx.Response(200, json={"id": "order_abc", "status": "paid"})])
+    assert (await gateway.fetch_order("order_abc"))["status"] == "paid"
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_order_creation_is_not_retried_once_sent():
+    gateway, calls = make_gateway([httpx.Response(503, json={"error": {"description": "Try later"}})])
+    with pytest.raises(PaymentGatewayError) as error:
+        await gateway.create_order(1000, "INR", "pay_abc")
+    assert error.value.status_code == 503
+    assert len(calls) == 1
+
+    gateway, calls = make_gateway([httpx.ReadTimeout("slow")])
+    with pytest.raises(PaymentGatewayError):
+        await gateway.create_order(1000, "INR", "pay_abc")
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_order_creation_is_retried_when_never_sent():
+    gateway, calls = make_gateway([httpx.ConnectError("refused"), httpx.Response(200, json={"id": "order_abc"})])
+    assert (await gateway.create_order(1000, "INR", "pay_abc"))["id"] == "order_abc"
+    assert len(calls) == 2
+    assert calls[0].headers["Authorization"].startswith("Basic ")
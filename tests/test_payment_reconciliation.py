@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from app.core.razorpay_client import PaymentGatewayError
+from app.services.payment_reconciliation import gateway_outcome, reconciled_outcome
+
+def test_any_captured_attempt_wins():
+    payments = {"items": [{"id": "pay_1", "status": "failed"}, {"id": "pay_2", "status": "captured"}]}
+    assert gateway_outcome(payments) == ("captured", "pay_2")
+
+def test_only_failed_attempts_fail_the_payment():
+    assert gateway_outcome({"items": [{"id": "pay_1", "status": "failed"}]}) == ("failed", None)
+
+def test_no_attempts_or_pending_attempts_stay_unpaid():
+    assert gateway_outcome({"items": []}) == ("unpaid", None)
+    assert gateway_outcome({"items": [{"id": "pay_1", "status": "authorized"}]}) == ("unpaid", None)
+
+def test_unpaid_payments_past_the_cutoff_expire():
+    cutoff = datetime(2024, 1, 1, 12)
+    unpaid = {"items": []}
+    assert reconciled_outcome(unpaid, cutoff - timedelta(minutes=1), cutoff) == ("expired", None)
+    assert reconciled_outcome(unpaid, cutoff + timedelta(minutes=1), cutoff) == ("unpaid", None)
+    assert reconciled_outcome(PaymentGatewayError("timed out"), cutoff - timedelta(days=1), cutoff) == ("error", None)
+
+def test_declined_attempts_only_expire_past_the_cutoff():
+    cutoff = datetime(2024, 1, 1, 12)
+    declined = {"items": [{"id": "pay_1", "status": "failed"}]}
+    assert reconciled_outcome(declined, cutoff - timedelta(minutes=1), cutoff) == ("expired", None)
+    assert reconciled_outcome(declined, cutoff + timedelta(minutes=1), cutoff) == ("failed", None)
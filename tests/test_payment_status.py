@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+from app.services.payment_status import PaymentStatusWaiters
+
+@pytest.mark.asyncio
+async def test_change_wakes_only_that_payments_waiters():
+    waiters = PaymentStatusWaiters()
+    async with waiters.watching("pay_abc") as changed, waiters.watching("pay_other") as other:
+        waiters.deliver(json.dumps({"_id": "pay_abc", "status": "captured"}))
+        assert changed.is_set()
+        assert not other.is_set()
+    assert not waiters._waiters
+
+@pytest.mark.asyncio
+async def test_change_for_unwatched_payment_is_ignored():
+    waiters = PaymentStatusWaiters()
+    waiters.deliver(json.dumps({"_id": "pay_abc", "status": "failed"}))
+    assert not waiters._waiters
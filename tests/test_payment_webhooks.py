@@ -0,0 +1,18 @@
+from app.services.payment_webhooks import razorpay_order_id, razorpay_payment_id
+
+def test_payment_events_name_their_order_and_payment():
+    payload = {"event": "payment.captured", "payload": {"payment": {"entity": {"id": "pay_abc", "order_id": "order_abc"}}}}
+    assert razorpay_order_id(payload) == "order_abc"
+    assert razorpay_payment_id(payload) == "pay_abc"
+
+def test_order_paid_prefers_the_order_entity():
+    payload = {"event": "order.paid", "payload": {
+        "order": {"entity": {"id": "order_abc"}},
+        "payment": {"entity": {"id": "pay_abc", "order_id": "order_abc"}}
+    }}
+    assert razorpay_order_id(payload) == "order_abc"
+
+def test_events_about_other_entities_have_no_order():
+    payload = {"event": "refund.processed", "payload": {"refund": {"entity": {"id": "rfnd_abc"}}}}
+    assert razorpay_order_id(payload) is None
+    assert razorpay_payment_id(payload) is None
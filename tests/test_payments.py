@@ -0,0 +1,99 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.razorpay_client import RazorpayGateway, get_payment_gateway
+from app.models.payment import PaymentResponse
+from main import app
+
+def signed(body: str) -> str:
+    return hmac.new(settings.razorpay_api_secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+@pytest.mark.asyncio
+async def test_webhook_is_acknowledged_once_per_event():
+    body = json.dumps({
+        "event": "payment.captured",
+        "created_at": 1700000000,
+        "payload": {"payment": {"entity": {"id": "pay_test_webhook", "order_id": "order_test_webhook"}}}
+    })
+    headers = {"X-Razorpay-Signature": signed(body), "X-Razorpay-Event-Id": "evt_test_webhook", "Content-Type": "application/json"}
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        first = await client.post("/api/v1/payments/webhook", content=body, headers=headers)
+        redelivered = await client.post("/api/v1/payments/webhook", content=body, headers=headers)
+        assert first.status_code == redelivered.status_code == 200
+
+        tampered = await client.post("/api/v1/payments/webhook", content=body.replace("captured", "failed"), headers=headers)
+        assert tampered.status_code == 400
+
+@pytest.mark.asyncio
+async def test_retried_payment_order_with_idempotency_key_is_created_once():
+    created = []
+
+    def handler(request):
+        created.append(request)
+        return httpx.Response(200, json={"id": f"order_test_idem_{len(created)}", "entity": "order", "status": "created"})
+
+    app.dependency_overrides[get_payment_gateway] = lambda: RazorpayGateway(
+        key_id="rzp_test", key_secret="secret", base_url="http://razorpay.test",
+        connect_timeout=1, read_timeout=1, max_connections=2, max_retries=0,
+        transport=httpx.MockTransport(handler)
+    )
+    try:
+        async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+            login_response = await client.post("/api/v1/users/login", json={
+                "email": "user@example.com",
+                "password": "password123"
+            })
+            token = login_response.json()["access_token"]
+
+            payment = {"order_id": "ord_test_idem", "amount": "16.00", "payment_type": "order"}
+            headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "test-payment-once"}
+            first = await client.post("/api/v1/payments/create-order", json=payment, headers=headers)
+            retry = await client.post("/api/v1/payments/create-order", json=payment, headers=headers)
+            assert first.status_code == retry.status_code == 200
+            assert first.json()["_id"] == retry.json()["_id"]
+            assert retry.headers["Idempotent-Replayed"] == "true"
+            assert len(created) == 1
+    finally:
+        app.dependency_overrides.pop(get_payment_gateway, None)
+
+def test_new_payment_has_no_razorpay_payment_id_yet():
+    payment = PaymentResponse(**{
+        "_id": "pay_abc", "order_id": "ord_abc", "amount": "16.00", "currency": "INR",
+        "razorpay_order_id": "order_abc", "status": "created",
+        "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()
+    })
+    assert payment.razorpay_payment_id is None
+
+@pytest.mark.asyncio
+async def test_status_of_unsettled_payments():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/users/login", json={
+            "email": "user@example.com",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        user = (await client.get("/api/v1/users/me", headers=headers)).json()
+
+        now = datetime.utcnow()
+        for payment_id, payment_status in [("pay_test_created", "created"), ("pay_test_failed", "failed")]:
+            await db["payments"].replace_one({"_id": payment_id}, {
+                "_id": payment_id, "order_id": "ord_test_status", "payment_type": "order", "user_id": user["_id"],
+                "amount": 16, "currency": "INR", "razorpay_order_id": f"order_{payment_id}", "status": payment_status,
+                "created_at": now, "updated_at": now
+            }, upsert=True)
+
+        waited = await client.get("/api/v1/payments/status/pay_test_created", params={"wait": 0.2}, headers=headers)
+        assert waited.status_code == 200
+        assert waited.json()["status"] == "created"
+
+        failed = await client.get("/api/v1/payments/status/pay_test_failed", headers=headers)
+        assert failed.status_code == 200
+        assert failed.json()["razorpay_payment_id"] is None
@@ -0,0 +1,31 @@
+import fakeredis
+import pytest
+
+from app.services import principal_cache as principal_cache_module
+from app.services.principal_cache import PrincipalCache
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(principal_cache_module, "redis_client", fakeredis.FakeAsyncRedis())
+    return PrincipalCache(ttl=300, local_ttl=5, max_entries=10)
+
+@pytest.mark.asyncio
+async def test_miss_then_fill_is_served_from_cache(cache):
+    principal, generation = await cache.get("user", "usr_abc")
+    assert principal is None
+    await cache.set("user", "usr_abc", {"_id": "usr_abc", "name": "Asha"}, generation)
+
+    cache._local.clear()
+    principal, _ = await cache.get("user", "usr_abc")
+    assert principal == {"_id": "usr_abc", "name": "Asha"}
+
+@pytest.mark.asyncio
+async def test_fill_loaded_before_an_invalidate_is_dropped(cache):
+    _, generation = await cache.get("user", "usr_abc")
+    # The profile is written and invalidated while this reader is still loading the old copy
+    await cache.invalidate("user", "usr_abc")
+    await cache.set("user", "usr_abc", {"_id": "usr_abc", "name": "Old"}, generation)
+
+    assert not cache._local
+    principal, _ = await cache.get("user", "usr_abc")
+    assert principal is None
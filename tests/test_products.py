@@ -2,6 +2,8 @@ import pytest
 from httpx import AsyncClient
 from main import app
 
+from app.core.config import settings
+
 @pytest.mark.asyncio
 async def test_create_product():
     async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
@@ -31,3 +33,75 @@ async def test_create_product():
         }, headers={"Authorization": f"Bearer {token}"})
         assert response.status_code == 200
         assert response.json()["name"] == "Test Product"
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_products():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/stores/login", json={
+            "email": "store@example.com",
+            "password": "storepass123"
+        })
+        token = login_response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        product = {
+            "name": "Bulk Product",
+            "description": None,
+            "category": "Category A",
+            "sub_category": None,
+            "brand": None,
+            "skus": [
+                {
+                    "name": "Small",
+                    "price": "10.00",
+                    "mrp": "12.00",
+                    "unit": "kg",
+                    "quantity": 1,
+                    "in_stock": True,
+                    "stock_count": 100
+                }
+            ]
+        }
+
+        response = await client.put("/api/v1/products/bulk-update", json=[
+            {**product, "external_code": "BULK-1"},
+            {**product, "_id": "prd_missing"},
+            {**product}
+        ], headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["created"], body["updated"], body["failed"]) == (1, 0, 2)
+        assert [result["status"] for result in body["results"]] == ["created", "failed", "failed"]
+
+        # Same external code again updates the product created above
+        response = await client.put("/api/v1/products/bulk-update", json=[
+            {**product, "name": "Bulk Product Renamed", "external_code": "BULK-1"}
+        ], headers=headers)
+        result = response.json()["results"][0]
+        assert result["status"] == "updated"
+        assert result["product_id"] == body["results"][0]["product_id"]
+
+@pytest.mark.asyncio
+async def test_update_product_is_one_round_trip(monkeypatch):
+    monkeypatch.setattr(settings, "expose_mongo_round_trips", True)
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/stores/login", json={
+            "email": "store@example.com",
+            "password": "storepass123"
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        product = {
+            "name": "Round Trip Product",
+            "description": None,
+            "category": "Category A",
+            "sub_category": None,
+            "brand": None,
+            "skus": [{"_id": "", "name": "Small", "price": "10.00", "mrp": "12.00", "unit": "kg",
+                      "quantity": 1, "in_stock": True, "stock_count": 5}]
+        }
+        product_id = (await client.post("/api/v1/products/", json=product, headers=headers)).json()["_id"]
+
+        response = await client.put(f"/api/v1/products/{product_id}", json={**product, "name": "Renamed"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Renamed"
+        # The store principal is cached by now, so only the update itself reaches Mongo
+        assert response.headers["X-Mongo-Round-Trips"] == "1"
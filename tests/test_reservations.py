@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.database import db
+from app.services.reservation_service import stock_reservations
+
+async def seed_product(product_id, stock_count):
+    await db["products"].delete_many({"_id": product_id})
+    await db["products"].insert_one({
+        "_id": product_id,
+        "store_id": "str_reservations",
+        "name": "Last Unit",
+        "skus": [{"_id": f"sku_{product_id}", "name": "1kg", "stock_count": stock_count, "in_stock": True}]
+    })
+
+async def sku_stock(product_id):
+    product = await db["products"].find_one({"_id": product_id})
+    return product["skus"][0]["stock_count"], product["skus"][0]["in_stock"]
+
+@pytest.mark.asyncio
+async def test_parallel_orders_for_last_unit_yield_one_reservation():
+    await seed_product("prd_last_unit", 1)
+
+    async def attempt(index):
+        try:
+            await stock_reservations.reserve(f"ord_race_{index}", "str_reservations", [("prd_last_unit", "sku_prd_last_unit", 1)])
+            return True
+        except HTTPException as e:
+            assert e.status_code == 409
+            return False
+
+    outcomes = await asyncio.gather(*(attempt(index) for index in range(20)))
+    assert outcomes.count(True) == 1
+    assert await sku_stock("prd_last_unit") == (0, False)
+
+    winner = f"ord_race_{outcomes.index(True)}"
+    assert await stock_reservations.release(winner, reason="cancelled")
+    assert not await stock_reservations.release(winner, reason="cancelled")
+    assert await sku_stock("prd_last_unit") == (1, True)
+
+@pytest.mark.asyncio
+async def test_failed_multi_item_reservation_returns_taken_stock():
+    await seed_product("prd_plenty", 5)
+    await seed_product("prd_short", 1)
+
+    with pytest.raises(HTTPException):
+        await stock_reservations.reserve("ord_partial", "str_reservations", [
+            ("prd_plenty", "sku_prd_plenty", 2),
+            ("prd_short", "sku_prd_short", 2)
+        ])
+    assert await sku_stock("prd_plenty") == (5, True)
+    assert await sku_stock("prd_short") == (1, True)
+
+@pytest.mark.asyncio
+async def test_release_keeps_sku_the_store_switched_off():
+    await seed_product("prd_switched_off", 5)
+    await stock_reservations.reserve("ord_switched_off", "str_reservations", [("prd_switched_off", "sku_prd_switched_off", 2)])
+    await db["products"].update_one({"_id": "prd_switched_off", "skus._id": "sku_prd_switched_off"}, {"$set": {"skus.$.in_stock": False}})
+
+    assert await stock_reservations.release("ord_switched_off", reason="cancelled")
+    assert await sku_stock("prd_switched_off") == (5, False)
+
+@pytest.mark.asyncio
+async def test_sweep_cancels_accepted_order_whose_reservation_expired():
+    await seed_product("prd_accepted_unpaid", 3)
+    await db["orders"].delete_many({"_id": "ord_accepted_unpaid"})
+    await stock_reservations.reserve("ord_accepted_unpaid", "str_reservations", [("prd_accepted_unpaid", "sku_prd_accepted_unpaid", 1)])
+    await db["orders"].insert_one({
+        "_id": "ord_accepted_unpaid", "store_id": "str_reservations", "status": "accepted", "payment_status": "pending"
+    })
+    await db["stock_reservations"].update_one(
+        {"order_id": "ord_accepted_unpaid"}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+    assert await stock_reservations.sweep() >= 1
+    assert await sku_stock("prd_accepted_unpaid") == (3, True)
+    order = await db["orders"].find_one({"_id": "ord_accepted_unpaid"})
+    assert order["status"] == "cancelled"
+    assert order["cancel_reason"] == "reservation_expired"
@@ -2,6 +2,8 @@ import pytest
 from httpx import AsyncClient
 from main import app
 
+from app.services.search_service import NAME_TERM_PREFIX, PRODUCT_FIELD_WEIGHTS, build_search_filter, build_search_terms
+
 @pytest.mark.asyncio
 async def test_search_stores():
     async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
@@ -61,3 +63,55 @@ async def test_nearby_stores():
         response = await client.get("/api/v1/stores/nearby", params={"latitude": 40.7128, "longitude": -74.0060})
         assert response.status_code == 200
         assert isinstance(response.json(), list)  # Should return a list of stores
+
+@pytest.mark.asyncio
+async def test_search_products_prefix_and_metacharacters():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        # A partial last word matches as a prefix
+        response = await client.get("/api/v1/search/products", params={"query": "sample prod"})
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == "Sample Product"
+
+        # Regex metacharacters are dropped by tokenization instead of reaching Mongo
+        response = await client.get("/api/v1/search/products", params={"query": "sample (prod"})
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == "Sample Product"
+
+@pytest.mark.asyncio
+async def test_nearby_stores_returns_cards_with_distance():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/stores/login", json={
+            "email": "store1@example.com",
+            "password": "storepass123"
+        })
+        token = login_response.json()["access_token"]
+        await client.post("/api/v1/stores/addresses", json={
+            "_id": "adr_placeholder",
+            "address": "Connaught Place, New Delhi",
+            "latitude": 28.6315,
+            "longitude": 77.2167,
+            "verified_at": None
+        }, headers={"Authorization": f"Bearer {token}"})
+
+        response = await client.get("/api/v1/search/stores/nearby", params={"latitude": 28.6320, "longitude": 77.2170})
+        assert response.status_code == 200
+        card = response.json()[0]
+        assert card["name"] == "Sample Store 1"
+        assert card["distance"] < 100
+        assert "hashed_password" not in card and "addresses" not in card
+
+        # Only stores with a matching product in stock pass the filter
+        response = await client.get("/api/v1/search/stores/nearby", params={
+            "latitude": 28.6320, "longitude": 77.2170, "product": "sample"
+        })
+        assert [store["name"] for store in response.json()] == ["Sample Store 1"]
+
+def test_name_tokens_are_also_stored_as_name_terms():
+    terms = build_search_terms({"name": "Amul Butter", "brand": "Amul", "category": "Dairy"}, PRODUCT_FIELD_WEIGHTS)
+    assert terms == ["amul", "butter", "dairy", "name:amul", "name:butter"]
+
+def test_name_filter_matches_only_name_terms():
+    assert build_search_filter("amul but", NAME_TERM_PREFIX) == {"$and": [
+        {"search_terms": "name:amul"},
+        {"search_terms": {"$regex": "^name:but"}}
+    ]}
@@ -0,0 +1,31 @@
+from app.services.spatial_index import StoreSpatialIndex
+
+def make_store(store_id, latitude, longitude, is_verified=True):
+    return {
+        "_id": store_id,
+        "name": store_id,
+        "phone": "1234567890",
+        "addresses": [{"_id": f"adr_{store_id}", "latitude": latitude, "longitude": longitude, "is_verified": is_verified}]
+    }
+
+def test_spatial_index_ranks_verified_stores_by_distance():
+    index = StoreSpatialIndex()
+    index.upsert(make_store("str_near", 28.6140, 77.2091))
+    index.upsert(make_store("str_far", 28.6300, 77.2200))
+    index.upsert(make_store("str_out_of_range", 28.9000, 77.5000))
+    index.upsert(make_store("str_unverified", 28.6139, 77.2090, is_verified=False))
+
+    stores = index.nearby(28.6139, 77.2090, 5000, 10)
+    assert [store["_id"] for store in stores] == ["str_near", "str_far"]
+    assert stores[0]["distance"] < stores[1]["distance"] < 5000
+
+def test_spatial_index_applies_moves_and_removals():
+    index = StoreSpatialIndex()
+    index.upsert(make_store("str_moving", 28.6140, 77.2091))
+    index.upsert(make_store("str_moving", 19.0760, 72.8777))
+    assert index.nearby(28.6139, 77.2090, 5000, 10) == []
+    assert [store["_id"] for store in index.nearby(19.0761, 72.8778, 5000, 10)] == ["str_moving"]
+
+    index.remove("str_moving")
+    assert len(index) == 0
+    assert index.nearby(19.0761, 72.8778, 5000, 10) == []
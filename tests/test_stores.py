@@ -1,4 +1,7 @@
 import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from httpx import AsyncClient
 from main import app
 
@@ -39,3 +42,85 @@ async def test_get_store_profile():
         response = await client.get("/api/v1/stores/me", headers={"Authorization": f"Bearer {token}"})
         assert response.status_code == 200
         assert response.json()["email"] == "store@example.com"
+
+@pytest.mark.asyncio
+async def test_delivery_zones():
+    async with AsyncClient(app=app, base_url="http://localhost:8000") as client:
+        login_response = await client.post("/api/v1/stores/login", json={
+            "email": "store@example.com",
+            "password": "storepass123"
+        })
+        token = login_response.json()["access_token"]
+
+        # A square around Connaught Place, New Delhi
+        response = await client.put("/api/v1/stores/delivery-zones", json=[{
+            "name": "CP",
+            "area": {"type": "Polygon", "coordinates": [[
+                [77.20, 28.62], [77.23, 28.62], [77.23, 28.64], [77.20, 28.64], [77.20, 28.62]
+            ]]}
+        }], headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == "CP"
+
+        response = await client.get("/api/v1/search/stores/delivering", params={"latitude": 28.63, "longitude": 77.21})
+        assert response.status_code == 200
+
+        # Unclosed rings are rejected
+        response = await client.put("/api/v1/stores/delivery-zones", json=[{
+            "name": "Broken",
+            "area": {"type": "Polygon", "coordinates": [[[77.20, 28.62], [77.23, 28.62], [77.23, 28.64]]]}
+        }], headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 400
+
+def store_document():
+    return {
+        "_id": "str_1", "email": "store@example.com", "name": "Test Store", "phone": "0987654321",
+        "gstin": None, "description": None, "addresses": [], "subscription": None,
+        "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()
+    }
+
+@pytest.mark.asyncio
+async def test_profile_change_refreshes_nearby_cards(monkeypatch):
+    from app.api.v1 import stores
+    from app.models.store import StoreUpdate
+
+    calls = []
+
+    async def update_and_fetch(collection, query, update, **kwargs):
+        return {**store_document(), **update["$set"]}
+
+    async def invalidate_principal(kind, principal_id):
+        calls.append(("principal", principal_id))
+
+    async def invalidate_nearby():
+        calls.append(("nearby",))
+
+    async def publish_change(store_id):
+        calls.append(("spatial", store_id))
+
+    monkeypatch.setattr(stores, "update_and_fetch", update_and_fetch)
+    monkeypatch.setattr(stores.principal_cache, "invalidate", invalidate_principal)
+    monkeypatch.setattr(stores.nearby_store_cache, "invalidate", invalidate_nearby)
+    monkeypatch.setattr(stores.store_spatial_index, "publish_change", publish_change)
+
+    await stores.update_store_profile(StoreUpdate(phone="0987654322"), {"_id": "str_1"})
+    assert calls == [("principal", "str_1"), ("nearby",), ("spatial", "str_1")]
+
+    # Fields that are not on the card leave the nearby caches alone
+    calls.clear()
+    await stores.update_store_profile(StoreUpdate(email="other@example.com"), {"_id": "str_1"})
+    assert calls == [("principal", "str_1")]
+
+@pytest.mark.asyncio
+async def test_profile_change_to_a_taken_phone_conflicts(monkeypatch):
+    from app.api.v1 import stores
+    from app.models.store import StoreUpdate
+
+    async def update_and_fetch(collection, query, update, **kwargs):
+        raise DuplicateKeyError("E11000 duplicate key", 11000, {"keyPattern": {"phone": 1}})
+
+    monkeypatch.setattr(stores, "update_and_fetch", update_and_fetch)
+    with pytest.raises(HTTPException) as raised:
+        await stores.update_store_profile(StoreUpdate(phone="0987654322"), {"_id": "str_1"})
+    assert raised.value.status_code == 409
+    assert raised.value.detail == "Phone already registered"
@@ -0,0 +1,36 @@
+import httpx
+import pytest
+
+from app.services.whatsapp_service import WhatsAppService
+
+def make_service(handler):
+    return WhatsAppService(
+        user_number_id="user_phone", store_number_id="store_phone", token="token",
+        base_url="https://graph.test", transport=httpx.MockTransport(handler)
+    )
+
+@pytest.mark.asyncio
+async def test_sends_share_one_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"messages": [{"id": f"wamid.{len(requests)}"}]})
+
+    service = make_service(handler)
+    service.start()
+    client = service._client
+    await service.send_message("919000000001", "order_update", ["ORD1"])
+    await service.send_message("919000000002", "store_order", ["ORD2"], is_store=True)
+    assert service._client is client
+    assert [request.url.path for request in requests] == ["/v15.0/user_phone/messages", "/v15.0/store_phone/messages"]
+    assert all(request.headers["Authorization"] == "Bearer token" for request in requests)
+
+    await service.close()
+    assert client.is_closed and service._client is None
+
+@pytest.mark.asyncio
+async def test_send_failures_are_returned_not_raised():
+    service = make_service(lambda request: httpx.Response(400, text="bad template"))
+    assert await service.send_message("919000000001", "missing", []) == {"error": "HTTP error", "details": "bad template"}
+    await service.close()